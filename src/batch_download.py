@@ -0,0 +1,295 @@
+# src/batch_download.py
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from src.data_download import (
+    OHLCV_FIELDS,
+    PriceProvider,
+    YFinanceProvider,
+    save_dataframe_atomic,
+)
+
+
+def _safe_ticker_filename(ticker: str) -> str:
+    return ticker.replace("/", "_").replace("^", "_idx_")
+
+
+def _order_columns(data: pd.DataFrame, tickers: list[str]) -> pd.DataFrame:
+    """
+    Put (field, ticker) columns into canonical field order, then ticker order.
+    """
+    fields = list(pd.Index(data.columns.get_level_values(0)).unique())
+    fields = [f for f in OHLCV_FIELDS if f in fields] + [f for f in fields if f not in OHLCV_FIELDS]
+
+    present = set(data.columns)
+    ordered = [(field, ticker) for field in fields for ticker in tickers if (field, ticker) in present]
+    return data[ordered]
+
+
+def _tickers_with_data(data: pd.DataFrame, tickers: list[str]) -> list[str]:
+    """
+    Tickers of `tickers` with at least one non-NaN value in `data`.
+    """
+    if data.empty:
+        return []
+
+    has_data = data.notna().any(axis=0).groupby(level=1).any()
+    return [t for t in tickers if has_data.get(t, False)]
+
+
+class ReplayProvider(PriceProvider):
+    """
+    Replay per-ticker parquet files recorded with `record_replay_files`.
+
+    Each file `<record_dir>/<ticker>.parquet` holds one ticker's daily rows with
+    one column per field. Tickers without a recording are skipped.
+    """
+
+    def __init__(self, record_dir: str):
+        self.record_dir = Path(record_dir)
+
+    def fetch(
+        self,
+        tickers: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool = False,
+    ) -> pd.DataFrame:
+        frames: dict[str, pd.DataFrame] = {}
+
+        for ticker in tickers:
+            path = self.record_dir / f"{_safe_ticker_filename(ticker)}.parquet"
+            if not path.exists():
+                print(f"No recording for {ticker}, skipping")
+                continue
+
+            frame = pd.read_parquet(path)
+            frame.index = pd.to_datetime(frame.index)
+            frame = frame.sort_index()
+            frames[ticker] = frame.loc[
+                (frame.index >= pd.Timestamp(start_date)) & (frame.index < pd.Timestamp(end_date))
+            ]
+
+        if not frames:
+            return pd.DataFrame()
+
+        data = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1)
+        return _order_columns(data, list(frames))
+
+
+def record_replay_files(data: pd.DataFrame, record_dir: str) -> None:
+    """
+    Split a (field, ticker) price dataframe into per-ticker parquet files that
+    `ReplayProvider` can serve.
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        raise ValueError("Expected MultiIndex columns (field, ticker).")
+
+    os.makedirs(record_dir, exist_ok=True)
+
+    for ticker in pd.Index(data.columns.get_level_values(1)).unique():
+        frame = data.xs(ticker, axis=1, level=1)
+        save_dataframe_atomic(frame, os.path.join(record_dir, f"{_safe_ticker_filename(ticker)}.parquet"))
+
+
+class BatchedProvider(PriceProvider):
+    """
+    Split a fetch into ticker batches and run them on a bounded thread pool.
+
+    - failed batches are retried with exponential backoff
+    - so are the tickers of a batch that come back empty or all-NaN, which
+      is how yfinance reports rate limits; those still without data after
+      the retries (delisted or unknown tickers) are reported as missing
+      and left out of the result
+    - each finished batch is checkpointed to `checkpoint_dir`, so rerunning an
+      interrupted fetch only requests the batches that are still missing
+    - checkpoints for a fetch are removed once every batch has succeeded
+
+    Batches that still fail after all retries are reported together in one
+    RuntimeError, after the other batches have been checkpointed.
+    """
+
+    def __init__(
+        self,
+        inner: Optional[PriceProvider] = None,
+        batch_size: int = 25,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 2.0,
+        checkpoint_dir: Optional[str] = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+
+        self.inner = inner if inner is not None else YFinanceProvider(threads=False)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+
+    def _checkpoint_path(
+        self,
+        batch: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool,
+    ) -> Optional[Path]:
+        if self.checkpoint_dir is None:
+            return None
+
+        key = "|".join([",".join(batch), str(start_date), str(end_date), str(auto_adjust)])
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.checkpoint_dir / f"batch_{digest}.parquet"
+
+    def _fetch_with_retry(
+        self,
+        batch: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool,
+    ) -> pd.DataFrame:
+        """
+        Fetch `batch`, retrying errors and the tickers that came back
+        without data. Raises when the last attempt still fails; tickers
+        still missing after the last attempt are reported and left out.
+        """
+        last_error: Optional[Exception] = None
+        frames: list[pd.DataFrame] = []
+        missing = list(batch)
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)))
+            try:
+                data = self.inner.fetch(
+                    tickers=missing,
+                    start_date=start_date,
+                    end_date=end_date,
+                    auto_adjust=auto_adjust,
+                )
+            except Exception as exc:
+                last_error = exc
+                print(f"Batch {batch[0]}..{batch[-1]} attempt {attempt + 1} failed: {exc}")
+                continue
+
+            last_error = None
+            data = data if data is not None else pd.DataFrame()
+            found = _tickers_with_data(data, missing)
+            if found:
+                frames.append(data.loc[:, data.columns.get_level_values(1).isin(found)])
+            missing = [t for t in missing if t not in found]
+            if not missing:
+                break
+            if attempt < self.max_retries:
+                print(f"Batch {batch[0]}..{batch[-1]} attempt {attempt + 1}: no data for {missing}, retrying")
+
+        if last_error is not None:
+            raise RuntimeError(f"Batch {batch[0]}..{batch[-1]} failed after retries") from last_error
+        if missing:
+            print(f"No data returned for tickers: {missing}")
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+
+    def fetch(
+        self,
+        tickers: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool = False,
+    ) -> pd.DataFrame:
+        batches = [
+            list(tickers[i:i + self.batch_size])
+            for i in range(0, len(tickers), self.batch_size)
+        ]
+
+        if self.checkpoint_dir is not None:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        results: dict[int, pd.DataFrame] = {}
+        pending: list[int] = []
+
+        for batch_id, batch in enumerate(batches):
+            path = self._checkpoint_path(batch, start_date, end_date, auto_adjust)
+            if path is not None and path.exists():
+                results[batch_id] = pd.read_parquet(path)
+            else:
+                pending.append(batch_id)
+
+        if len(pending) < len(batches):
+            print(f"Resuming from checkpoints: {len(batches) - len(pending)}/{len(batches)} batches already fetched")
+
+        failed: dict[int, Exception] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self._fetch_with_retry, batches[batch_id], start_date, end_date, auto_adjust): batch_id
+                for batch_id in pending
+            }
+            for future in as_completed(futures):
+                batch_id = futures[future]
+                try:
+                    data = future.result()
+                except Exception as exc:
+                    failed[batch_id] = exc
+                    continue
+
+                if data.empty:
+                    continue
+
+                results[batch_id] = data
+                path = self._checkpoint_path(batches[batch_id], start_date, end_date, auto_adjust)
+                if path is not None:
+                    save_dataframe_atomic(data, str(path))
+
+        if failed:
+            failed_tickers = [t for batch_id in sorted(failed) for t in batches[batch_id]]
+            raise RuntimeError(
+                f"{len(failed)} of {len(batches)} batches failed; rerun to resume. "
+                f"Failed tickers: {failed_tickers}"
+            )
+
+        for batch_id, batch in enumerate(batches):
+            path = self._checkpoint_path(batch, start_date, end_date, auto_adjust)
+            if path is not None and path.exists():
+                path.unlink()
+
+        if not results:
+            return pd.DataFrame()
+
+        data = pd.concat([results[batch_id] for batch_id in sorted(results)], axis=1)
+        data.index = pd.to_datetime(data.index)
+        return _order_columns(data.sort_index(), list(tickers))
+
+
+def provider_from_config() -> PriceProvider:
+    """
+    Build the batched provider described by the DOWNLOAD_* settings in
+    src.config, replaying recordings from DOWNLOAD_REPLAY_DIR when it is set.
+    """
+    from src import config
+
+    replay_dir = getattr(config, "DOWNLOAD_REPLAY_DIR", None)
+    inner: PriceProvider = ReplayProvider(replay_dir) if replay_dir else YFinanceProvider(threads=False)
+
+    return BatchedProvider(
+        inner=inner,
+        batch_size=getattr(config, "DOWNLOAD_BATCH_SIZE", 25),
+        max_workers=getattr(config, "DOWNLOAD_MAX_WORKERS", 4),
+        max_retries=getattr(config, "DOWNLOAD_MAX_RETRIES", 3),
+        backoff_seconds=getattr(config, "DOWNLOAD_BACKOFF_SECONDS", 2.0),
+        checkpoint_dir=getattr(config, "DOWNLOAD_CHECKPOINT_DIR", None),
+    )
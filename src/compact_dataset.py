@@ -0,0 +1,100 @@
+# src/compact_dataset.py
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+TARGET_PREFIX = "y_next"
+MONTH_LEVEL = "month"
+TICKER_LEVEL = "ticker"
+
+
+def is_compact(df: pd.DataFrame) -> bool:
+    return isinstance(df.index, pd.MultiIndex) and list(df.index.names) == [MONTH_LEVEL, TICKER_LEVEL]
+
+
+def to_compact(df_long: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compact layout of a long (date, ticker) dataset:
+
+    - month: int32 monthly period ordinal instead of the month-end timestamp
+    - ticker: categorical, i.e. small integer codes plus the ticker dictionary
+    - feature columns as float32; target columns (y_next*) are kept as they are
+
+    Only month-end dates can be encoded; `from_compact` restores the layout.
+    """
+    if is_compact(df_long):
+        return df_long
+    if not isinstance(df_long.index, pd.MultiIndex) or list(df_long.index.names) != ["date", TICKER_LEVEL]:
+        raise ValueError("df_long must be indexed by (date, ticker).")
+
+    dates = pd.DatetimeIndex(df_long.index.get_level_values("date"))
+    months = dates.to_period("M")
+    if not (months.to_timestamp(how="end").normalize() == dates).all():
+        raise ValueError("Compact datasets require month-end dates.")
+
+    index = pd.MultiIndex.from_arrays(
+        [
+            months.asi8.astype(np.int32),
+            pd.Categorical(df_long.index.get_level_values(TICKER_LEVEL)),
+        ],
+        names=[MONTH_LEVEL, TICKER_LEVEL],
+    )
+    out = pd.DataFrame(index=index)
+    # Kept so `from_compact` restores the same timestamp resolution
+    out.attrs["date_unit"] = dates.unit
+    for col in df_long.columns:
+        values = df_long[col].to_numpy()
+        if not str(col).startswith(TARGET_PREFIX) and np.issubdtype(values.dtype, np.floating):
+            values = values.astype(np.float32)
+        out[col] = values
+    return out
+
+
+def from_compact(df: pd.DataFrame, dtype: Optional[np.dtype] = None) -> pd.DataFrame:
+    """
+    Long (date, ticker) dataset from the compact layout, with month-end
+    timestamps and string tickers. Features stay float32 unless `dtype` is
+    given; np.float64 restores the original column types.
+    """
+    if not is_compact(df):
+        return df
+
+    months = df.index.get_level_values(MONTH_LEVEL).to_numpy(dtype=np.int64)
+    dates = pd.PeriodIndex.from_ordinals(months, freq="M").to_timestamp(how="end").normalize()
+    dates = dates.as_unit(df.attrs.get("date_unit", "ns"))
+    tickers = np.asarray(df.index.get_level_values(TICKER_LEVEL), dtype=object)
+
+    out = df.copy()
+    out.attrs.pop("date_unit", None)
+    out.index = pd.MultiIndex.from_arrays([dates, tickers], names=["date", TICKER_LEVEL])
+    if dtype is not None:
+        feature_cols = [c for c in out.columns if not str(c).startswith(TARGET_PREFIX)]
+        out[feature_cols] = out[feature_cols].astype(dtype)
+    return out
+
+
+def compact_if_enabled(df_long: pd.DataFrame) -> pd.DataFrame:
+    """
+    `df_long` in the layout feature tables are saved in: compact when
+    COMPACT_FEATURE_DATASETS is set in src.config, else unchanged.
+    """
+    from src import config
+
+    if getattr(config, "COMPACT_FEATURE_DATASETS", False):
+        return to_compact(df_long)
+    return df_long
+
+
+def feature_dtype(df: pd.DataFrame, feature_cols: list[str]) -> np.dtype:
+    """
+    float32 when every feature column already is, so model inputs built from
+    compact datasets are not upcast; float64 otherwise.
+    """
+    if feature_cols and all(df[col].dtype == np.float32 for col in feature_cols):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
@@ -16,9 +16,28 @@ TEST_START_DATE = "2025-01-01"
 # =========================
 RAW_ADJ_CLOSE_PATH = "data/raw/adj_close_2015_2025.parquet"
 RAW_OHLCV_PATH = "data/raw/ohlcv_2015_2025.parquet"
+# Long-format OHLCV store partitioned by year (float32 prices). When enabled it
+# is written by the ingest stage and read by run_features_daily_ohlcv.
+RAW_OHLCV_STORE_DIR = "data/raw/ohlcv_store"
+USE_OHLCV_STORE = False
 TICKERS = FTSE100_TICKERS
 MARKET_TICKER = None
 
+# Incremental ingest: only fetch the tail missing from the raw parquet files,
+# re-fetching the last INGEST_OVERLAP_DAYS stored trading days.
+INGEST_INCREMENTAL = False
+INGEST_OVERLAP_DAYS = 5
+
+# Batched download: tickers are fetched in batches on a bounded thread pool,
+# with retries and per-batch checkpoints so an interrupted run can resume.
+# Set DOWNLOAD_REPLAY_DIR to replay recorded per-ticker parquet files offline.
+DOWNLOAD_BATCH_SIZE = 25
+DOWNLOAD_MAX_WORKERS = 4
+DOWNLOAD_MAX_RETRIES = 3
+DOWNLOAD_BACKOFF_SECONDS = 2.0
+DOWNLOAD_CHECKPOINT_DIR = "data/raw/download_checkpoints"
+DOWNLOAD_REPLAY_DIR = None
+
 USE_LOG_RETURNS = False
 
 # =========================
@@ -26,6 +45,15 @@ USE_LOG_RETURNS = False
 # =========================
 FEATURE_SOURCE = "daily_ohlcv"   # "monthly" or "daily" "daily_ohlcv"
 
+# "parquet" reads the saved train/test tables; "panel" slices them from the
+# saved (date, ticker, feature) float32 FeaturePanel
+FEATURE_DATASET_FORMAT = "parquet"
+
+# Save the long feature tables compactly: float32 features, int32 month
+# ordinal dates and categorical tickers. Readers restore the (date, ticker)
+# index and pass float32 features to the models without upcasting.
+COMPACT_FEATURE_DATASETS = False
+
 # =========================
 # REBALANCING / PORTFOLIO
 # =========================
@@ -59,15 +87,86 @@ DAILY_DRAWDOWN_WINDOWS = [60]
 DAILY_BETA_WINDOWS = [60]
 DAILY_RSI_WINDOW = 14
 
+# Beta windows against the equal-weight market proxy (cross-sectional mean of
+# daily returns); computed in the same sweep as the market betas
+DAILY_EW_BETA_WINDOWS: list[int] = []
+
+# Evaluate windowed daily features only at month-end rows (same output,
+# much less work than computing every trading day and resampling)
+DAILY_FEATURES_MONTH_END_ONLY = True
+
 DAILY_OHLCV_VOL_WINDOWS = [20, 60]
 DAILY_OHLCV_RANGE_WINDOWS = [5, 20]
 DAILY_OHLCV_ABVOL_WINDOWS = [20]
 DAILY_OHLCV_CLV_WINDOWS = [5, 20]
 
+# =========================
+# FEATURE CACHE
+# =========================
+# Built datasets and individual features are cached under a hash of the raw
+# inputs, the settings above and the feature code; a rerun with nothing
+# changed skips the build. Least recently used entries are evicted past
+# FEATURE_CACHE_MAX_BYTES. Off by default: it writes pickles under
+# FEATURE_CACHE_DIR on every build.
+USE_FEATURE_CACHE = False
+FEATURE_CACHE_DIR = "data/cache/features"
+FEATURE_CACHE_MAX_BYTES = 2 * 1024**3
+
+# =========================
+# MODEL STORE
+# =========================
+# Fitted models are stored under a hash of the model family, its
+# hyperparameters, the model code, the training data and the cutoff date; a
+# rerun with unchanged inputs loads them instead of training. Least recently
+# used models are evicted past MODEL_STORE_MAX_BYTES. Off by default: with it
+# the runners, the LSTM included, reuse a stored model instead of training.
+USE_MODEL_STORE = False
+MODEL_STORE_DIR = "data/cache/models"
+MODEL_STORE_MAX_BYTES = 4 * 1024**3
+
+# =========================
+# PARALLEL FEATURES
+# =========================
+# Worker processes for the daily feature builders. Feature families that
+# share no rolling kernel (returns, vols, MAs, highs, RSI, volume, range,
+# CLV, beta, ...) are computed in parallel; 1 runs them in-process.
+FEATURE_WORKERS = 1
+
+# =========================
+# INCREMENTAL FEATURE UPDATE
+# =========================
+# src.run_features_update extends these daily feature datasets by the prices
+# added since its last run, from saved rolling state, instead of rebuilding
+# them; the rows are identical to a full rebuild.
+FEATURE_UPDATE_SOURCES = ["daily", "daily_ohlcv"]
+
+# =========================
+# WALK-FORWARD
+# =========================
+# Test months the rolling runners fit in parallel (outer), and n_jobs of each
+# fit (inner). None splits the cores between workers; 1 worker keeps the
+# serial month loop with n_jobs=-1.
+WALK_FORWARD_WORKERS = 1
+WALK_FORWARD_INNER_JOBS = None
+
+# =========================
+# TUNING
+# =========================
+# Processes running Optuna trials at once against the tuner's shared SQLite
+# study, and n_jobs of each trial's fits. None splits the cores between
+# workers; 1 worker runs the trials in the main process with n_jobs=-1.
+TUNING_WORKERS = 1
+TUNING_INNER_JOBS = None
+
 # =========================
 # SCALING
 # =========================
 SCALER_TYPE = "robust"
+# Robust scaler medians / IQRs from a mergeable quantile sketch (approximate,
+# bounded memory) instead of exact percentiles of the whole training matrix.
+# Expanding windows of one dataset reuse the sketch of the previous window
+ROBUST_SCALER_SKETCH = False
+QUANTILE_SKETCH_SIZE = 256
 
 # =========================
 # RIDGE
@@ -77,6 +176,12 @@ RIDGE_ALPHA_GRID = [0.01, 0.1, 1.0, 10.0, 100.0]
 RIDGE_TUNING_SPLITS = 5
 RIDGE_SELECTION_METRIC = "topk_hit_rate"
 
+# Rolling runner: keep X'X, X'y and column moments month by month and re-solve
+# Ridge from them instead of refitting. Exact with SCALER_TYPE = "standard";
+# the robust scaler uses a quantile sketch (QUANTILE_SKETCH_SIZE), so leave
+# this off unless approximate medians / IQRs are acceptable
+RIDGE_INCREMENTAL = False
+
 # =========================
 # RANDOM FOREST
 # =========================
@@ -87,6 +192,12 @@ RF_MIN_SAMPLES_SPLIT = 20
 RF_MAX_FEATURES = "sqrt"
 RF_BOOTSTRAP = True
 
+# Rolling runner: keep the previous month's forest, retire this fraction of its
+# oldest trees and grow as many on the extended window, instead of refitting
+RF_INCREMENTAL = False
+RF_INCREMENTAL_REPLACE_FRACTION = 0.10
+# Also run full refits and save the incremental vs full-refit prediction drift
+RF_INCREMENTAL_DRIFT_CHECK = False
 
 RF_TUNING_SPLITS = 5
 RF_SELECTION_METRIC = "combined_score"  # options: "combined_score", "rmse", "directional_accuracy", "spearman", "topk_hit_rate"
@@ -112,6 +223,17 @@ XGB_REG_LAMBDA = 1.0
 XGB_MIN_CHILD_WEIGHT = 5
 XGB_GAMMA =0.0
 
+# Rolling runner: continue the previous month's booster with a few boosting
+# rounds on the extended window instead of refitting. A full refit is forced
+# every REFIT_EVERY months, or when the booster's error on the newly revealed
+# month exceeds its first post-refit error by more than MAX_DEGRADATION.
+XGB_CONTINUATION = False
+XGB_CONTINUATION_ROUNDS = 20
+XGB_CONTINUATION_REFIT_EVERY = 6
+XGB_CONTINUATION_MAX_DEGRADATION = 0.10
+# Also run full refits and save per-month timing and accuracy against them
+XGB_CONTINUATION_REPORT = False
+
 XGB_TUNING_TRIALS = 40
 XGB_TUNING_SPLITS = 5
 XGB_SELECTION_METRIC = "topk_hit_rate"  # options: "topk_hit_rate", "spearman", "directional_accuracy", "rmse"
@@ -156,6 +278,11 @@ NN_DROPOUT_3 = 0.10
 LSTM_SEQUENCE_LENGTH = 120
 LSTM_NORMALIZE_PER_SEQUENCE = True
 LSTM_MARKET_TICKER = None
+# "index": daily feature tensor stored once plus a (date, ticker, end row)
+# index, windows cut out per training batch; "windows": every window stored
+LSTM_DATASET_FORMAT = "index"
+# "npy": raw arrays + meta.json, memory-mapped on load; "npz": compressed export
+LSTM_STORAGE_FORMAT = "npy"
 
 LSTM_UNITS = 64
 LSTM_DENSE_UNITS = 32
@@ -168,6 +295,9 @@ LSTM_BATCH_SIZE = 64
 LSTM_VALIDATION_FRACTION = 0.15
 LSTM_EARLY_STOPPING_PATIENCE = 10
 LSTM_LR_PATIENCE = 5
+# Test predictions from an LSTM refitted every month on all earlier samples
+# (walk-forward engine) instead of the single model fitted on the train split
+LSTM_WALK_FORWARD = False
 
 # Portfolio Selection Diagnostics
 
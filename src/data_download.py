@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 
 import pandas as pd
-import yfinance as yf
+
+
+OHLCV_FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
 
 
 @dataclass
@@ -20,6 +23,97 @@ class OHLCVDownloadResult:
     missing_ratio_adj_close: pd.Series
 
 
+class PriceProvider:
+    """
+    Source of daily price data.
+
+    `fetch` must return a dataframe in the yfinance `group_by="column"` layout:
+    DateTimeIndex rows and MultiIndex columns (field, ticker).
+    """
+
+    def fetch(
+        self,
+        tickers: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool = False,
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    """
+    Download prices from Yahoo Finance.
+
+    `threads` is passed through to yf.download; turn it off when the provider
+    already runs inside a thread pool.
+    """
+
+    def __init__(self, threads: bool = True):
+        self.threads = threads
+
+    def fetch(
+        self,
+        tickers: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool = False,
+    ) -> pd.DataFrame:
+        import yfinance as yf
+
+        return yf.download(
+            tickers=tickers,
+            start=start_date,
+            end=end_date,
+            auto_adjust=auto_adjust,
+            progress=False,
+            group_by="column",
+            threads=self.threads,
+        )
+
+
+class LocalFileProvider(PriceProvider):
+    """
+    Serve prices from a parquet file already on disk.
+
+    The file may hold either the raw OHLCV layout (field, ticker) or flat
+    ticker columns, which are treated as the 'Adj Close' field. Useful as an
+    offline stand-in for yfinance.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Optional[pd.DataFrame] = None
+
+    def _load(self) -> pd.DataFrame:
+        if self._data is None:
+            data = pd.read_parquet(self.path)
+            if not isinstance(data.columns, pd.MultiIndex):
+                data.columns = pd.MultiIndex.from_product([["Adj Close"], data.columns])
+            data.index = pd.to_datetime(data.index)
+            self._data = data.sort_index()
+        return self._data
+
+    def fetch(
+        self,
+        tickers: list[str],
+        start_date: str,
+        end_date: str,
+        auto_adjust: bool = False,
+    ) -> pd.DataFrame:
+        data = self._load()
+
+        dates = data.index
+        row_mask = (dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date))
+        col_mask = data.columns.get_level_values(1).isin(tickers)
+
+        return data.loc[row_mask, col_mask].copy()
+
+
+def _default_provider(provider: Optional[PriceProvider]) -> PriceProvider:
+    return provider if provider is not None else YFinanceProvider()
+
+
 def save_dataframe(df: pd.DataFrame, path: str) -> None:
     """
     Save dataframe to parquet.
@@ -27,6 +121,20 @@ def save_dataframe(df: pd.DataFrame, path: str) -> None:
     df.to_parquet(path)
 
 
+def save_dataframe_atomic(df: pd.DataFrame, path: str) -> None:
+    """
+    Save dataframe to parquet via a temporary file and an atomic rename, so an
+    interrupted write never leaves a truncated file at `path`.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
 def print_missing_summary(missing_ratio: pd.Series, top_n: int = 20) -> None:
     """
     Print missing-value ratios by ticker.
@@ -35,24 +143,10 @@ def print_missing_summary(missing_ratio: pd.Series, top_n: int = 20) -> None:
     print(missing_ratio.sort_values(ascending=False).head(top_n))
 
 
-def download_adj_close(
-    tickers: list[str],
-    start_date: str,
-    end_date: str,
-    auto_adjust: bool = False,
-) -> DownloadResult:
+def _extract_adj_close(data: pd.DataFrame) -> pd.DataFrame:
     """
-    Download adjusted close prices only.
+    Pull the adjusted close block out of a (field, ticker) download.
     """
-    data = yf.download(
-        tickers=tickers,
-        start=start_date,
-        end=end_date,
-        auto_adjust=auto_adjust,
-        progress=False,
-        group_by="column",
-    )
-
     if isinstance(data.columns, pd.MultiIndex):
         if "Adj Close" in data.columns.get_level_values(0):
             adj_close = data["Adj Close"].copy()
@@ -64,8 +158,48 @@ def download_adj_close(
         raise ValueError("Expected MultiIndex columns from yfinance download.")
 
     adj_close.index = pd.to_datetime(adj_close.index)
-    adj_close = adj_close.sort_index()
+    return adj_close.sort_index()
+
+
+def _extract_ohlcv(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep the OHLCV fields of a (field, ticker) download in canonical order.
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        raise ValueError("Expected MultiIndex columns from yfinance download.")
+
+    available_fields = list(pd.Index(data.columns.get_level_values(0)).unique())
 
+    required_base_fields = ["Open", "High", "Low", "Close", "Volume"]
+    missing_base_fields = [f for f in required_base_fields if f not in available_fields]
+    if missing_base_fields:
+        raise ValueError(f"Missing required OHLCV fields: {missing_base_fields}")
+
+    desired_fields = [f for f in OHLCV_FIELDS if f in available_fields]
+    ohlcv = data[desired_fields].copy()
+
+    ohlcv.index = pd.to_datetime(ohlcv.index)
+    return ohlcv.sort_index()
+
+
+def download_adj_close(
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    auto_adjust: bool = False,
+    provider: Optional[PriceProvider] = None,
+) -> DownloadResult:
+    """
+    Download adjusted close prices only.
+    """
+    data = _default_provider(provider).fetch(
+        tickers=tickers,
+        start_date=start_date,
+        end_date=end_date,
+        auto_adjust=auto_adjust,
+    )
+
+    adj_close = _extract_adj_close(data)
     missing_ratio = adj_close.isna().mean()
 
     return DownloadResult(
@@ -79,6 +213,7 @@ def download_ohlcv(
     start_date: str,
     end_date: str,
     auto_adjust: bool = False,
+    provider: Optional[PriceProvider] = None,
 ) -> OHLCVDownloadResult:
     """
     Download full OHLCV data and also extract adjusted close.
@@ -88,43 +223,171 @@ def download_ohlcv(
       fields expected: Open, High, Low, Close, Adj Close, Volume
     - adj_close: flat ticker columns
     """
-    data = yf.download(
+    data = _default_provider(provider).fetch(
         tickers=tickers,
-        start=start_date,
-        end=end_date,
+        start_date=start_date,
+        end_date=end_date,
         auto_adjust=auto_adjust,
-        progress=False,
-        group_by="column",
     )
 
-    if not isinstance(data.columns, pd.MultiIndex):
-        raise ValueError("Expected MultiIndex columns from yfinance download.")
+    ohlcv = _extract_ohlcv(data)
+    adj_close = _extract_adj_close(data)
 
-    available_fields = list(pd.Index(data.columns.get_level_values(0)).unique())
+    missing_ratio_adj_close = adj_close.isna().mean()
 
-    required_base_fields = ["Open", "High", "Low", "Close", "Volume"]
-    missing_base_fields = [f for f in required_base_fields if f not in available_fields]
-    if missing_base_fields:
-        raise ValueError(f"Missing required OHLCV fields: {missing_base_fields}")
+    return OHLCVDownloadResult(
+        ohlcv=ohlcv,
+        adj_close=adj_close,
+        missing_ratio_adj_close=missing_ratio_adj_close,
+    )
 
-    if "Adj Close" in available_fields:
-        adj_close = data["Adj Close"].copy()
-    else:
-        adj_close = data["Close"].copy()
 
-    desired_fields = [f for f in ["Open", "High", "Low", "Close", "Adj Close", "Volume"] if f in available_fields]
-    ohlcv = data[desired_fields].copy()
+# =========================
+# INCREMENTAL INGEST
+# =========================
 
-    ohlcv.index = pd.to_datetime(ohlcv.index)
-    ohlcv = ohlcv.sort_index()
+def read_stored_prices(path: str) -> Optional[pd.DataFrame]:
+    """
+    Load a previously saved raw price file, or None if it does not exist yet.
+    """
+    if not os.path.exists(path):
+        return None
 
-    adj_close.index = pd.to_datetime(adj_close.index)
-    adj_close = adj_close.sort_index()
+    stored = pd.read_parquet(path)
+    stored.index = pd.to_datetime(stored.index)
+    return stored.sort_index()
 
-    missing_ratio_adj_close = adj_close.isna().mean()
+
+def merge_price_history(
+    existing: pd.DataFrame,
+    update: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Merge freshly fetched rows into stored history.
+
+    Values in `update` win wherever they are present, so re-fetched overlap
+    rows replace stale ones. Duplicate dates collapse to a single row and
+    columns seen for the first time are appended after the stored ones.
+    """
+    update = update[~update.index.duplicated(keep="last")]
+    merged = update.combine_first(existing)
+
+    new_cols = [col for col in update.columns if col not in existing.columns]
+    merged = merged[list(existing.columns) + new_cols]
+    return merged.sort_index()
+
+
+def fetch_missing_tail(
+    stored: pd.DataFrame,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    provider: PriceProvider,
+    overlap_days: int = 5,
+    auto_adjust: bool = False,
+) -> Optional[pd.DataFrame]:
+    """
+    Fetch only what `stored` is missing.
+
+    Tickers already present are re-fetched from `overlap_days` stored trading
+    days before the last stored date, so late corrections near the tail are
+    picked up. Tickers not present at all are fetched from `start_date`.
+
+    Returns the raw (field, ticker) download, or None if nothing came back.
+    """
+    if overlap_days < 1:
+        raise ValueError("overlap_days must be at least 1.")
+
+    stored_tickers = set(stored.columns.get_level_values(-1))
+    known = [t for t in tickers if t in stored_tickers]
+    unseen = [t for t in tickers if t not in stored_tickers]
+
+    parts = []
+
+    if known:
+        tail_start = stored.index[max(0, len(stored.index) - overlap_days)]
+        print(f"Fetching {len(known)} known tickers from {tail_start.date()} (overlap {overlap_days} days)")
+        parts.append(
+            provider.fetch(
+                tickers=known,
+                start_date=str(tail_start.date()),
+                end_date=end_date,
+                auto_adjust=auto_adjust,
+            )
+        )
+
+    if unseen:
+        print(f"Fetching full history for {len(unseen)} new tickers")
+        parts.append(
+            provider.fetch(
+                tickers=unseen,
+                start_date=start_date,
+                end_date=end_date,
+                auto_adjust=auto_adjust,
+            )
+        )
+
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return None
+
+    return pd.concat(parts, axis=1)
+
+
+def update_ohlcv_incremental(
+    path: str,
+    tickers: list[str],
+    start_date: str,
+    end_date: str,
+    auto_adjust: bool = False,
+    provider: Optional[PriceProvider] = None,
+    overlap_days: int = 5,
+) -> OHLCVDownloadResult:
+    """
+    Bring the raw OHLCV file at `path` up to `end_date`.
+
+    Falls back to a full download when no file exists yet. The merged result
+    is written back to `path` atomically.
+
+    Note: with auto_adjust=False, Yahoo back-adjusts the whole 'Adj Close'
+    history after each dividend. The overlap window only picks up revisions
+    near the tail, so a periodic full refresh is still needed to pick up
+    older back-adjustments.
+    """
+    provider = _default_provider(provider)
+    stored = read_stored_prices(path)
+
+    if stored is None:
+        result = download_ohlcv(
+            tickers=tickers,
+            start_date=start_date,
+            end_date=end_date,
+            auto_adjust=auto_adjust,
+            provider=provider,
+        )
+        save_dataframe_atomic(result.ohlcv, path)
+        return result
+
+    fresh = fetch_missing_tail(
+        stored=stored,
+        tickers=tickers,
+        start_date=start_date,
+        end_date=end_date,
+        provider=provider,
+        overlap_days=overlap_days,
+        auto_adjust=auto_adjust,
+    )
+
+    ohlcv = stored
+    if fresh is not None:
+        ohlcv = _extract_ohlcv(merge_price_history(stored, _extract_ohlcv(fresh)))
+        save_dataframe_atomic(ohlcv, path)
+
+    adj_close = _extract_adj_close(ohlcv)
 
     return OHLCVDownloadResult(
         ohlcv=ohlcv,
         adj_close=adj_close,
-        missing_ratio_adj_close=missing_ratio_adj_close,
-    )
\ No newline at end of file
+        missing_ratio_adj_close=adj_close.isna().mean(),
+    )
+
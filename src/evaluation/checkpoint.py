@@ -0,0 +1,120 @@
+# src/evaluation/checkpoint.py
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Optional
+
+
+JOURNAL_FILENAME = "journal.jsonl"
+JOURNAL_META_FILENAME = "meta.json"
+
+
+class RunJournal:
+    """
+    Append-only on-disk record of the completed units of one long run
+    (walk-forward months, tuning trials), so an interrupted run can resume.
+
+    Each unit appends one JSON line to journal.jsonl, written after its
+    optional pickled payload, so a line is only there once the unit is
+    fully saved. A torn last line from a crash is cut off when the journal
+    is reopened, so later units are not appended onto it.
+
+    The journal belongs to `run_key` (a hash of the run's inputs and
+    settings). Without `resume`, or when the key has changed, it starts
+    empty.
+    """
+
+    def __init__(self, directory: str, run_key: str, resume: bool = False):
+        self.directory = directory
+        self.run_key = run_key
+
+        meta_path = os.path.join(directory, JOURNAL_META_FILENAME)
+        previous_key = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                previous_key = json.load(f).get("run_key")
+
+        if not resume or previous_key != run_key:
+            if resume and previous_key is not None:
+                print(f"Checkpoint in {directory} is from different inputs, starting over")
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            self._truncate_torn_line()
+
+        os.makedirs(directory, exist_ok=True)
+        with open(meta_path, "w") as f:
+            json.dump({"run_key": run_key}, f)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, JOURNAL_FILENAME)
+
+    def _payload_path(self, unit: str) -> str:
+        return os.path.join(self.directory, f"{unit}.pkl")
+
+    def _truncate_torn_line(self) -> None:
+        """
+        Cut the journal back to its last complete line.
+        """
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                print(f"Dropping a partly written record from {self.path}")
+                f.truncate(end)
+
+    def records(self) -> list[dict]:
+        """
+        Records of the completed units, in completion order.
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def completed(self) -> set[str]:
+        return {record["unit"] for record in self.records()}
+
+    def append(self, unit: str, record: dict, payload: Any = None) -> None:
+        """
+        Mark `unit` complete with its `record` (JSON-friendly) and optional
+        `payload` (pickled).
+        """
+        if payload is not None:
+            self.save_payload(unit, payload)
+
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"unit": unit, **record}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save_payload(self, unit: str, payload: Any) -> None:
+        """
+        Pickle `payload` under `unit`, replacing any earlier one, without
+        marking the unit complete.
+        """
+        path = self._payload_path(unit)
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    def load_payload(self, unit: str) -> Optional[Any]:
+        path = self._payload_path(unit)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
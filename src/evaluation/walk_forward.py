@@ -0,0 +1,412 @@
+# src/evaluation/walk_forward.py
+
+from __future__ import annotations
+
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+import pandas as pd
+
+from src.evaluation.checkpoint import RunJournal
+from src.feature_cache import cache_key
+from src.long_dataset import LongDataset
+
+
+# RAM-backed on Linux, so the shared dataset never touches the disk
+_SHARED_DIR = "/dev/shm"
+
+# Journal payload holding the artifacts an `update` model carries forward
+CARRIED_STATE_UNIT = "carried_state"
+
+
+@dataclass
+class WalkForwardModel:
+    """
+    A model family as the walk-forward engine uses it.
+
+    - fit(train_df, feature_cols, target_col, **fit_kwargs) -> artifacts
+    - predict(artifacts, df, pred_col=...) -> df with the prediction column
+    - importances(artifacts) -> pd.Series or None
+    - update(artifacts, train_df, feature_cols, target_col, **fit_kwargs)
+      -> artifacts, optional: refreshes the previous month's model instead
+      of fitting from scratch
+    - describe(artifacts) -> dict, optional: details kept with each fold
+
+    The models in src.models (Ridge, Random Forest, XGBoost, MLP) follow
+    this signature; the LSTM plugs in through the methods of
+    src.models.lstm_model.LSTMWalkForward. With workers > 1 the functions
+    are sent to worker processes, so they must be module-level functions
+    or methods of picklable objects.
+    """
+    fit: Callable[..., Any]
+    predict: Callable[..., pd.DataFrame]
+    importances: Optional[Callable[[Any], Optional[pd.Series]]] = None
+    fit_kwargs: dict = field(default_factory=dict)
+    update: Optional[Callable[..., Any]] = None
+    describe: Optional[Callable[[Any], dict]] = None
+
+
+@dataclass
+class WalkForwardFold:
+    date: pd.Timestamp
+    predictions: pd.DataFrame
+    importances: Optional[pd.Series]
+    n_train_months: int
+    fit_seconds: float = 0.0
+    info: dict = field(default_factory=dict)
+
+
+def feature_importances(artifacts: Any) -> Optional[pd.Series]:
+    """
+    `feature_importances_` of fitted artifacts, None for models without one.
+    """
+    return getattr(artifacts, "feature_importances_", None)
+
+
+def split_jobs(workers: int, inner_jobs: Optional[int] = None) -> tuple[int, int]:
+    """
+    Outer (months in parallel) and inner (n_jobs per fit) parallelism.
+    Without an explicit `inner_jobs`, a single worker keeps n_jobs=-1 and
+    several workers share the cores between them.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1.")
+    if inner_jobs is None:
+        inner_jobs = -1 if workers == 1 else max(1, (os.cpu_count() or 1) // workers)
+    return workers, inner_jobs
+
+
+def walk_forward_from_config() -> tuple[int, int]:
+    """
+    (workers, inner n_jobs) from the WALK_FORWARD_* settings in src.config.
+    """
+    from src import config
+
+    return split_jobs(
+        getattr(config, "WALK_FORWARD_WORKERS", 1),
+        getattr(config, "WALK_FORWARD_INNER_JOBS", None),
+    )
+
+
+# =========================
+# FOLDS
+# =========================
+
+def _fit_predict_fold(
+    data: LongDataset,
+    current_date: pd.Timestamp,
+    model: WalkForwardModel,
+    feature_cols: list[str],
+    target_col: str,
+    pred_col: str,
+    previous: Any = None,
+) -> tuple[Optional[WalkForwardFold], Any]:
+    """
+    Fit on all rows dated strictly before `current_date` (updating
+    `previous` when the model supports it) and predict the rows of that
+    month. Returns the fold, None when either side is empty, and the
+    artifacts to carry to the next month.
+    """
+    fold_train = data.before(current_date)
+    fold_test = data.on(current_date)
+
+    if fold_train.empty or fold_test.empty:
+        return None, previous
+
+    start = time.perf_counter()
+    if previous is not None and model.update is not None:
+        artifacts = model.update(previous, fold_train, feature_cols, target_col, **model.fit_kwargs)
+    else:
+        artifacts = model.fit(fold_train, feature_cols, target_col, **model.fit_kwargs)
+    fit_seconds = time.perf_counter() - start
+    predictions = model.predict(artifacts, fold_test, pred_col=pred_col)
+
+    importances = None if model.importances is None else model.importances(artifacts)
+    if importances is not None:
+        importances = importances.rename(current_date)
+
+    fold = WalkForwardFold(
+        date=current_date,
+        predictions=predictions,
+        importances=importances,
+        n_train_months=len(fold_train.dates),
+        fit_seconds=fit_seconds,
+        info={} if model.describe is None else model.describe(artifacts),
+    )
+    return fold, artifacts
+
+
+# Dataset of the current worker process, loaded once by `_init_worker`
+_worker_data: Optional[LongDataset] = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_data
+    with open(path, "rb") as f:
+        _worker_data = pickle.load(f)
+
+
+def _fit_predict_fold_in_worker(
+    current_date: pd.Timestamp,
+    model: WalkForwardModel,
+    feature_cols: list[str],
+    target_col: str,
+    pred_col: str,
+) -> Optional[WalkForwardFold]:
+    fold, _ = _fit_predict_fold(_worker_data, current_date, model, feature_cols, target_col, pred_col)
+    return fold
+
+
+def _iter_folds(
+    data: LongDataset,
+    test_dates: list[pd.Timestamp],
+    model: WalkForwardModel,
+    feature_cols: list[str],
+    target_col: str,
+    pred_col: str,
+    workers: int,
+    previous: Any = None,
+) -> Iterable[tuple[Optional[WalkForwardFold], Any]]:
+    """
+    (fold, artifacts) as folds complete: in date order serially, in
+    completion order on a process pool (artifacts None). The dataset is
+    written once for the workers to load. Models with an `update` carry
+    state from month to month, starting from `previous`, and always run
+    serially.
+    """
+    if workers == 1 or len(test_dates) <= 1 or model.update is not None:
+        artifacts = previous
+        for current_date in test_dates:
+            fold, artifacts = _fit_predict_fold(
+                data, current_date, model, feature_cols, target_col, pred_col, previous=artifacts
+            )
+            yield fold, artifacts
+        return
+
+    shared_dir = tempfile.mkdtemp(prefix="walk_forward_", dir=_SHARED_DIR if os.path.isdir(_SHARED_DIR) else None)
+    try:
+        path = os.path.join(shared_dir, "dataset.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(test_dates)),
+            initializer=_init_worker,
+            initargs=(path,),
+        ) as pool:
+            futures = [
+                pool.submit(_fit_predict_fold_in_worker, current_date, model, feature_cols, target_col, pred_col)
+                for current_date in test_dates
+            ]
+            for future in as_completed(futures):
+                yield future.result(), None
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+# =========================
+# CHECKPOINTS
+# =========================
+
+def _callable_name(fn: Optional[Callable[..., Any]]) -> Optional[str]:
+    # Functions routed through the model store are named by what they wrap
+    fn = getattr(fn, "fit", fn)
+    return None if fn is None else f"{fn.__module__}.{fn.__qualname__}"
+
+
+def walk_forward_run_key(
+    data: LongDataset,
+    test_dates: list[pd.Timestamp],
+    model: WalkForwardModel,
+    pred_col: str,
+    settings: Optional[dict] = None,
+) -> str:
+    """
+    Hash of everything a walk-forward run's folds depend on: the data, the
+    test months, the model functions and fit arguments (n_jobs aside) and
+    the caller's `settings` (e.g. the model's hyperparameters).
+    """
+    from src.model_store import RUNTIME_FIT_KWARGS, training_fingerprint
+
+    fingerprint, _ = training_fingerprint(data, data.feature_cols, data.target_col)
+    return cache_key(
+        "walk_forward",
+        fingerprint,
+        [str(date.date()) for date in test_dates],
+        _callable_name(model.fit),
+        _callable_name(model.update),
+        {name: value for name, value in model.fit_kwargs.items() if name not in RUNTIME_FIT_KWARGS},
+        pred_col,
+        settings or {},
+    )
+
+
+def _fold_unit(date: pd.Timestamp) -> str:
+    return f"fold_{date.date()}"
+
+
+def _fold_record(fold: WalkForwardFold, target_col: str, pred_col: str) -> dict:
+    record = {
+        "date": str(fold.date.date()),
+        "n_train_months": fold.n_train_months,
+        "n_rows": len(fold.predictions),
+        "fit_seconds": fold.fit_seconds,
+        "info": fold.info,
+    }
+    if target_col in fold.predictions:
+        errors = fold.predictions[pred_col] - fold.predictions[target_col]
+        record["rmse"] = float((errors ** 2).mean() ** 0.5)
+    return record
+
+
+# =========================
+# ENGINE
+# =========================
+
+def walk_forward_predict(
+    ml_all: pd.DataFrame | LongDataset,
+    test_dates: Iterable[pd.Timestamp],
+    model: WalkForwardModel,
+    feature_cols: list[str],
+    target_col: str,
+    pred_col: str = "pred_return",
+    workers: int = 1,
+    on_fold: Optional[Callable[[WalkForwardFold], None]] = None,
+    checkpoint_dir: Optional[str] = None,
+    resume: bool = False,
+    run_settings: Optional[dict] = None,
+) -> tuple[pd.DataFrame, Optional[pd.Series]]:
+    """
+    Expanding-window walk-forward over `test_dates`: for each month, fit on
+    all rows of `ml_all` dated strictly before it and predict that month.
+
+    Folds are row slices of one LongDataset (built from `ml_all` unless
+    given), so no fold masks or copies the table.
+
+    Folds are independent, so with workers > 1 they run on a process pool;
+    `on_fold` sees each fold as it completes. Results are assembled in date
+    order and match the serial loop.
+
+    With `checkpoint_dir`, each completed month (predictions, importances,
+    fit time and RMSE) is appended to a RunJournal there. With `resume`,
+    months already in the journal of a run with the same inputs (see
+    `walk_forward_run_key`) are loaded instead of refitted, and passed to
+    `on_fold` like the others. For a model with an `update`, the artifacts
+    of the latest month are checkpointed too, and a resumed run continues
+    the update chain from them, so it matches an uninterrupted one.
+
+    Returns
+    -------
+    predictions : pd.DataFrame
+        Out-of-sample predictions of every test month.
+    mean_importance : pd.Series or None
+        Mean feature importance across folds, None without importances.
+    """
+    test_dates = [pd.Timestamp(d) for d in test_dates]
+    data = LongDataset.from_long(ml_all, feature_cols, target_col)
+
+    folds = []
+    journal = None
+    previous = None
+    carry = model.update is not None
+    if checkpoint_dir is not None:
+        run_key = walk_forward_run_key(data, test_dates, model, pred_col, settings=run_settings)
+        journal = RunJournal(checkpoint_dir, run_key, resume=resume)
+
+        done = journal.completed()
+        if carry and done:
+            # Months after the checkpointed artifacts (a crash between the
+            # two writes) are recomputed from them
+            state = journal.load_payload(CARRIED_STATE_UNIT)
+            if state is None:
+                done = set()
+            else:
+                previous = state["artifacts"]
+                done = {_fold_unit(d) for d in test_dates if d <= state["date"] and _fold_unit(d) in done}
+        for current_date in test_dates:
+            fold = journal.load_payload(_fold_unit(current_date)) if _fold_unit(current_date) in done else None
+            if fold is not None:
+                if on_fold is not None:
+                    on_fold(fold)
+                folds.append(fold)
+        test_dates = [d for d in test_dates if _fold_unit(d) not in done]
+        if folds:
+            print(f"Resumed {len(folds)} months from {checkpoint_dir}, {len(test_dates)} left")
+
+    for fold, artifacts in _iter_folds(
+        data, test_dates, model, feature_cols, target_col, pred_col, workers, previous=previous
+    ):
+        if fold is None:
+            continue
+        if journal is not None:
+            journal.append(_fold_unit(fold.date), _fold_record(fold, target_col, pred_col), payload=fold)
+            if carry:
+                journal.save_payload(CARRIED_STATE_UNIT, {"date": fold.date, "artifacts": artifacts})
+        if on_fold is not None:
+            on_fold(fold)
+        folds.append(fold)
+
+    if not folds:
+        raise ValueError("No rolling predictions were generated for test period.")
+
+    folds.sort(key=lambda fold: fold.date)
+    predictions = pd.concat([fold.predictions for fold in folds]).sort_index()
+
+    importances = [fold.importances for fold in folds if fold.importances is not None]
+    if not importances:
+        return predictions, None
+
+    mean_importance = pd.concat(importances, axis=1).mean(axis=1).sort_values(ascending=False)
+    mean_importance.name = "importance_mean"
+    return predictions, mean_importance
+
+
+def prediction_drift(
+    predictions: pd.DataFrame,
+    reference: pd.DataFrame,
+    pred_col: str = "pred_return",
+) -> pd.DataFrame:
+    """
+    Per-month gap between two sets of (date, ticker) predictions, e.g. an
+    incrementally updated model against full refits: mean and max absolute
+    difference, and Pearson / Spearman correlation across tickers.
+    """
+    paired = pd.concat(
+        [predictions[pred_col].rename("pred"), reference[pred_col].rename("reference")],
+        axis=1,
+        join="inner",
+    )
+    paired["abs_diff"] = (paired["pred"] - paired["reference"]).abs()
+
+    rows = []
+    for date, group in paired.groupby(level="date"):
+        rows.append({
+            "date": date,
+            "mean_abs_diff": float(group["abs_diff"].mean()),
+            "max_abs_diff": float(group["abs_diff"].max()),
+            "corr": float(group["pred"].corr(group["reference"])),
+            "rank_corr": float(group["pred"].corr(group["reference"], method="spearman")),
+        })
+    return pd.DataFrame(rows).set_index("date")
+
+
+def monthly_rmse(
+    predictions: pd.DataFrame,
+    target_col: str,
+    pred_col: str = "pred_return",
+) -> pd.Series:
+    """
+    RMSE of the predictions against the target, per month.
+    """
+    squared = (predictions[pred_col] - predictions[target_col]) ** 2
+    return squared.groupby(level="date").mean() ** 0.5
+
+
+def print_fold(fold: WalkForwardFold) -> None:
+    print(f"Predicted {fold.date.date()} using {fold.n_train_months} train months")
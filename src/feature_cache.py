@@ -0,0 +1,217 @@
+# src/feature_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_SUFFIX = ".pkl"
+
+
+# =========================
+# FINGERPRINTS
+# =========================
+
+def fingerprint_frame(df: pd.DataFrame | pd.Series) -> str:
+    """
+    Content hash of a dataframe or series: values, index and column labels.
+    """
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    if isinstance(df, pd.DataFrame):
+        digest.update(repr(list(df.columns)).encode("utf-8"))
+        digest.update(repr([str(dtype) for dtype in df.dtypes]).encode("utf-8"))
+    else:
+        digest.update(repr((df.name, str(df.dtype))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint_modules(*modules: ModuleType) -> str:
+    """
+    Hash of the source files of `modules`, so cached results are rebuilt
+    after the code that produced them changes.
+    """
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(inspect.getsourcefile(module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    """
+    JSON-friendly form of a key part; tuples and lists are treated alike.
+    """
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def cache_key(*parts: Any) -> str:
+    """
+    Key for a cached result from its name, input fingerprints and settings.
+    """
+    payload = json.dumps(_canonical(list(parts)), sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# =========================
+# CACHE
+# =========================
+
+class FeatureCache:
+    """
+    Content-addressed store of built features under `root`.
+
+    Entries are pickles named by key. Loading an entry refreshes its
+    modification time, and after each store the least recently used entries
+    are evicted until the directory holds at most `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}{CACHE_SUFFIX}")
+
+    def load(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def store(self, key: str, value: Any) -> None:
+        os.makedirs(self.root, exist_ok=True)
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        self.evict(keep=key)
+
+    def get_or_build(self, key: str, build: Callable[[], Any]) -> Any:
+        """
+        Cached value for `key`, building and storing it on a miss.
+        """
+        value = self.load(key)
+        if value is None:
+            value = build()
+            self.store(key, value)
+        return value
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            stat = os.stat(path)
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used entries until the cache fits `max_bytes`.
+        The entry `keep` is never removed. Returns the number removed.
+        """
+        if self.max_bytes is None:
+            return 0
+
+        keep_path = self._path(keep) if keep is not None else None
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+
+        removed = 0
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+
+def cached_build(
+    cache: Optional[FeatureCache],
+    name: str,
+    inputs: dict[str, pd.DataFrame | pd.Series],
+    settings: dict,
+    modules: tuple[ModuleType, ...],
+    build: Callable[[], Any],
+) -> Any:
+    """
+    Run `build()` through `cache`, keyed by `name`, the content of `inputs`,
+    the `settings` that shape the output and the source of `modules`.
+    Without a cache, just builds.
+    """
+    if cache is None:
+        return build()
+
+    key = cache_key(
+        name,
+        {input_name: fingerprint_frame(frame) for input_name, frame in inputs.items()},
+        settings,
+        fingerprint_modules(*modules),
+    )
+
+    value = cache.load(key)
+    if value is not None:
+        print(f"Feature cache hit: {name} ({key[:12]})")
+        return value
+
+    print(f"Feature cache miss: {name} ({key[:12]}), building")
+    hits_before = cache.hits
+    value = build()
+    if cache.hits > hits_before:
+        print(f"Reused {cache.hits - hits_before} cached features")
+    cache.store(key, value)
+    return value
+
+
+def feature_cache_from_config() -> Optional[FeatureCache]:
+    """
+    Cache described by the FEATURE_CACHE_* settings in src.config, or None
+    when caching is turned off.
+    """
+    from src import config
+
+    if not getattr(config, "USE_FEATURE_CACHE", False):
+        return None
+
+    return FeatureCache(
+        root=getattr(config, "FEATURE_CACHE_DIR", "data/cache/features"),
+        max_bytes=getattr(config, "FEATURE_CACHE_MAX_BYTES", None),
+    )
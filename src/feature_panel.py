@@ -0,0 +1,305 @@
+# src/feature_panel.py
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.compact_dataset import from_compact
+
+
+PANEL_VALUES_FILENAME = "values.npy"
+PANEL_TARGET_FILENAME = "target.npy"
+PANEL_META_FILENAME = "meta.json"
+
+
+@dataclass
+class FeaturePanel:
+    """
+    Dataset as one contiguous (T, N, F) array over (date, ticker, feature).
+
+    - values: features, NaN where missing
+    - target: (T, N) target, NaN where missing
+    - mask: (T, N) cells with every feature and the target present; these
+      are exactly the rows of the long dataset
+
+    Tickers are sorted, so masked cells in row-major order follow the long
+    dataset's (date, ticker) sort order.
+    """
+    values: np.ndarray
+    target: np.ndarray
+    dates: pd.DatetimeIndex
+    tickers: pd.Index
+    feature_names: list[str]
+    target_name: str
+    mask: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        shape = (len(self.dates), len(self.tickers), len(self.feature_names))
+        if self.values.shape != shape:
+            raise ValueError(f"values shape {self.values.shape} does not match axes {shape}.")
+        if self.target.shape != shape[:2]:
+            raise ValueError(f"target shape {self.target.shape} does not match axes {shape[:2]}.")
+
+        self.mask = ~np.isnan(self.values).any(axis=2) & ~np.isnan(self.target)
+
+    # ----- construction -----
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: dict[str, pd.DataFrame],
+        target: pd.DataFrame,
+        target_name: str,
+        dtype: np.dtype = np.float32,
+    ) -> "FeaturePanel":
+        """
+        Build a panel from wide date x ticker frames, one per feature.
+
+        Only dates and tickers present in every frame and in `target` are
+        kept, like the inner join of the long dataset.
+        """
+        dates = target.index
+        tickers = target.columns
+        for frame in frames.values():
+            dates = dates.intersection(frame.index)
+            tickers = tickers.intersection(frame.columns)
+
+        dates = pd.DatetimeIndex(dates.sort_values(), name="date")
+        tickers = pd.Index(sorted(tickers), name="ticker")
+
+        values = np.empty((len(dates), len(tickers), len(frames)), dtype=dtype)
+        for position, frame in enumerate(frames.values()):
+            values[:, :, position] = _aligned(frame, dates, tickers)
+
+        return cls(
+            values=values,
+            target=_aligned(target, dates, tickers).astype(dtype),
+            dates=dates,
+            tickers=tickers,
+            feature_names=list(frames),
+            target_name=target_name,
+        )
+
+    @classmethod
+    def from_long(
+        cls,
+        df_long: pd.DataFrame,
+        target_col: str,
+        dtype: np.dtype = np.float32,
+    ) -> "FeaturePanel":
+        """
+        Build a panel from a long (date, ticker) dataset.
+        """
+        if not isinstance(df_long.index, pd.MultiIndex):
+            raise ValueError("df_long must be indexed by (date, ticker).")
+
+        row_dates = pd.DatetimeIndex(df_long.index.get_level_values("date"))
+        row_tickers = df_long.index.get_level_values("ticker")
+
+        dates = pd.DatetimeIndex(row_dates.unique().sort_values(), name="date")
+        tickers = pd.Index(sorted(row_tickers.unique()), name="ticker")
+        t_idx = dates.get_indexer(row_dates)
+        n_idx = tickers.get_indexer(row_tickers)
+
+        feature_names = [c for c in df_long.columns if c != target_col]
+
+        values = np.full((len(dates), len(tickers), len(feature_names)), np.nan, dtype=dtype)
+        values[t_idx, n_idx] = df_long[feature_names].to_numpy(dtype=dtype)
+
+        target = np.full((len(dates), len(tickers)), np.nan, dtype=dtype)
+        target[t_idx, n_idx] = df_long[target_col].to_numpy(dtype=dtype)
+
+        return cls(
+            values=values,
+            target=target,
+            dates=dates,
+            tickers=tickers,
+            feature_names=feature_names,
+            target_name=target_col,
+        )
+
+    # ----- views -----
+
+    def feature_index(self, names: list[str]) -> np.ndarray:
+        missing = [name for name in names if name not in self.feature_names]
+        if missing:
+            raise ValueError(f"Features not in panel: {missing}")
+        return np.array([self.feature_names.index(name) for name in names], dtype=np.int64)
+
+    def feature_frame(self, name: str) -> pd.DataFrame:
+        """
+        Wide date x ticker frame of one feature, as a view of the panel.
+        """
+        position = self.feature_names.index(name)
+        return pd.DataFrame(
+            self.values[:, :, position],
+            index=self.dates,
+            columns=self.tickers,
+            copy=False,
+        )
+
+    def flat(self) -> np.ndarray:
+        """
+        (T * N, F) view of all cells, row-major over (date, ticker). Use
+        `np.flatnonzero(panel.mask)` to pick the dataset rows.
+        """
+        return self.values.reshape(-1, self.values.shape[2])
+
+    def xy(self, feature_cols: Optional[list[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Feature matrix X and target y over the dataset rows, in long order.
+
+        Gathers straight from the panel, without building a long frame.
+        """
+        rows = np.flatnonzero(self.mask)
+        X = self.flat()[rows]
+        if feature_cols is not None and list(feature_cols) != self.feature_names:
+            X = X[:, self.feature_index(list(feature_cols))]
+        return X, self.target.reshape(-1)[rows]
+
+    def windows(self, length: int) -> np.ndarray:
+        """
+        Sliding windows over dates as a (T - length + 1, N, length, F) view;
+        element [i, n] is ticker n's sequence ending at dates[i + length - 1].
+        """
+        if not 1 <= length <= len(self.dates):
+            raise ValueError("length must be between 1 and the number of dates.")
+        view = np.lib.stride_tricks.sliding_window_view(self.values, length, axis=0)
+        return np.moveaxis(view, 3, 2)
+
+    def slice_dates(
+        self,
+        start: Optional[str | pd.Timestamp] = None,
+        end: Optional[str | pd.Timestamp] = None,
+    ) -> "FeaturePanel":
+        """
+        Panel restricted to start <= date <= end, sharing memory with this one.
+        """
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return FeaturePanel(
+            values=self.values[lo:hi],
+            target=self.target[lo:hi],
+            dates=self.dates[lo:hi],
+            tickers=self.tickers,
+            feature_names=self.feature_names,
+            target_name=self.target_name,
+        )
+
+    def split_by_date(self, train_end_date: str, test_start_date: str) -> Tuple["FeaturePanel", "FeaturePanel"]:
+        """
+        Train (date <= train_end_date) and test (date >= test_start_date) views.
+        """
+        return self.slice_dates(end=train_end_date), self.slice_dates(start=test_start_date)
+
+    def to_long(self) -> pd.DataFrame:
+        """
+        Long (date, ticker) dataset with feature columns and the target, as
+        float64; same layout as the parquet feature tables.
+        """
+        t_idx, n_idx = np.nonzero(self.mask)
+        index = pd.MultiIndex.from_arrays(
+            [self.dates[t_idx], self.tickers[n_idx]],
+            names=["date", "ticker"],
+        )
+        out = pd.DataFrame(
+            self.values[t_idx, n_idx].astype(np.float64, copy=False),
+            index=index,
+            columns=self.feature_names,
+        )
+        out[self.target_name] = self.target[t_idx, n_idx].astype(np.float64, copy=False)
+        return out
+
+
+def _aligned(frame: pd.DataFrame, dates: pd.DatetimeIndex, tickers: pd.Index) -> np.ndarray:
+    return frame.reindex(index=dates, columns=tickers).to_numpy(dtype=np.float64)
+
+
+# =========================
+# STORAGE
+# =========================
+
+def _save_array_atomic(array: np.ndarray, path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def save_feature_panel(panel: FeaturePanel, directory: str) -> None:
+    """
+    Save a panel as raw .npy arrays plus a JSON file with the axes.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    _save_array_atomic(panel.values, os.path.join(directory, PANEL_VALUES_FILENAME))
+    _save_array_atomic(panel.target, os.path.join(directory, PANEL_TARGET_FILENAME))
+
+    meta = {
+        "dates": [d.isoformat() for d in panel.dates],
+        "tickers": [str(t) for t in panel.tickers],
+        "feature_names": list(panel.feature_names),
+        "target_name": panel.target_name,
+    }
+    meta_path = os.path.join(directory, PANEL_META_FILENAME)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+def feature_panel_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, PANEL_META_FILENAME))
+
+
+def load_feature_panel(directory: str, mmap: bool = False) -> FeaturePanel:
+    """
+    Load a panel saved with `save_feature_panel`. With mmap, the arrays are
+    memory-mapped read-only instead of read into memory.
+    """
+    with open(os.path.join(directory, PANEL_META_FILENAME)) as f:
+        meta = json.load(f)
+
+    mmap_mode = "r" if mmap else None
+    return FeaturePanel(
+        values=np.load(os.path.join(directory, PANEL_VALUES_FILENAME), mmap_mode=mmap_mode),
+        target=np.load(os.path.join(directory, PANEL_TARGET_FILENAME), mmap_mode=mmap_mode),
+        dates=pd.DatetimeIndex(pd.to_datetime(meta["dates"]), name="date"),
+        tickers=pd.Index(meta["tickers"], name="ticker"),
+        feature_names=list(meta["feature_names"]),
+        target_name=meta["target_name"],
+    )
+
+
+def read_feature_split(paths: dict, split: str) -> pd.DataFrame:
+    """
+    Long train/test/full table of a feature source.
+
+    Tables saved in the compact layout are returned with the (date, ticker)
+    index restored and float32 features.
+
+    With FEATURE_DATASET_FORMAT = "panel" in src.config and a saved panel,
+    the split is sliced by date from the panel; otherwise the parquet table
+    is read.
+    """
+    from src import config
+
+    if split not in {"full", "train", "test"}:
+        raise ValueError(f"Unsupported split: {split}")
+
+    use_panel = getattr(config, "FEATURE_DATASET_FORMAT", "parquet") == "panel"
+    if not use_panel or not feature_panel_exists(paths["panel"]):
+        # Compact tables get their (date, ticker) index back; features stay float32
+        return from_compact(pd.read_parquet(paths[split]))
+
+    panel = load_feature_panel(paths["panel"])
+    if split == "train":
+        panel = panel.slice_dates(end=config.TRAIN_END_DATE)
+    elif split == "test":
+        panel = panel.slice_dates(start=config.TEST_START_DATE)
+    return panel.to_long()
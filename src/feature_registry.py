@@ -0,0 +1,705 @@
+# src/feature_registry.py
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src import kernels
+from src.feature_cache import FeatureCache, cache_key, fingerprint_frame, fingerprint_modules
+
+
+# =========================
+# REGISTRY
+# =========================
+
+@dataclass(frozen=True)
+class FeatureDefinition:
+    """
+    A registered feature.
+
+    `formula(ev, **params)` computes the feature from graph nodes requested
+    through `ev` (inputs and rolling kernels), with plain numpy arithmetic.
+    `grid` names the input whose daily index and columns the feature lives on;
+    a `source` param, when given, overrides it.
+    """
+    family: str
+    grid: str
+    formula: Callable[..., np.ndarray]
+
+
+FEATURE_REGISTRY: dict[str, FeatureDefinition] = {}
+DERIVED_INPUTS: dict[str, Callable[["FeatureGraph"], pd.DataFrame]] = {}
+
+KERNEL_TYPES: dict[str, type] = {
+    "sum": kernels.RollingSum,
+    "mean": kernels.RollingMean,
+    "compound_return": kernels.RollingCompoundReturn,
+    "std": kernels.RollingStd,
+    "var": kernels.RollingVar,
+    "max": kernels.RollingMax,
+    "min": kernels.RollingMin,
+    "cov": kernels.RollingCov,
+}
+
+
+def register_feature(family: str, grid: str):
+    """
+    Decorator registering `formula` as feature family `family`.
+    """
+    def decorator(formula: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        if family in FEATURE_REGISTRY:
+            raise ValueError(f"Feature family already registered: {family}")
+        FEATURE_REGISTRY[family] = FeatureDefinition(family=family, grid=grid, formula=formula)
+        return formula
+
+    return decorator
+
+
+def register_input(name: str):
+    """
+    Decorator registering a derived daily input computed from other inputs,
+    e.g. gains and losses from adjusted close.
+    """
+    def decorator(builder: Callable[["FeatureGraph"], pd.DataFrame]) -> Callable[["FeatureGraph"], pd.DataFrame]:
+        if name in DERIVED_INPUTS:
+            raise ValueError(f"Derived input already registered: {name}")
+        DERIVED_INPUTS[name] = builder
+        return builder
+
+    return decorator
+
+
+# =========================
+# EVALUATION
+# =========================
+
+class _Evaluator:
+    """
+    Resolves graph nodes for one feature, either on the full daily grid
+    (rows is None) or at selected (row, col) cells.
+
+    Single-column nodes (e.g. the market series) are read at column 0, so
+    they broadcast against the feature's columns.
+    """
+
+    def __init__(
+        self,
+        graph: "FeatureGraph",
+        rows: Optional[np.ndarray] = None,
+        cols: Optional[np.ndarray] = None,
+    ):
+        self.graph = graph
+        self.rows = rows
+        self.cols = cols
+
+    def _cols_for(self, width: int) -> np.ndarray:
+        return np.zeros_like(self.cols) if width == 1 else self.cols
+
+    def input(self, name: str) -> np.ndarray:
+        values = self.graph._input_array(name)
+        if self.rows is None:
+            return values
+        return values[self.rows, self._cols_for(values.shape[1])]
+
+    def rolling(self, kind: str, source: str | tuple[str, ...], window: int, **options) -> np.ndarray:
+        key = ("rolling", kind, source, window, tuple(sorted(options.items())))
+        kernel = self.graph._kernel(key)
+        if self.rows is None:
+            return self.graph._kernel_full(key)
+        return kernel.at(self.rows, self._cols_for(kernel.shape[1]))
+
+    def cov(self, x: str, y: str, window: int, ddof: int = 1) -> np.ndarray:
+        return self.rolling("cov", (x, y), window, ddof=ddof)
+
+
+class _Recorder:
+    """
+    Stand-in evaluator that records which nodes a formula touches.
+    """
+
+    def __init__(self, graph: "FeatureGraph"):
+        self.graph = graph
+        self.nodes: list[Hashable] = []
+
+    def input(self, name: str) -> np.ndarray:
+        self.nodes.append(("input", name))
+        return np.zeros(1)
+
+    def rolling(self, kind: str, source: str | tuple[str, ...], window: int, **options) -> np.ndarray:
+        self.nodes.append(("rolling", kind, source, window, tuple(sorted(options.items()))))
+        return np.zeros(1)
+
+    def cov(self, x: str, y: str, window: int, ddof: int = 1) -> np.ndarray:
+        return self.rolling("cov", (x, y), window, ddof=ddof)
+
+
+@dataclass(frozen=True)
+class PlannedFeature:
+    name: str
+    family: str
+    params: tuple
+    grid: str
+    nodes: tuple
+
+
+class FeatureGraph:
+    """
+    Computes registered features over a shared set of daily inputs.
+
+    Every intermediate (input array, rolling kernel, full kernel output) is a
+    node keyed by what it computes, so identical intermediates requested by
+    different features - e.g. the rolling max behind both distance-from-high
+    and drawdown - are computed once. Identical feature requests under
+    different names are also computed once.
+
+    With keep_intermediates=False, rolling kernels are released after their
+    last consumer in a `compute` call. Keep them when the same graph is passed to several
+    builders, so later builders reuse earlier work.
+
+    With a `cache`, each feature is stored under its family, params, mode
+    and the fingerprint of the graph inputs, so changing one window only
+    recomputes the features that use it.
+
+    With `prefix_states` (from `prefix_states()` of a graph over a longer
+    history), the inputs are a trailing slice of that history and prefix-sum
+    kernels continue the saved sums from row `state_row`, so features at
+    rows whose windows start at or after `state_row` match the graph over the
+    whole history bit for bit.
+
+    With workers > 1, `compute` splits the features into groups that share
+    no rolling kernel and computes the groups in a process pool; inputs are
+    passed as memory-mapped arrays and intermediates stay in the workers.
+    """
+
+    def __init__(
+        self,
+        inputs: dict[str, pd.DataFrame | pd.Series],
+        keep_intermediates: bool = False,
+        cache: Optional[FeatureCache] = None,
+        prefix_states: Optional[dict[tuple, kernels.PrefixState]] = None,
+        state_row: int = 0,
+        workers: int = 1,
+    ):
+        if cache is not None and prefix_states is not None:
+            raise ValueError("A graph continuing saved prefix states cannot use the feature cache.")
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if workers > 1 and prefix_states is not None:
+            raise ValueError("A graph continuing saved prefix states must run with one worker.")
+
+        self.inputs: dict[str, pd.DataFrame] = {}
+        self._inputs_fingerprint: Optional[str] = None
+        for name, frame in inputs.items():
+            self.add_input(name, frame)
+
+        self.keep_intermediates = keep_intermediates
+        self.cache = cache
+        self.saved_prefix_states = prefix_states
+        self.state_row = state_row
+        self.workers = workers
+        self._nodes: dict[Hashable, object] = {}
+        self.computed_nodes: Counter = Counter()
+
+    def add_input(self, name: str, frame: pd.DataFrame | pd.Series) -> None:
+        """
+        Add a daily input. Inputs are fixed once set, since cached nodes are
+        built from them.
+        """
+        if name in self.inputs:
+            raise ValueError(f"Feature input already set: {name}")
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame(frame.name if frame.name is not None else name)
+        self.inputs[name] = frame
+        self._inputs_fingerprint = None
+
+    def inputs_fingerprint(self) -> str:
+        if self._inputs_fingerprint is None:
+            self._inputs_fingerprint = cache_key(
+                sorted((name, fingerprint_frame(frame)) for name, frame in self.inputs.items())
+            )
+        return self._inputs_fingerprint
+
+    # ----- nodes -----
+
+    def _node(self, key: Hashable, build: Callable[[], object]) -> object:
+        if key not in self._nodes:
+            self._nodes[key] = build()
+            self.computed_nodes[key] += 1
+        return self._nodes[key]
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """
+        Daily input by name, building registered derived inputs on demand.
+        """
+        if name in self.inputs:
+            return self.inputs[name]
+        if name in DERIVED_INPUTS:
+            return self._node(("derived", name), lambda: DERIVED_INPUTS[name](self))
+        raise ValueError(f"Unknown feature input: {name}")
+
+    def _input_array(self, name: str) -> np.ndarray:
+        return self._node(("input", name), lambda: self.frame(name).to_numpy(dtype=float))
+
+    def _kernel(self, key: tuple) -> kernels.RollingKernel:
+        _, kind, source, window, options = key
+
+        base_key = ("base", kind, source, options)
+
+        def build() -> kernels.RollingKernel:
+            # Prefix-sum kernels of the same input serve every window, e.g. a
+            # sweep of beta windows shares one set of x, y and xy prefixes
+            if base_key in self._nodes:
+                return self._nodes[base_key].with_window(window)
+
+            kernel_type = KERNEL_TYPES[kind]
+            sources = source if isinstance(source, tuple) else (source,)
+            arrays = [self._input_array(name) for name in sources]
+            if not hasattr(kernel_type, "with_window"):
+                return kernel_type(*arrays, window, **dict(options))
+
+            state = None
+            if self.saved_prefix_states is not None:
+                if base_key not in self.saved_prefix_states:
+                    raise ValueError(f"No saved prefix state for kernel: {base_key[1:]}")
+                state = self.saved_prefix_states[base_key]
+            kernel = kernel_type(*arrays, window, **dict(options), state=state, start=self.state_row)
+            self._nodes[base_key] = kernel
+            return kernel
+
+        return self._node(("kernel",) + key[1:], build)
+
+    def _kernel_full(self, key: tuple) -> np.ndarray:
+        return self._node(("full",) + key[1:], lambda: self._kernel(key).full())
+
+    def _release(self, key: Hashable, remaining: Counter) -> None:
+        """
+        Drop a rolling kernel and its full output, and the shared prefix
+        kernel once no pending request needs another window of it; input
+        arrays are kept.
+        """
+        if key[0] != "rolling":
+            return
+        self._nodes.pop(("kernel",) + key[1:], None)
+        self._nodes.pop(("full",) + key[1:], None)
+
+        _, kind, source, _, options = key
+        still_needed = any(
+            count > 0 and node[0] == "rolling" and node[1:3] == (kind, source) and node[4] == options
+            for node, count in remaining.items()
+        )
+        if not still_needed:
+            self._nodes.pop(("base", kind, source, options), None)
+
+    def max_window(self) -> int:
+        """
+        Longest window among the rolling kernels held by the graph.
+        """
+        return max((key[3] for key in self._nodes if key[0] == "kernel"), default=1)
+
+    def prefix_states(self, row: int) -> dict[tuple, kernels.PrefixState]:
+        """
+        Saved state at daily row `row` of every prefix-sum kernel still held
+        by the graph (all of them with keep_intermediates=True).
+        """
+        return {
+            key: kernel.state_at(row)
+            for key, kernel in self._nodes.items()
+            if key[0] == "base"
+        }
+
+    # ----- features -----
+
+    def plan(self, requests: dict[str, tuple[str, dict]]) -> list[PlannedFeature]:
+        """
+        Resolve feature requests {name: (family, params)} into planned features
+        with the graph nodes each one depends on.
+        """
+        planned = []
+        for name, (family, params) in requests.items():
+            if family not in FEATURE_REGISTRY:
+                raise ValueError(f"Unknown feature family: {family}")
+            definition = FEATURE_REGISTRY[family]
+
+            recorder = _Recorder(self)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                definition.formula(recorder, **params)
+
+            planned.append(
+                PlannedFeature(
+                    name=name,
+                    family=family,
+                    params=tuple(sorted(params.items())),
+                    grid=params.get("source", definition.grid),
+                    nodes=tuple(dict.fromkeys(recorder.nodes)),
+                )
+            )
+        return planned
+
+    def compute(
+        self,
+        requests: dict[str, tuple[str, dict]],
+        month_end_only: bool = False,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        Compute features {name: (family, params)} and return {name: frame}.
+
+        Frames are daily, or the exact `resample("ME").last()` month-end
+        sample when month_end_only is set (evaluated only at month-end cells).
+        """
+        planned = self.plan(requests)
+        if self.workers > 1 and len(planned) > 1:
+            return self._compute_parallel(planned, month_end_only)
+
+        remaining = Counter(node for feature in planned for node in feature.nodes)
+
+        results: dict[str, pd.DataFrame] = {}
+        by_signature: dict[tuple, pd.DataFrame] = {}
+
+        for feature in planned:
+            signature = (feature.family, feature.params)
+            if signature not in by_signature:
+                by_signature[signature] = self._cached_feature(feature, month_end_only)
+            results[feature.name] = by_signature[signature]
+
+            for node in feature.nodes:
+                remaining[node] -= 1
+                if remaining[node] == 0 and not self.keep_intermediates:
+                    self._release(node, remaining)
+
+        return results
+
+    def compute_one(self, family: str, month_end_only: bool = False, **params) -> pd.DataFrame:
+        return self.compute({family: (family, params)}, month_end_only=month_end_only)[family]
+
+    def _compute_parallel(self, planned: list[PlannedFeature], month_end_only: bool) -> dict[str, pd.DataFrame]:
+        """
+        `compute` over a process pool. Cache lookups and stores stay in this
+        process; results are gathered in request order.
+        """
+        by_signature: dict[tuple, pd.DataFrame] = {}
+        pending: dict[tuple, PlannedFeature] = {}
+        for feature in planned:
+            signature = (feature.family, feature.params)
+            if signature in by_signature or signature in pending:
+                continue
+            cached = None if self.cache is None else self.cache.load(self._feature_key(feature, month_end_only))
+            if cached is not None:
+                by_signature[signature] = cached
+            else:
+                pending[signature] = feature
+
+        groups = _group_by_kernels(list(pending.values()))
+        if groups:
+            shared_dir = tempfile.mkdtemp(prefix="feature_inputs_", dir=_SHARED_DIR if os.path.isdir(_SHARED_DIR) else None)
+            try:
+                shared = _share_inputs(self.inputs, shared_dir)
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(groups))) as pool:
+                    futures = [
+                        pool.submit(
+                            _compute_group,
+                            shared,
+                            {f"f{i}": (feature.family, dict(feature.params)) for i, feature in enumerate(group)},
+                            month_end_only,
+                        )
+                        for group in groups
+                    ]
+                    for group, future in zip(groups, futures):
+                        computed = future.result()
+                        for i, feature in enumerate(group):
+                            by_signature[(feature.family, feature.params)] = computed[f"f{i}"]
+            finally:
+                shutil.rmtree(shared_dir, ignore_errors=True)
+
+        if self.cache is not None:
+            for signature, feature in pending.items():
+                self.cache.store(self._feature_key(feature, month_end_only), by_signature[signature])
+
+        return {feature.name: by_signature[(feature.family, feature.params)] for feature in planned}
+
+    def _feature_key(self, feature: PlannedFeature, month_end_only: bool) -> str:
+        return cache_key(
+            "feature",
+            feature.family,
+            feature.params,
+            month_end_only,
+            self.inputs_fingerprint(),
+            _code_fingerprint(),
+        )
+
+    def _cached_feature(self, feature: PlannedFeature, month_end_only: bool) -> pd.DataFrame:
+        if self.cache is None:
+            return self._compute_feature(feature, month_end_only)
+
+        key = self._feature_key(feature, month_end_only)
+        return self.cache.get_or_build(key, lambda: self._compute_feature(feature, month_end_only))
+
+    def _compute_feature(self, feature: PlannedFeature, month_end_only: bool) -> pd.DataFrame:
+        definition = FEATURE_REGISTRY[feature.family]
+        params = dict(feature.params)
+        grid = self.frame(feature.grid)
+
+        if month_end_only:
+            return kernels.sample_month_end(
+                grid.index,
+                grid.columns,
+                lambda rows, cols: definition.formula(_Evaluator(self, rows, cols), **params),
+            )
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = definition.formula(_Evaluator(self), **params)
+
+        # Copy, so the frame never shares memory with a cached node
+        values = np.array(np.broadcast_to(values, grid.shape))
+        return pd.DataFrame(values, index=grid.index, columns=grid.columns)
+
+
+_CODE_FINGERPRINT: Optional[str] = None
+
+
+def _code_fingerprint() -> str:
+    global _CODE_FINGERPRINT
+    if _CODE_FINGERPRINT is None:
+        _CODE_FINGERPRINT = fingerprint_modules(kernels, sys.modules[__name__])
+    return _CODE_FINGERPRINT
+
+
+def graph_with_inputs(
+    graph: Optional[FeatureGraph],
+    inputs: dict[str, pd.DataFrame | pd.Series],
+) -> FeatureGraph:
+    """
+    Return `graph` with any missing inputs added, or a new graph over
+    `inputs`. Inputs already in a shared graph are assumed to hold the same
+    data and are reused as they are.
+    """
+    if graph is None:
+        return FeatureGraph(inputs)
+    for name, frame in inputs.items():
+        if name not in graph.inputs:
+            graph.add_input(name, frame)
+    return graph
+
+
+# =========================
+# PARALLEL EXECUTION
+# =========================
+
+# RAM-backed on Linux, so memory-mapped inputs never touch the disk
+_SHARED_DIR = "/dev/shm"
+
+
+@dataclass(frozen=True)
+class _SharedInput:
+    path: str
+    index: pd.Index
+    columns: pd.Index
+
+
+def _share_inputs(inputs: dict[str, pd.DataFrame], directory: str) -> dict[str, _SharedInput]:
+    """
+    Write each input once as a float64 .npy file under `directory`; workers
+    memory-map the files instead of receiving pickled frames.
+    """
+    shared = {}
+    for position, (name, frame) in enumerate(inputs.items()):
+        path = os.path.join(directory, f"input_{position}.npy")
+        np.save(path, frame.to_numpy(dtype=np.float64))
+        shared[name] = _SharedInput(path=path, index=frame.index, columns=frame.columns)
+    return shared
+
+
+def _group_by_kernels(planned: list[PlannedFeature]) -> list[list[PlannedFeature]]:
+    """
+    Split features into groups that share no rolling kernel (of any window),
+    so no worker recomputes another's prefix sums. Groups and the features in
+    them keep request order.
+    """
+    parent = list(range(len(planned)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: dict[tuple, int] = {}
+    for i, feature in enumerate(planned):
+        for node in feature.nodes:
+            if node[0] != "rolling":
+                continue
+            base = (node[1], node[2], node[4])
+            if base in owner:
+                parent[find(i)] = find(owner[base])
+            else:
+                owner[base] = i
+
+    groups: dict[int, list[PlannedFeature]] = {}
+    for i, feature in enumerate(planned):
+        groups.setdefault(find(i), []).append(feature)
+    return list(groups.values())
+
+
+def _compute_group(
+    shared: dict[str, _SharedInput],
+    requests: dict[str, tuple[str, dict]],
+    month_end_only: bool,
+) -> dict[str, pd.DataFrame]:
+    """
+    Worker: compute one group of features over memory-mapped inputs.
+    """
+    inputs = {
+        name: pd.DataFrame(np.load(item.path, mmap_mode="r"), index=item.index, columns=item.columns, copy=False)
+        for name, item in shared.items()
+    }
+    return FeatureGraph(inputs).compute(requests, month_end_only=month_end_only)
+
+
+# =========================
+# DERIVED INPUTS
+# =========================
+
+@register_input("gain")
+def _gain(graph: FeatureGraph) -> pd.DataFrame:
+    return graph.frame("adj_close").diff().clip(lower=0.0)
+
+
+@register_input("loss")
+def _loss(graph: FeatureGraph) -> pd.DataFrame:
+    return -graph.frame("adj_close").diff().clip(upper=0.0)
+
+
+@register_input("equal_weight_returns")
+def _equal_weight_returns(graph: FeatureGraph) -> pd.DataFrame:
+    """
+    Equal-weight market proxy: cross-sectional mean of daily returns.
+    """
+    return graph.frame("daily_returns").mean(axis=1).to_frame("equal_weight")
+
+
+@register_input("daily_range")
+def _daily_range(graph: FeatureGraph) -> pd.DataFrame:
+    close = graph.frame("close")
+    return (graph.frame("high") - graph.frame("low")) / close.replace(0.0, np.nan)
+
+
+@register_input("clv")
+def _close_location_value(graph: FeatureGraph) -> pd.DataFrame:
+    high = graph.frame("high")
+    low = graph.frame("low")
+    denom = (high - low).replace(0.0, np.nan)
+    return ((graph.frame("close") - low) / denom) - 0.5
+
+
+# =========================
+# FEATURES
+# =========================
+
+@register_feature("ret", grid="daily_returns")
+def _rolling_return(ev, window: int, use_log_returns: bool = False, source: str = "daily_returns"):
+    """
+    Rolling return over `window` trading days (summed log or compounded simple).
+    """
+    kind = "sum" if use_log_returns else "compound_return"
+    return ev.rolling(kind, source, window)
+
+
+@register_feature("vol", grid="daily_returns")
+def _volatility(ev, window: int):
+    """
+    Rolling standard deviation of daily returns.
+    """
+    return ev.rolling("std", "daily_returns", window)
+
+
+@register_feature("ma_ratio", grid="adj_close")
+def _moving_average_ratio(ev, short_window: int, long_window: int):
+    """
+    (MA_short / MA_long) - 1
+    """
+    return (ev.rolling("mean", "adj_close", short_window) / ev.rolling("mean", "adj_close", long_window)) - 1.0
+
+
+@register_feature("price_ma_ratio", grid="adj_close")
+def _price_to_moving_average(ev, window: int):
+    """
+    (P_t / MA) - 1
+    """
+    return (ev.input("adj_close") / ev.rolling("mean", "adj_close", window)) - 1.0
+
+
+@register_feature("dist_high", grid="adj_close")
+def _distance_from_high(ev, window: int):
+    """
+    Distance from rolling high, also used as the drawdown proxy:
+    (P_t / rolling_max) - 1
+    """
+    return (ev.input("adj_close") / ev.rolling("max", "adj_close", window)) - 1.0
+
+
+@register_feature("rsi", grid="adj_close")
+def _rsi(ev, window: int = 14):
+    """
+    RSI from daily price changes.
+    """
+    avg_loss = ev.rolling("mean", "loss", window)
+    rs = ev.rolling("mean", "gain", window) / np.where(avg_loss == 0.0, np.nan, avg_loss)
+    return 100.0 - (100.0 / (1.0 + rs))
+
+
+@register_feature("beta", grid="daily_returns")
+def _beta(ev, window: int, market: str = "market_daily_returns"):
+    """
+    Rolling beta of each stock to market: Cov(stock, market) / Var(market).
+    `market` names a single-column input, e.g. "equal_weight_returns".
+    """
+    return ev.cov("daily_returns", market, window) / ev.rolling("var", market, window)
+
+
+@register_feature("volume_avg", grid="volume")
+def _volume_average(ev, window: int):
+    return ev.rolling("mean", "volume", window)
+
+
+@register_feature("abnormal_volume", grid="volume")
+def _abnormal_volume(ev, window: int):
+    """
+    (V_t / rolling mean volume) - 1
+    """
+    return (ev.input("volume") / ev.rolling("mean", "volume", window)) - 1.0
+
+
+@register_feature("intraday_range", grid="daily_range")
+def _intraday_range(ev, window: int):
+    """
+    Rolling mean of (high - low) / close.
+    """
+    return ev.rolling("mean", "daily_range", window)
+
+
+@register_feature("clv_mean", grid="clv")
+def _clv_mean(ev, window: int):
+    """
+    Rolling mean of the close location value.
+    """
+    return ev.rolling("mean", "clv", window)
+
+
+@register_feature("open_close_ret", grid="close")
+def _open_close_return(ev, use_log_returns: bool = False):
+    """
+    Intraday open-to-close return.
+    """
+    ratio = ev.input("close") / ev.input("open")
+    if use_log_returns:
+        return np.log(ratio)
+    return ratio - 1.0
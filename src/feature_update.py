@@ -0,0 +1,280 @@
+# src/feature_update.py
+
+from __future__ import annotations
+
+import os
+import pickle
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from src import feature_panel, feature_registry, features_daily, features_daily_ohlcv, kernels
+from src.feature_cache import fingerprint_modules
+from src.feature_registry import FeatureGraph
+from src.features_daily import build_daily_feature_dataset
+from src.features_daily_ohlcv import build_daily_ohlcv_feature_dataset
+from src.kernels import PrefixState
+from src.preprocessing import compute_returns, daily_to_monthly_compound
+
+
+UPDATE_SOURCES = ("daily", "daily_ohlcv")
+UPDATE_MODULES = (
+    features_daily_ohlcv,
+    features_daily,
+    feature_registry,
+    feature_panel,
+    kernels,
+    sys.modules[__name__],
+)
+
+
+def daily_settings_from_config(source: str) -> dict:
+    """
+    Builder settings of the daily or daily+OHLCV feature dataset from
+    src.config, shared by the full build and the incremental update.
+    """
+    from src import config
+
+    if source not in UPDATE_SOURCES:
+        raise ValueError(f"Unsupported feature_source for daily settings: {source}")
+
+    settings = {
+        "use_log_returns": config.USE_LOG_RETURNS,
+        "return_windows": config.DAILY_RETURN_WINDOWS,
+        "vol_windows": config.DAILY_VOL_WINDOWS,
+        "ma_pairs": config.DAILY_MA_PAIRS,
+        "high_windows": config.DAILY_HIGH_WINDOWS,
+        "drawdown_windows": config.DAILY_DRAWDOWN_WINDOWS,
+        "beta_windows": config.DAILY_BETA_WINDOWS,
+        "equal_weight_beta_windows": getattr(config, "DAILY_EW_BETA_WINDOWS", None),
+        "rsi_window": config.DAILY_RSI_WINDOW,
+    }
+    if source == "daily_ohlcv":
+        settings.update({
+            "volume_windows": getattr(config, "DAILY_OHLCV_VOL_WINDOWS", [20, 60]),
+            "abnormal_volume_windows": getattr(config, "DAILY_OHLCV_ABVOL_WINDOWS", [20]),
+            "range_windows": getattr(config, "DAILY_OHLCV_RANGE_WINDOWS", [5, 20]),
+            "clv_windows": getattr(config, "DAILY_OHLCV_CLV_WINDOWS", [5, 20]),
+        })
+    settings.update({
+        "target_name": "y_next_1m",
+        "month_end_only": getattr(config, "DAILY_FEATURES_MONTH_END_ONLY", False),
+    })
+    return settings
+
+
+# =========================
+# STATE
+# =========================
+
+@dataclass
+class FeatureUpdateState:
+    """
+    Minimal rolling state to extend a daily feature dataset by new prices.
+
+    - adj_close / ohlcv: trailing prices, reaching back the longest feature
+      window (252 days by default) before the month preceding the last one,
+      plus one warm-up row for returns and price changes
+    - prefix_states: running sums of every rolling kernel (returns, RSI
+      gains/losses, volume, ...) at row `state_row` of that slice
+    - settings, market_ticker, code_fingerprint: what the state was built
+      with; a state is only reused when all three still match
+    """
+    source: str
+    settings: dict
+    market_ticker: Optional[str]
+    code_fingerprint: str
+    adj_close: pd.DataFrame
+    ohlcv: Optional[pd.DataFrame]
+    state_row: int
+    prefix_states: dict[tuple, PrefixState]
+
+    @property
+    def last_date(self) -> pd.Timestamp:
+        return self.adj_close.index[-1]
+
+    def matches(self, source: str, settings: dict, market_ticker: Optional[str]) -> bool:
+        return (
+            self.source == source
+            and self.settings == settings
+            and self.market_ticker == market_ticker
+            and self.code_fingerprint == fingerprint_modules(*UPDATE_MODULES)
+        )
+
+
+def save_update_state(state: FeatureUpdateState, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_update_state(path: str) -> Optional[FeatureUpdateState]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# =========================
+# BUILD AND UPDATE
+# =========================
+
+def _previous_month_start(date: pd.Timestamp) -> pd.Timestamp:
+    return (date.to_period("M") - 1).to_timestamp()
+
+
+def _build_dataset(
+    source: str,
+    adj_close: pd.DataFrame,
+    ohlcv: Optional[pd.DataFrame],
+    settings: dict,
+    market_ticker: Optional[str],
+    graph: FeatureGraph,
+) -> pd.DataFrame:
+    """
+    Same preprocessing and builder call as the feature runners, on a graph
+    that keeps its kernels so their state can be saved afterwards.
+    """
+    daily_returns = compute_returns(adj_close, use_log_returns=settings["use_log_returns"])
+    monthly_returns = daily_to_monthly_compound(daily_returns, use_log_returns=settings["use_log_returns"])
+
+    market_daily_returns = None
+    if market_ticker is not None and market_ticker in daily_returns.columns:
+        market_daily_returns = daily_returns[market_ticker]
+
+    # Month-end evaluation gives the same dataset and is all an update needs
+    kwargs = {
+        **settings,
+        "month_end_only": True,
+        "adj_close": adj_close,
+        "daily_returns": daily_returns,
+        "monthly_returns": monthly_returns,
+        "market_daily_returns": market_daily_returns,
+        "graph": graph,
+    }
+    if source == "daily_ohlcv":
+        return build_daily_ohlcv_feature_dataset(ohlcv=ohlcv, **kwargs)
+    return build_daily_feature_dataset(**kwargs)
+
+
+def _state_after(
+    source: str,
+    settings: dict,
+    market_ticker: Optional[str],
+    adj_close: pd.DataFrame,
+    ohlcv: Optional[pd.DataFrame],
+    graph: FeatureGraph,
+) -> FeatureUpdateState:
+    """
+    State for the next update. The next update recomputes months from the
+    one before the current last month, so the state row sits one longest
+    window before that month's first row.
+    """
+    first_row = adj_close.index.searchsorted(_previous_month_start(adj_close.index[-1]))
+    origin = max(first_row - graph.max_window() + 1, graph.state_row)
+    start = max(origin - 1, 0)
+
+    return FeatureUpdateState(
+        source=source,
+        settings=settings,
+        market_ticker=market_ticker,
+        code_fingerprint=fingerprint_modules(*UPDATE_MODULES),
+        adj_close=adj_close.iloc[start:].copy(),
+        ohlcv=None if ohlcv is None else ohlcv.iloc[start:].copy(),
+        state_row=origin - start,
+        prefix_states=graph.prefix_states(origin),
+    )
+
+
+def build_feature_dataset_with_state(
+    source: str,
+    adj_close: pd.DataFrame,
+    settings: dict,
+    market_ticker: Optional[str] = None,
+    ohlcv: Optional[pd.DataFrame] = None,
+) -> tuple[pd.DataFrame, FeatureUpdateState]:
+    """
+    Full build of the daily or daily+OHLCV dataset, also returning the state
+    that `update_feature_dataset` continues from.
+    """
+    if source not in UPDATE_SOURCES:
+        raise ValueError(f"Unsupported feature_source for updates: {source}")
+    if source == "daily_ohlcv" and ohlcv is None:
+        raise ValueError("ohlcv is required for the daily_ohlcv feature source.")
+    if source == "daily":
+        ohlcv = None
+
+    graph = FeatureGraph({}, keep_intermediates=True)
+    dataset = _build_dataset(source, adj_close, ohlcv, settings, market_ticker, graph)
+    return dataset, _state_after(source, settings, market_ticker, adj_close, ohlcv, graph)
+
+
+def _append_rows(
+    saved: Optional[pd.DataFrame],
+    latest: pd.DataFrame,
+    name: str,
+) -> Optional[pd.DataFrame]:
+    """
+    Saved tail followed by the rows of `latest` after it. Overlapping rows
+    must be unchanged, since the saved sums already include them.
+    """
+    if saved is None:
+        return None
+    if not latest.columns.equals(saved.columns):
+        raise ValueError(f"{name} columns changed since the last update; rebuild the features in full.")
+
+    overlap = latest.index.intersection(saved.index)
+    if not latest.loc[overlap].equals(saved.loc[overlap]):
+        raise ValueError(f"{name} history changed since the last update; rebuild the features in full.")
+
+    return pd.concat([saved, latest[latest.index > saved.index[-1]]])
+
+
+def update_feature_dataset(
+    state: FeatureUpdateState,
+    dataset: pd.DataFrame,
+    adj_close: pd.DataFrame,
+    ohlcv: Optional[pd.DataFrame] = None,
+) -> tuple[pd.DataFrame, FeatureUpdateState]:
+    """
+    Extend `dataset` (the long table built with `state`) by the prices in
+    `adj_close` / `ohlcv` after the state's last date.
+
+    Only the saved tail plus the new rows are processed. Rows from the month
+    before the state's last month onwards are replaced: new month-ends are
+    appended, and the previous month's target, now resolved, is filled in.
+    The result matches a full rebuild bit for bit.
+    """
+    if not (adj_close.index > state.last_date).any():
+        return dataset, state
+
+    adj_tail = _append_rows(state.adj_close, adj_close, "Adjusted close")
+    ohlcv_tail = None
+    if state.ohlcv is not None:
+        if ohlcv is None:
+            raise ValueError("ohlcv is required to update the daily_ohlcv feature source.")
+        ohlcv_tail = _append_rows(state.ohlcv, ohlcv, "OHLCV")
+        if not ohlcv_tail.index.equals(adj_tail.index):
+            raise ValueError("OHLCV and adjusted close must cover the same new dates.")
+
+    graph = FeatureGraph(
+        {},
+        keep_intermediates=True,
+        prefix_states=state.prefix_states,
+        state_row=state.state_row,
+    )
+    fresh = _build_dataset(state.source, adj_tail, ohlcv_tail, state.settings, state.market_ticker, graph)
+    if list(fresh.columns) != list(dataset.columns):
+        raise ValueError("Dataset columns do not match the update state; rebuild the features in full.")
+
+    replace_from = _previous_month_start(state.last_date)
+    kept = dataset[dataset.index.get_level_values("date") < replace_from]
+    appended = fresh[fresh.index.get_level_values("date") >= replace_from]
+    updated = pd.concat([kept, appended])
+
+    new_state = _state_after(state.source, state.settings, state.market_ticker, adj_tail, ohlcv_tail, graph)
+    return updated, new_state
@@ -8,6 +8,8 @@ from typing import List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+from src import kernels
+
 
 @dataclass
 class FeaturesSpec:
@@ -70,13 +72,6 @@ def spec_from_config() -> FeaturesSpec:
     )
 
 
-def _compound_return_from_returns(window: np.ndarray) -> float:
-    """
-    Compute compounded simple return over a rolling window.
-    """
-    return float(np.prod(1.0 + window) - 1.0)
-
-
 def build_lagged_returns(
     returns_monthly: pd.DataFrame,
     lag_months: List[int],
@@ -97,12 +92,9 @@ def build_lagged_returns(
             raise ValueError("lag_months must contain positive integers.")
 
         if use_log_returns:
-            lag = returns_monthly.rolling(months).sum()
+            lag = kernels.rolling_sum(returns_monthly, months)
         else:
-            lag = returns_monthly.rolling(months).apply(
-                _compound_return_from_returns,
-                raw=True,
-            )
+            lag = kernels.rolling_compound_return(returns_monthly, months)
 
         lag = lag.shift(1)
         lag.columns = [f"{prefix}_{months}m__{col}" for col in lag.columns]
@@ -123,7 +115,7 @@ def build_volatility(
         raise ValueError("vol_months must be at least 2.")
 
     returns_monthly = returns_monthly.sort_index()
-    vol = returns_monthly.rolling(vol_months).std(ddof=1).shift(1)
+    vol = kernels.rolling_std(returns_monthly, vol_months, ddof=1).shift(1)
     vol.columns = [f"{prefix}_{vol_months}m__{col}" for col in vol.columns]
     return vol
 
@@ -7,6 +7,9 @@ from typing import Optional
 import numpy as np
 import pandas as pd
 
+from src.feature_panel import FeaturePanel
+from src.feature_registry import FeatureGraph, graph_with_inputs
+
 
 def _ensure_datetime_index(df: pd.DataFrame | pd.Series) -> pd.DataFrame | pd.Series:
     """
@@ -25,84 +28,97 @@ def _sample_month_end(df: pd.DataFrame) -> pd.DataFrame:
     return df.resample("ME").last()
 
 
-def _stack_wide_to_long(df_wide: pd.DataFrame, value_name: str) -> pd.DataFrame:
-    """
-    Convert wide date x ticker dataframe to long MultiIndex (date, ticker).
-    """
-    out = df_wide.stack().to_frame(name=value_name)
-    out.index.names = ["date", "ticker"]
-    return out
+def _compute_single(
+    inputs: dict[str, pd.DataFrame | pd.Series],
+    family: str,
+    month_end_only: bool,
+    **params,
+) -> pd.DataFrame:
+    return FeatureGraph(inputs).compute_one(family, month_end_only=month_end_only, **params)
 
 
 def build_return_feature(
     daily_returns: pd.DataFrame,
     window: int,
     use_log_returns: bool = False,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     Rolling return over `window` trading days.
-    """
-    daily_returns = _ensure_datetime_index(daily_returns)
 
-    if use_log_returns:
-        feat = daily_returns.rolling(window=window, min_periods=window).sum()
-    else:
-        feat = (1.0 + daily_returns).rolling(window=window, min_periods=window).apply(
-            lambda x: np.prod(x) - 1.0,
-            raw=True,
-        )
-    return feat
+    With month_end_only, the month-end sample is returned directly and the
+    window is only evaluated at month-end rows.
+    """
+    return _compute_single(
+        {"daily_returns": _ensure_datetime_index(daily_returns)},
+        "ret",
+        month_end_only,
+        window=window,
+        use_log_returns=use_log_returns,
+    )
 
 
 def build_volatility_feature(
     daily_returns: pd.DataFrame,
     window: int,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     Rolling standard deviation of daily returns.
     """
-    daily_returns = _ensure_datetime_index(daily_returns)
-    return daily_returns.rolling(window=window, min_periods=window).std()
+    return _compute_single(
+        {"daily_returns": _ensure_datetime_index(daily_returns)},
+        "vol",
+        month_end_only,
+        window=window,
+    )
 
 
 def build_moving_average_ratio(
     adj_close: pd.DataFrame,
     short_window: int,
     long_window: int,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     (MA_short / MA_long) - 1
     """
-    adj_close = _ensure_datetime_index(adj_close)
-
-    ma_short = adj_close.rolling(window=short_window, min_periods=short_window).mean()
-    ma_long = adj_close.rolling(window=long_window, min_periods=long_window).mean()
-
-    return (ma_short / ma_long) - 1.0
+    return _compute_single(
+        {"adj_close": _ensure_datetime_index(adj_close)},
+        "ma_ratio",
+        month_end_only,
+        short_window=short_window,
+        long_window=long_window,
+    )
 
 
 def build_distance_from_high(
     adj_close: pd.DataFrame,
     window: int,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     Distance from rolling high:
     (P_t / rolling_max) - 1
     """
-    adj_close = _ensure_datetime_index(adj_close)
-    rolling_high = adj_close.rolling(window=window, min_periods=window).max()
-    return (adj_close / rolling_high) - 1.0
+    return _compute_single(
+        {"adj_close": _ensure_datetime_index(adj_close)},
+        "dist_high",
+        month_end_only,
+        window=window,
+    )
 
 
 def build_drawdown_feature(
     adj_close: pd.DataFrame,
     window: int,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     Rolling drawdown proxy:
     (P_t / rolling_max) - 1
     """
-    return build_distance_from_high(adj_close, window=window)
+    return build_distance_from_high(adj_close, window=window, month_end_only=month_end_only)
 
 
 def build_excess_return_feature(
@@ -120,52 +136,72 @@ def build_excess_return_feature(
     return stock_return_feature.sub(aligned_market, axis=0)
 
 
+def _align_market(market_daily_returns: pd.Series, index: pd.Index) -> pd.Series:
+    market_daily_returns = pd.Series(market_daily_returns).copy()
+    market_daily_returns.index = pd.to_datetime(market_daily_returns.index)
+    market_daily_returns = market_daily_returns.sort_index()
+    return market_daily_returns.reindex(index)
+
+
 def build_beta_feature(
     daily_returns: pd.DataFrame,
     market_daily_returns: pd.Series,
     window: int,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     Rolling beta of each stock to market:
     Cov(stock, market) / Var(market)
     """
     daily_returns = _ensure_datetime_index(daily_returns)
+    inputs = {
+        "daily_returns": daily_returns,
+        "market_daily_returns": _align_market(market_daily_returns, daily_returns.index),
+    }
+    return _compute_single(inputs, "beta", month_end_only, window=window)
 
-    market_daily_returns = pd.Series(market_daily_returns).copy()
-    market_daily_returns.index = pd.to_datetime(market_daily_returns.index)
-    market_daily_returns = market_daily_returns.sort_index()
-    market_daily_returns = market_daily_returns.reindex(daily_returns.index)
-
-    var_m = market_daily_returns.rolling(window=window, min_periods=window).var()
 
-    betas = pd.DataFrame(index=daily_returns.index, columns=daily_returns.columns, dtype=float)
+def build_beta_features(
+    daily_returns: pd.DataFrame,
+    windows: list[int],
+    market_daily_returns: Optional[pd.Series] = None,
+    month_end_only: bool = False,
+) -> dict[int, pd.DataFrame]:
+    """
+    Rolling betas for several windows in one sweep: the rolling sums of x, y
+    and xy are built once and shared by every window.
 
-    for col in daily_returns.columns:
-        cov_sm = daily_returns[col].rolling(window=window, min_periods=window).cov(market_daily_returns)
-        betas[col] = cov_sm / var_m
+    Without `market_daily_returns`, betas are taken against the equal-weight
+    market proxy (cross-sectional mean of daily returns).
+    """
+    daily_returns = _ensure_datetime_index(daily_returns)
+    inputs = {"daily_returns": daily_returns}
+    market = "equal_weight_returns"
+    if market_daily_returns is not None:
+        inputs["market_daily_returns"] = _align_market(market_daily_returns, daily_returns.index)
+        market = "market_daily_returns"
 
-    return betas
+    computed = FeatureGraph(inputs).compute(
+        {str(w): ("beta", {"window": w, "market": market}) for w in windows},
+        month_end_only=month_end_only,
+    )
+    return {w: computed[str(w)] for w in windows}
 
 
 def build_rsi_feature(
     adj_close: pd.DataFrame,
     window: int = 14,
+    month_end_only: bool = False,
 ) -> pd.DataFrame:
     """
     RSI from daily price changes.
     """
-    adj_close = _ensure_datetime_index(adj_close)
-
-    delta = adj_close.diff()
-    gain = delta.clip(lower=0.0)
-    loss = -delta.clip(upper=0.0)
-
-    avg_gain = gain.rolling(window=window, min_periods=window).mean()
-    avg_loss = loss.rolling(window=window, min_periods=window).mean()
-
-    rs = avg_gain / avg_loss.replace(0.0, np.nan)
-    rsi = 100.0 - (100.0 / (1.0 + rs))
-    return rsi
+    return _compute_single(
+        {"adj_close": _ensure_datetime_index(adj_close)},
+        "rsi",
+        month_end_only,
+        window=window,
+    )
 
 
 def build_next_month_target(
@@ -180,6 +216,38 @@ def build_next_month_target(
     return target
 
 
+def price_feature_requests(
+    return_windows: list[int],
+    vol_windows: list[int],
+    ma_pairs: list[tuple[int, int]],
+    high_windows: list[int],
+    drawdown_windows: list[int],
+    rsi_window: int,
+    use_log_returns: bool = False,
+) -> dict[str, tuple[str, dict]]:
+    """
+    Graph requests {name: (family, params)} for the return, volatility,
+    moving-average, high/drawdown and RSI features shared by the daily
+    datasets, in dataset column order.
+    """
+    requests: dict[str, tuple[str, dict]] = {}
+    for w in return_windows:
+        requests[f"ret_{w}d"] = ("ret", {"window": w, "use_log_returns": use_log_returns})
+    for w in vol_windows:
+        requests[f"vol_{w}d"] = ("vol", {"window": w})
+    for short_w, long_w in ma_pairs:
+        requests[f"ma_ratio_{short_w}_{long_w}"] = (
+            "ma_ratio",
+            {"short_window": short_w, "long_window": long_w},
+        )
+    for w in high_windows:
+        requests[f"dist_{w}d_high"] = ("dist_high", {"window": w})
+    for w in drawdown_windows:
+        requests[f"drawdown_{w}d"] = ("dist_high", {"window": w})
+    requests[f"rsi_{rsi_window}d"] = ("rsi", {"window": rsi_window})
+    return requests
+
+
 def build_daily_feature_dataset(
     adj_close: pd.DataFrame,
     daily_returns: pd.DataFrame,
@@ -194,19 +262,35 @@ def build_daily_feature_dataset(
     beta_windows: Optional[list[int]] = None,
     rsi_window: int = 14,
     target_name: str = "y_next_1m",
-) -> pd.DataFrame:
+    month_end_only: bool = False,
+    graph: Optional[FeatureGraph] = None,
+    equal_weight_beta_windows: Optional[list[int]] = None,
+    as_panel: bool = False,
+) -> pd.DataFrame | FeaturePanel:
     """
     Build month-end sampled ML dataset from daily engineered features.
 
+    All windowed features are computed in one FeatureGraph pass, so shared
+    intermediates (e.g. the rolling max behind dist_high and drawdown of the
+    same window) are computed once. Pass a `graph` built with
+    keep_intermediates=True to share work with other builders.
+
+    With month_end_only, windowed features are evaluated only at month-end
+    rows instead of every trading day; the dataset is identical.
+
     Final output:
     - MultiIndex(date, ticker)
     - feature columns
     - target column
 
+    With as_panel, the float32 FeaturePanel is returned instead; its
+    `to_long()` gives the same rows.
+
     Added improvements:
     - market return features
     - excess return features across windows
-    - beta features
+    - beta features, to the market and optionally to the equal-weight
+      market proxy (beta_ew_*)
     - reversal spread features
     """
     adj_close = _ensure_datetime_index(adj_close)
@@ -219,43 +303,41 @@ def build_daily_feature_dataset(
     high_windows = high_windows or [252]
     drawdown_windows = drawdown_windows or [60]
     beta_windows = beta_windows or [60]
+    equal_weight_beta_windows = equal_weight_beta_windows or []
+
+    inputs = {"adj_close": adj_close, "daily_returns": daily_returns}
+    requests = price_feature_requests(
+        return_windows,
+        vol_windows,
+        ma_pairs,
+        high_windows,
+        drawdown_windows,
+        rsi_window,
+        use_log_returns=use_log_returns,
+    )
+    price_feature_names = list(requests)
 
-    feature_frames: dict[str, pd.DataFrame] = {}
-
-    # Return features
-    for w in return_windows:
-        feature_frames[f"ret_{w}d"] = _sample_month_end(
-            build_return_feature(daily_returns, w, use_log_returns=use_log_returns)
-        )
-
-    # Volatility features
-    for w in vol_windows:
-        feature_frames[f"vol_{w}d"] = _sample_month_end(
-            build_volatility_feature(daily_returns, w)
-        )
+    if market_daily_returns is not None:
+        inputs["market_daily_returns"] = _align_market(market_daily_returns, daily_returns.index)
+        for w in return_windows:
+            requests[f"market_ret_{w}d"] = (
+                "ret",
+                {"window": w, "use_log_returns": use_log_returns, "source": "market_daily_returns"},
+            )
+        for w in beta_windows:
+            requests[f"beta_{w}d"] = ("beta", {"window": w})
 
-    # Moving average ratios
-    for short_w, long_w in ma_pairs:
-        feature_frames[f"ma_ratio_{short_w}_{long_w}"] = _sample_month_end(
-            build_moving_average_ratio(adj_close, short_w, long_w)
-        )
+    for w in equal_weight_beta_windows:
+        requests[f"beta_ew_{w}d"] = ("beta", {"window": w, "market": "equal_weight_returns"})
 
-    # Distance from high
-    for w in high_windows:
-        feature_frames[f"dist_{w}d_high"] = _sample_month_end(
-            build_distance_from_high(adj_close, w)
-        )
+    graph = graph_with_inputs(graph, inputs)
+    computed = graph.compute(requests, month_end_only=month_end_only)
 
-    # Drawdown
-    for w in drawdown_windows:
-        feature_frames[f"drawdown_{w}d"] = _sample_month_end(
-            build_drawdown_feature(adj_close, w)
-        )
+    # The graph already returns month-end samples in month_end_only mode
+    sample = (lambda df: df) if month_end_only else _sample_month_end
+    computed = {name: sample(frame) for name, frame in computed.items()}
 
-    # RSI
-    feature_frames[f"rsi_{rsi_window}d"] = _sample_month_end(
-        build_rsi_feature(adj_close, window=rsi_window)
-    )
+    feature_frames: dict[str, pd.DataFrame] = {name: computed[name] for name in price_feature_names}
 
     # Reversal / slope style features
     # Example: short-minus-medium and medium-minus-long return spreads
@@ -270,21 +352,10 @@ def build_daily_feature_dataset(
 
     # Market-relative features
     if market_daily_returns is not None:
-        market_daily_returns = pd.Series(market_daily_returns).copy()
-        market_daily_returns.index = pd.to_datetime(market_daily_returns.index)
-        market_daily_returns = market_daily_returns.sort_index()
-        market_daily_returns = market_daily_returns.reindex(daily_returns.index)
-
         # Market return features sampled monthly
         market_feature_monthly: dict[int, pd.Series] = {}
         for w in return_windows:
-            market_ret_w = _sample_month_end(
-                build_return_feature(
-                    market_daily_returns.to_frame("market"),
-                    w,
-                    use_log_returns=use_log_returns,
-                )
-            )["market"]
+            market_ret_w = computed[f"market_ret_{w}d"].iloc[:, 0]
             market_feature_monthly[w] = market_ret_w
 
             # Broadcast single market series to all stock columns
@@ -304,23 +375,22 @@ def build_daily_feature_dataset(
 
         # Beta features
         for w in beta_windows:
-            feature_frames[f"beta_{w}d"] = _sample_month_end(
-                build_beta_feature(daily_returns, market_daily_returns, w)
-            )
-
-    # Assemble long feature matrix
-    long_parts = []
-    for feat_name, feat_df in feature_frames.items():
-        long_feat = _stack_wide_to_long(feat_df, feat_name)
-        long_parts.append(long_feat)
+            feature_frames[f"beta_{w}d"] = computed[f"beta_{w}d"]
 
-    features_long = pd.concat(long_parts, axis=1)
+    for w in equal_weight_beta_windows:
+        feature_frames[f"beta_ew_{w}d"] = computed[f"beta_ew_{w}d"]
 
     # Target
     target_wide = build_next_month_target(monthly_returns, target_name=target_name)
-    target_long = _stack_wide_to_long(target_wide, target_name)
 
-    dataset = features_long.join(target_long, how="inner")
-    dataset = dataset.dropna().sort_index()
-
-    return dataset
\ No newline at end of file
+    # Assemble on the (date, ticker, feature) panel instead of stacking and
+    # joining one long frame per feature
+    panel = FeaturePanel.from_frames(
+        feature_frames,
+        target_wide,
+        target_name,
+        dtype=np.float32 if as_panel else np.float64,
+    )
+    if as_panel:
+        return panel
+    return panel.to_long()
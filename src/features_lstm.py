@@ -2,12 +2,23 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from src.feature_registry import FeatureGraph, graph_with_inputs
+
+
+# Upper bound on sequence values gathered at once when building LSTM samples
+_SEQUENCE_CHUNK_VALUES = 1 << 22
+
+LSTM_STORE_VERSION = 1
+LSTM_STORE_META_FILENAME = "meta.json"
 
 @dataclass
 class LSTMSampleSet:
@@ -18,6 +29,118 @@ class LSTMSampleSet:
     target_name: str
     feature_names: list[str]
 
+    def __len__(self) -> int:
+        return len(self.X)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.X.shape
+
+    def windows(self, rows: np.ndarray | slice) -> np.ndarray:
+        """
+        Windows of the samples at `rows`; with a memory-mapped X only those
+        rows are read.
+        """
+        return np.asarray(self.X[rows])
+
+    def subset(self, rows: np.ndarray | slice) -> "LSTMSampleSet":
+        """
+        Samples at `rows` (a mask or a slice; slices are views of X).
+        """
+        return LSTMSampleSet(
+            X=self.X[rows],
+            y=self.y[rows],
+            dates=self.dates[rows],
+            tickers=self.tickers[rows],
+            target_name=self.target_name,
+            feature_names=self.feature_names,
+        )
+
+
+@dataclass
+class LSTMSequenceIndex:
+    """
+    LSTM samples stored as pointers into one daily feature tensor.
+
+    - daily: (T, N, F) tensor of the sequence features, stored once
+    - end_rows: per sample, the daily row just after its window
+    - ticker_idx: per sample, the position of its ticker in `universe`
+
+    Windows are cut out of `daily` (and normalized) only when requested, so
+    memory grows with days x tickers rather than samples x sequence_length.
+    """
+    daily: np.ndarray
+    end_rows: np.ndarray
+    ticker_idx: np.ndarray
+    y: np.ndarray
+    dates: pd.Index
+    universe: pd.Index
+    sequence_length: int
+    normalize_per_sequence: bool
+    target_name: str
+    feature_names: list[str]
+
+    def __len__(self) -> int:
+        return len(self.end_rows)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """
+        Shape of the equivalent materialized X.
+        """
+        return len(self), self.sequence_length, self.daily.shape[2]
+
+    @property
+    def tickers(self) -> pd.Index:
+        return pd.Index(self.universe.astype(str)[self.ticker_idx]).rename(None)
+
+    def windows(self, rows: np.ndarray | slice) -> np.ndarray:
+        """
+        float32 (k, sequence_length, F) windows of the samples at `rows`,
+        normalized as in the materialized sample set.
+        """
+        starts = self.end_rows[rows] - self.sequence_length
+        offsets = np.arange(self.sequence_length)
+        sequences = self.daily[starts[:, None] + offsets, self.ticker_idx[rows][:, None]]
+        if self.normalize_per_sequence:
+            sequences = normalize_sequence_per_feature(sequences)
+        return sequences.astype(np.float32)
+
+    def subset(self, rows: np.ndarray | slice) -> "LSTMSequenceIndex":
+        """
+        Samples at `rows` (a mask or a slice), sharing the same daily tensor.
+        """
+        return LSTMSequenceIndex(
+            daily=self.daily,
+            end_rows=self.end_rows[rows],
+            ticker_idx=self.ticker_idx[rows],
+            y=self.y[rows],
+            dates=self.dates[rows],
+            universe=self.universe,
+            sequence_length=self.sequence_length,
+            normalize_per_sequence=self.normalize_per_sequence,
+            target_name=self.target_name,
+            feature_names=self.feature_names,
+        )
+
+    def to_sample_set(self) -> LSTMSampleSet:
+        """
+        Materialize every window, in chunks of bounded size.
+        """
+        chunk = max(1, _SEQUENCE_CHUNK_VALUES // (self.sequence_length * self.daily.shape[2]))
+        X = np.empty(self.shape, dtype=np.float32)
+        for lo in range(0, len(self), chunk):
+            X[lo:lo + chunk] = self.windows(slice(lo, lo + chunk))
+
+        return LSTMSampleSet(
+            X=X,
+            y=self.y,
+            dates=self.dates,
+            tickers=self.tickers,
+            target_name=self.target_name,
+            feature_names=self.feature_names,
+        )
+
 
 def compute_monthly_prices_from_adj_close(
     adj_close_daily: pd.DataFrame,
@@ -54,37 +177,28 @@ def build_next_month_target(
 
 
 def split_lstm_dataset_by_date(
-    dataset: LSTMSampleSet,
+    dataset: LSTMSampleSet | LSTMSequenceIndex,
     train_end_date: str,
     test_start_date: str,
-) -> Tuple[LSTMSampleSet, LSTMSampleSet]:
-    dates = pd.to_datetime(dataset.dates)
-
-    train_mask = dates <= pd.to_datetime(train_end_date)
-    test_mask = dates >= pd.to_datetime(test_start_date)
-
-    train_set = LSTMSampleSet(
-        X=dataset.X[train_mask],
-        y=dataset.y[train_mask],
-        dates=dataset.dates[train_mask],
-        tickers=dataset.tickers[train_mask],
-        target_name=dataset.target_name,
-        feature_names=dataset.feature_names,
-    )
-
-    test_set = LSTMSampleSet(
-        X=dataset.X[test_mask],
-        y=dataset.y[test_mask],
-        dates=dataset.dates[test_mask],
-        tickers=dataset.tickers[test_mask],
-        target_name=dataset.target_name,
-        feature_names=dataset.feature_names,
-    )
+) -> Tuple[LSTMSampleSet, LSTMSampleSet] | Tuple[LSTMSequenceIndex, LSTMSequenceIndex]:
+    """
+    Train (date <= train_end_date) and test (date >= test_start_date) sets.
+    Samples are built month by month, so the splits are normally slices and
+    share memory (memory-mapped arrays stay on disk).
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dataset.dates))
+
+    if dates.is_monotonic_increasing:
+        train_rows = slice(0, dates.searchsorted(pd.to_datetime(train_end_date), side="right"))
+        test_rows = slice(dates.searchsorted(pd.to_datetime(test_start_date), side="left"), len(dates))
+    else:
+        train_rows = dates <= pd.to_datetime(train_end_date)
+        test_rows = dates >= pd.to_datetime(test_start_date)
 
-    return train_set, test_set
+    return dataset.subset(train_rows), dataset.subset(test_rows)
 
 
-def lstm_sample_set_to_long_dataframe(dataset: LSTMSampleSet) -> pd.DataFrame:
+def lstm_sample_set_to_long_dataframe(dataset: LSTMSampleSet | LSTMSequenceIndex) -> pd.DataFrame:
     index = pd.MultiIndex.from_arrays(
         [pd.to_datetime(dataset.dates), dataset.tickers],
         names=["date", "ticker"],
@@ -119,63 +233,228 @@ def load_lstm_sample_set(filepath: str) -> LSTMSampleSet:
     )
 
 
+def save_lstm_sequence_index(dataset: LSTMSequenceIndex, filepath: str) -> None:
+    np.savez_compressed(
+        filepath,
+        daily=dataset.daily,
+        end_rows=dataset.end_rows,
+        ticker_idx=dataset.ticker_idx,
+        y=dataset.y,
+        dates=np.array(dataset.dates.astype(str)),
+        universe=np.array(dataset.universe.astype(str)),
+        sequence_length=np.array([dataset.sequence_length]),
+        normalize_per_sequence=np.array([dataset.normalize_per_sequence]),
+        target_name=np.array([dataset.target_name]),
+        feature_names=np.array(dataset.feature_names, dtype=str),
+    )
+
+
+def load_lstm_sequence_index(filepath: str) -> LSTMSequenceIndex:
+    data = np.load(filepath, allow_pickle=True)
+    return LSTMSequenceIndex(
+        daily=data["daily"],
+        end_rows=data["end_rows"],
+        ticker_idx=data["ticker_idx"],
+        y=data["y"],
+        dates=pd.Index(pd.to_datetime(data["dates"])),
+        universe=pd.Index(data["universe"].astype(str)),
+        sequence_length=int(data["sequence_length"][0]),
+        normalize_per_sequence=bool(data["normalize_per_sequence"][0]),
+        target_name=str(data["target_name"][0]),
+        feature_names=list(data["feature_names"].astype(str)),
+    )
+
+
+# =========================
+# UNCOMPRESSED STORAGE
+# =========================
+
+def _array_checksum(array: np.ndarray) -> str:
+    return hashlib.sha1(memoryview(np.ascontiguousarray(array)).cast("B")).hexdigest()
+
+
+def _save_array_atomic(array: np.ndarray, path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def _dataset_arrays(dataset: LSTMSampleSet | LSTMSequenceIndex) -> tuple[str, dict, dict]:
+    """
+    Kind, numeric arrays and JSON-friendly fields of an LSTM dataset.
+    """
+    fields = {
+        "dates": [d.isoformat() for d in pd.to_datetime(dataset.dates)],
+        "target_name": dataset.target_name,
+        "feature_names": list(dataset.feature_names),
+    }
+    if isinstance(dataset, LSTMSequenceIndex):
+        arrays = {
+            "daily": dataset.daily,
+            "end_rows": dataset.end_rows,
+            "ticker_idx": dataset.ticker_idx,
+            "y": dataset.y,
+        }
+        fields.update({
+            "universe": [str(t) for t in dataset.universe],
+            "sequence_length": int(dataset.sequence_length),
+            "normalize_per_sequence": bool(dataset.normalize_per_sequence),
+        })
+        return "sequence_index", arrays, fields
+
+    fields["tickers"] = [str(t) for t in dataset.tickers]
+    return "sample_set", {"X": dataset.X, "y": dataset.y}, fields
+
+
+def save_lstm_dataset_dir(dataset: LSTMSampleSet | LSTMSequenceIndex, directory: str) -> None:
+    """
+    Save an LSTM dataset as raw .npy arrays plus a JSON file with the schema
+    version, the remaining fields and a checksum of every array. The JSON
+    file is written last, so a directory with one holds a complete dataset.
+    """
+    os.makedirs(directory, exist_ok=True)
+    kind, arrays, fields = _dataset_arrays(dataset)
+
+    # An existing store stops being valid before any array is replaced, so a
+    # crash mid-rewrite never leaves arrays of two builds under one meta.json
+    meta_path = os.path.join(directory, LSTM_STORE_META_FILENAME)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    array_meta = {}
+    for name, array in arrays.items():
+        _save_array_atomic(array, os.path.join(directory, f"{name}.npy"))
+        array_meta[name] = {
+            "shape": list(array.shape),
+            "dtype": str(array.dtype),
+            "sha1": _array_checksum(array),
+        }
+
+    meta = {
+        "schema_version": LSTM_STORE_VERSION,
+        "kind": kind,
+        "arrays": array_meta,
+        **fields,
+    }
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+
+def lstm_dataset_dir_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, LSTM_STORE_META_FILENAME))
+
+
+def load_lstm_dataset_dir(
+    directory: str,
+    mmap: bool = True,
+    verify: bool = False,
+) -> LSTMSampleSet | LSTMSequenceIndex:
+    """
+    Load a dataset saved with `save_lstm_dataset_dir`. With mmap, arrays are
+    memory-mapped read-only and pages are read as samples are used.
+
+    Shapes and dtypes are always checked against the metadata; `verify`
+    also compares checksums, which reads every array in full.
+    """
+    with open(os.path.join(directory, LSTM_STORE_META_FILENAME)) as f:
+        meta = json.load(f)
+
+    version = meta.get("schema_version")
+    if version != LSTM_STORE_VERSION:
+        raise ValueError(f"Unsupported LSTM dataset schema version {version} in {directory}.")
+
+    arrays = {}
+    for name, expected in meta["arrays"].items():
+        array = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+        if list(array.shape) != expected["shape"] or str(array.dtype) != expected["dtype"]:
+            raise ValueError(f"LSTM dataset array '{name}' in {directory} does not match its metadata.")
+        if verify and _array_checksum(array) != expected["sha1"]:
+            raise ValueError(f"Checksum mismatch for LSTM dataset array '{name}' in {directory}.")
+        arrays[name] = array
+
+    dates = pd.Index(pd.to_datetime(meta["dates"]))
+    if meta["kind"] == "sequence_index":
+        return LSTMSequenceIndex(
+            daily=arrays["daily"],
+            end_rows=arrays["end_rows"],
+            ticker_idx=arrays["ticker_idx"],
+            y=arrays["y"],
+            dates=dates,
+            universe=pd.Index(meta["universe"]),
+            sequence_length=meta["sequence_length"],
+            normalize_per_sequence=meta["normalize_per_sequence"],
+            target_name=meta["target_name"],
+            feature_names=list(meta["feature_names"]),
+        )
+    if meta["kind"] == "sample_set":
+        return LSTMSampleSet(
+            X=arrays["X"],
+            y=arrays["y"],
+            dates=dates,
+            tickers=pd.Index(meta["tickers"]),
+            target_name=meta["target_name"],
+            feature_names=list(meta["feature_names"]),
+        )
+    raise ValueError(f"Unsupported LSTM dataset kind: {meta['kind']}")
+
+
 def rolling_volatility(
     daily_returns: pd.DataFrame,
     window: int,
 ) -> pd.DataFrame:
-    return daily_returns.rolling(window=window, min_periods=window).std()
+    return FeatureGraph({"daily_returns": daily_returns}).compute_one("vol", window=window)
 
 
 def moving_average_ratio(
     adj_close: pd.DataFrame,
     window: int,
 ) -> pd.DataFrame:
-    ma = adj_close.rolling(window=window, min_periods=window).mean()
-    return (adj_close / ma) - 1.0
+    return FeatureGraph({"adj_close": adj_close}).compute_one("price_ma_ratio", window=window)
 
 
 def rolling_drawdown(
     adj_close: pd.DataFrame,
     window: int,
 ) -> pd.DataFrame:
-    rolling_high = adj_close.rolling(window=window, min_periods=window).max()
-    return (adj_close / rolling_high) - 1.0
+    return FeatureGraph({"adj_close": adj_close}).compute_one("dist_high", window=window)
 
 
 def compute_rsi(
     adj_close: pd.DataFrame,
     window: int = 14,
 ) -> pd.DataFrame:
-    delta = adj_close.diff()
-    gain = delta.clip(lower=0.0)
-    loss = -delta.clip(upper=0.0)
-
-    avg_gain = gain.rolling(window=window, min_periods=window).mean()
-    avg_loss = loss.rolling(window=window, min_periods=window).mean()
-
-    rs = avg_gain / avg_loss.replace(0.0, np.nan)
-    rsi = 100.0 - (100.0 / (1.0 + rs))
-    return rsi
+    return FeatureGraph({"adj_close": adj_close}).compute_one("rsi", window=window)
 
 
 def normalize_sequence_per_feature(
     seq: np.ndarray,
     eps: float = 1e-8,
 ) -> np.ndarray:
-    mean = seq.mean(axis=0, keepdims=True)
-    std = seq.std(axis=0, keepdims=True)
+    """
+    Z-score each feature over the time axis of one (L, F) sequence or of a
+    (K, L, F) batch of sequences.
+    """
+    mean = seq.mean(axis=-2, keepdims=True)
+    std = seq.std(axis=-2, keepdims=True)
     std = np.where(std < eps, 1.0, std)
     return (seq - mean) / std
 
 
-def build_lstm_multifeature_sequence_dataset(
+def build_lstm_sequence_index(
     adj_close: pd.DataFrame,
     market_ticker: str | None = None,
     sequence_length: int = 60,
     target_horizon_months: int = 1,
     target_name: str = "y_next_1m",
     normalize_per_sequence: bool = True,
-) -> LSTMSampleSet:
+    graph: Optional[FeatureGraph] = None,
+) -> LSTMSequenceIndex:
+    """
+    Index of the monthly LSTM samples over the daily feature tensor. A sample
+    is kept when its whole window and its target are free of NaNs.
+    """
     if sequence_length <= 1:
         raise ValueError("sequence_length must be greater than 1.")
 
@@ -190,12 +469,22 @@ def build_lstm_multifeature_sequence_dataset(
         target_name=target_name,
     )
 
-    vol_20d = rolling_volatility(daily_returns, window=20)
-    vol_60d = rolling_volatility(daily_returns, window=60)
-    ma_ratio_20 = moving_average_ratio(adj_close, window=20)
-    ma_ratio_60 = moving_average_ratio(adj_close, window=60)
-    drawdown_60d = rolling_drawdown(adj_close, window=60)
-    rsi_14d = compute_rsi(adj_close, window=14)
+    # One graph pass; pass a shared `graph` to reuse intermediates of other builders
+    graph = graph_with_inputs(graph, {"adj_close": adj_close, "daily_returns": daily_returns})
+    daily_features = graph.compute({
+        "vol_20d": ("vol", {"window": 20}),
+        "vol_60d": ("vol", {"window": 60}),
+        "ma_ratio_20": ("price_ma_ratio", {"window": 20}),
+        "ma_ratio_60": ("price_ma_ratio", {"window": 60}),
+        "drawdown_60d": ("dist_high", {"window": 60}),
+        "rsi_14d": ("rsi", {"window": 14}),
+    })
+    vol_20d = daily_features["vol_20d"]
+    vol_60d = daily_features["vol_60d"]
+    ma_ratio_20 = daily_features["ma_ratio_20"]
+    ma_ratio_60 = daily_features["ma_ratio_60"]
+    drawdown_60d = daily_features["drawdown_60d"]
+    rsi_14d = daily_features["rsi_14d"]
 
     if market_ticker is not None and market_ticker in daily_returns.columns:
         market_returns = daily_returns[market_ticker].copy()
@@ -230,7 +519,7 @@ def build_lstm_multifeature_sequence_dataset(
 
     month_end_dates = monthly_prices.index
     daily_index = daily_returns.index
-    market_returns = market_returns.reindex(daily_index)
+    market = market_returns.reindex(daily_index).to_numpy(dtype=float)[:, None]
 
     feature_names = [
         "daily_return",
@@ -244,74 +533,72 @@ def build_lstm_multifeature_sequence_dataset(
         "rsi_14d",
     ]
 
-    X_list: list[np.ndarray] = []
-    y_list: list[float] = []
-    date_list: list[pd.Timestamp] = []
-    ticker_list: list[str] = []
-
-    for current_month_end in month_end_dates:
-        if current_month_end not in target_wide.index:
-            continue
-
-        eligible_daily_dates = daily_index[daily_index <= current_month_end]
-        if len(eligible_daily_dates) < sequence_length:
-            continue
-
-        seq_dates = eligible_daily_dates[-sequence_length:]
-        target_row = target_wide.loc[current_month_end]
-
-        ret_slice = daily_returns.loc[seq_dates]
-        vol20_slice = vol_20d.loc[seq_dates]
-        vol60_slice = vol_60d.loc[seq_dates]
-        ma20_slice = ma_ratio_20.loc[seq_dates]
-        ma60_slice = ma_ratio_60.loc[seq_dates]
-        drawdown_slice = drawdown_60d.loc[seq_dates]
-        rsi_slice = rsi_14d.loc[seq_dates]
-        market_slice = market_returns.loc[seq_dates]
-
-        for ticker in common_tickers:
-            stock_ret = ret_slice[ticker].to_numpy(dtype=float)
-            market_ret = market_slice.to_numpy(dtype=float)
-            excess_ret = stock_ret - market_ret
-
-            seq_matrix = np.column_stack([
-                stock_ret,
-                excess_ret,
-                market_ret,
-                vol20_slice[ticker].to_numpy(dtype=float),
-                vol60_slice[ticker].to_numpy(dtype=float),
-                ma20_slice[ticker].to_numpy(dtype=float),
-                ma60_slice[ticker].to_numpy(dtype=float),
-                drawdown_slice[ticker].to_numpy(dtype=float),
-                rsi_slice[ticker].to_numpy(dtype=float),
-            ])
-
-            target_value = target_row[ticker]
-
-            if np.isnan(seq_matrix).any():
-                continue
-            if pd.isna(target_value):
-                continue
-
-            if normalize_per_sequence:
-                seq_matrix = normalize_sequence_per_feature(seq_matrix)
-
-            X_list.append(seq_matrix.astype(np.float32))
-            y_list.append(float(target_value))
-            date_list.append(pd.Timestamp(current_month_end))
-            ticker_list.append(str(ticker))
-
-    if not X_list:
+    # Daily (T, N, F) tensor of the nine sequence features
+    stock_returns = daily_returns.to_numpy(dtype=float)
+    daily = np.stack(
+        [
+            stock_returns,
+            stock_returns - market,
+            np.broadcast_to(market, stock_returns.shape),
+            vol_20d.reindex(daily_index).to_numpy(dtype=float),
+            vol_60d.reindex(daily_index).to_numpy(dtype=float),
+            ma_ratio_20.reindex(daily_index).to_numpy(dtype=float),
+            ma_ratio_60.reindex(daily_index).to_numpy(dtype=float),
+            drawdown_60d.reindex(daily_index).to_numpy(dtype=float),
+            rsi_14d.reindex(daily_index).to_numpy(dtype=float),
+        ],
+        axis=2,
+    )
+
+    # Each month's sequence is the last `sequence_length` trading days up to
+    # and including its month-end
+    ends = daily_index.searchsorted(month_end_dates, side="right")
+    months = np.flatnonzero(ends >= sequence_length)
+    if len(months) == 0:
         raise ValueError("No valid LSTM samples were created. Check sequence length and data coverage.")
+    targets = target_wide.reindex(month_end_dates).to_numpy(dtype=float)
 
-    X = np.stack(X_list).astype(np.float32)
-    y = np.array(y_list, dtype=np.float32)
+    # Windows with a missing value, from per-ticker running counts of NaN days
+    nan_days = np.zeros((len(daily_index) + 1, len(common_tickers)), dtype=np.int64)
+    np.cumsum(np.isnan(daily).any(axis=2), axis=0, out=nan_days[1:])
+    window_ends = ends[months]
+    complete = nan_days[window_ends] == nan_days[window_ends - sequence_length]
 
-    return LSTMSampleSet(
-        X=X,
-        y=y,
-        dates=pd.Index(date_list),
-        tickers=pd.Index(ticker_list),
+    valid = complete & ~np.isnan(targets[months])
+    month_idx, ticker_idx = np.nonzero(valid)
+    if len(month_idx) == 0:
+        raise ValueError("No valid LSTM samples were created. Check sequence length and data coverage.")
+    month_idx = months[month_idx]
+
+    return LSTMSequenceIndex(
+        daily=daily,
+        end_rows=ends[month_idx].astype(np.int64),
+        ticker_idx=ticker_idx.astype(np.int64),
+        y=targets[month_idx, ticker_idx].astype(np.float32),
+        dates=pd.Index(month_end_dates[month_idx]).rename(None),
+        universe=pd.Index(common_tickers.astype(str)).rename(None),
+        sequence_length=sequence_length,
+        normalize_per_sequence=normalize_per_sequence,
         target_name=target_name,
         feature_names=feature_names,
-    )
\ No newline at end of file
+    )
+
+
+def build_lstm_multifeature_sequence_dataset(
+    adj_close: pd.DataFrame,
+    market_ticker: str | None = None,
+    sequence_length: int = 60,
+    target_horizon_months: int = 1,
+    target_name: str = "y_next_1m",
+    normalize_per_sequence: bool = True,
+    graph: Optional[FeatureGraph] = None,
+) -> LSTMSampleSet:
+    return build_lstm_sequence_index(
+        adj_close=adj_close,
+        market_ticker=market_ticker,
+        sequence_length=sequence_length,
+        target_horizon_months=target_horizon_months,
+        target_name=target_name,
+        normalize_per_sequence=normalize_per_sequence,
+        graph=graph,
+    ).to_sample_set()
@@ -0,0 +1,603 @@
+# src/kernels.py
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+ArrayLike = Union[pd.DataFrame, pd.Series, np.ndarray]
+CellFunction = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+# Upper bound on values gathered at once when evaluating max/min at cells
+_GATHER_CHUNK = 1 << 22
+
+# From this many columns, prefix sums are accumulated row by row; numpy's
+# axis-0 cumsum is several times slower on wide arrays
+_ROWWISE_PREFIX_MIN_COLS = 64
+
+
+# =========================
+# HELPERS
+# =========================
+
+def _to_2d(values: ArrayLike) -> np.ndarray:
+    """
+    Return a float64 (T, N) array for a DataFrame, Series or 1-D/2-D array.
+    Infinite values become NaN, as in pandas rolling windows.
+    """
+    arr = np.array(values, dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr[:, None]
+    if arr.ndim != 2:
+        raise ValueError("Expected 1-D or 2-D input.")
+    arr[np.isinf(arr)] = np.nan
+    return arr
+
+
+def _wrap(result: np.ndarray, like: ArrayLike) -> ArrayLike:
+    """
+    Give a kernel result the same type and labels as its input.
+    """
+    if isinstance(like, pd.DataFrame):
+        return pd.DataFrame(result, index=like.index, columns=like.columns)
+    if isinstance(like, pd.Series):
+        return pd.Series(result[:, 0], index=like.index, name=like.name)
+    if np.ndim(like) == 1:
+        return result[:, 0]
+    return result
+
+
+def _prefix(
+    values: np.ndarray,
+    initial: Optional[np.ndarray] = None,
+    start: int = 0,
+) -> np.ndarray:
+    """
+    Prefix sums with a leading zero row, so the sum over rows (t - w, t]
+    is out[t + 1] - out[t + 1 - w].
+
+    With `initial`, accumulation starts from out[start] = initial and rows
+    before `start` are ignored, continuing prefix sums saved from a longer
+    history with the same round-off.
+    """
+    out = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=values.dtype)
+    if initial is None and start == 0 and values.shape[1] < _ROWWISE_PREFIX_MIN_COLS:
+        np.cumsum(values, axis=0, out=out[1:])
+        return out
+
+    if initial is not None:
+        out[start] = initial
+    # Same sequential additions as cumsum, so the result is identical
+    for row in range(start, values.shape[0]):
+        np.add(out[row], values[row], out=out[row + 1])
+    return out
+
+
+def _nan_to_zero(values: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def _first_valid(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    First non-NaN value of each column (0 for all-NaN columns) and its row
+    (T for all-NaN columns). Used to centre prefix sums of squares and keep
+    them well conditioned.
+    """
+    valid = ~np.isnan(values)
+    has_valid = valid.any(axis=0)
+    first = np.argmax(valid, axis=0)
+    shift = values[first, np.arange(values.shape[1])]
+    return np.where(has_valid, shift, 0.0), np.where(has_valid, first, values.shape[0])
+
+
+def _rolling_extreme(values: np.ndarray, window: int, reduce: np.ufunc, fill: float) -> np.ndarray:
+    """
+    Trailing max/min for rows window-1.. via the van Herk/Gil-Werman scheme:
+    split rows into blocks of `window`, take running extremes forwards and
+    backwards inside each block, and combine one value from each side.
+    O(T) per column.
+    """
+    n_rows, n_cols = values.shape
+    n_blocks = -(-n_rows // window)
+    padded = np.full((n_blocks * window, n_cols), fill)
+    padded[:n_rows] = np.where(np.isnan(values), fill, values)
+    blocks = padded.reshape(n_blocks, window, n_cols)
+
+    forward = reduce.accumulate(blocks, axis=1).reshape(-1, n_cols)
+    backward = reduce.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, n_cols)
+
+    ends = np.arange(window - 1, n_rows)
+    return reduce(backward[ends - window + 1], forward[ends])
+
+
+# =========================
+# KERNELS
+# =========================
+
+class RollingKernel:
+    """
+    Trailing-window statistic over `window` rows of a (T, N) input.
+
+    Follows pandas `rolling(window, min_periods=window)`: NaN until the window
+    is full and wherever the window contains NaN.
+
+    `full()` evaluates every cell. `at(rows, cols)` evaluates only the given
+    cells, using the same precomputed arrays and arithmetic, so both give
+    bit-identical values.
+    """
+
+    def __init__(self, values: ArrayLike, window: int):
+        self._check_window(window)
+
+        self.window = window
+        # Prefix-sum kernels release `values` once their prefix arrays exist
+        self.values = _to_2d(values)
+        self.shape = self.values.shape
+        self._nan_prefix = _prefix(np.isnan(self.values).astype(np.int64))
+
+    def _check_window(self, window: int) -> None:
+        if window < 1:
+            raise ValueError("window must be at least 1.")
+
+    def _full_values(self) -> np.ndarray:
+        """
+        Statistic for rows window-1..T-1 (NaN windows are masked by caller).
+        """
+        raise NotImplementedError
+
+    def _cell_values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Statistic at complete, NaN-free windows ending at (rows, cols).
+        """
+        raise NotImplementedError
+
+    def full(self) -> np.ndarray:
+        n_rows = self.shape[0]
+        out = np.full(self.shape, np.nan)
+        if self.window > n_rows:
+            return out
+
+        nan_count = self._nan_prefix[self.window:] - self._nan_prefix[:n_rows - self.window + 1]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = self._full_values()
+        values[nan_count != 0] = np.nan
+
+        out[self.window - 1:] = values
+        return out
+
+    def at(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        out = np.full(rows.shape, np.nan)
+
+        cells = np.flatnonzero(rows >= self.window - 1)
+        nan_count = (
+            self._nan_prefix[rows[cells] + 1, cols[cells]]
+            - self._nan_prefix[rows[cells] + 1 - self.window, cols[cells]]
+        )
+        cells = cells[nan_count == 0]
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            out[cells] = self._cell_values(rows[cells], cols[cells])
+        return out
+
+
+@dataclass
+class PrefixState:
+    """
+    Float prefix rows and centring shifts of a prefix-sum kernel at one row.
+
+    A kernel built on a later slice of the same input with this state
+    continues the original prefix sums, so windows inside the slice give
+    bit-identical values to the kernel over the whole history.
+    """
+    prefixes: dict[str, np.ndarray]
+    shifts: dict[str, np.ndarray]
+    shift_known: dict[str, np.ndarray]
+
+
+class _PrefixKernel(RollingKernel):
+    """
+    Kernel whose statistic is an elementwise function of window totals of
+    prefix arrays and of the value at the window's last row.
+
+    Prefix arrays do not depend on the window, so `with_window` gives the
+    same statistic over another window without recomputing them.
+
+    Given a `state` saved with `state_at`, prefix sums restart from it at row
+    `start` of the input; earlier rows only warm up derived inputs and must
+    not be inside any evaluated window. Integer count prefixes are exact, so
+    only float prefixes are saved.
+    """
+
+    _float_prefixes: tuple[str, ...] = ()
+
+    def _start_state(self, state: Optional[PrefixState], start: int) -> None:
+        self._state = state
+        self._start = start
+        self._shifts: dict[str, np.ndarray] = {}
+        self._shift_rows: dict[str, np.ndarray] = {}
+
+    def _float_prefix(self, name: str, values: np.ndarray) -> np.ndarray:
+        initial = None if self._state is None else self._state.prefixes[name]
+        return _prefix(values, initial=initial, start=self._start)
+
+    def _shift(self, name: str, values: np.ndarray) -> np.ndarray:
+        """
+        Centring shift of `values`: the saved one for columns that already had
+        a valid value before the state row, else the first valid value.
+        """
+        shift, rows = _first_valid(values[self._start:])
+        rows = rows + self._start
+        if self._state is not None:
+            known = self._state.shift_known[name]
+            shift = np.where(known, self._state.shifts[name], shift)
+            rows = np.where(known, -1, rows)
+        self._shifts[name] = shift
+        self._shift_rows[name] = rows
+        return shift
+
+    def state_at(self, row: int) -> PrefixState:
+        """
+        State to continue this kernel's prefix sums from input row `row`.
+        """
+        return PrefixState(
+            prefixes={name: getattr(self, name)[row].copy() for name in self._float_prefixes},
+            shifts={name: shift.copy() for name, shift in self._shifts.items()},
+            shift_known={name: rows < row for name, rows in self._shift_rows.items()},
+        )
+
+    def with_window(self, window: int) -> "_PrefixKernel":
+        """
+        Kernel over `window` sharing this kernel's prefix arrays.
+        """
+        self._check_window(window)
+        kernel = copy.copy(self)
+        kernel.window = window
+        return kernel
+
+    def _evaluate(
+        self,
+        total: Callable[[np.ndarray], np.ndarray],
+        value: Callable[[np.ndarray], np.ndarray],
+    ) -> np.ndarray:
+        raise NotImplementedError
+
+    def _full_values(self) -> np.ndarray:
+        window = self.window
+        n_rows = self.shape[0]
+        return self._evaluate(
+            lambda prefix: prefix[window:] - prefix[:n_rows - window + 1],
+            lambda arr: arr[window - 1:],
+        )
+
+    def _cell_values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        window = self.window
+        return self._evaluate(
+            lambda prefix: prefix[rows + 1, cols] - prefix[rows + 1 - window, cols],
+            lambda arr: arr[rows, cols],
+        )
+
+
+class RollingSum(_PrefixKernel):
+    """
+    Trailing sum.
+    """
+
+    _float_prefixes = ("_sum_prefix",)
+
+    def __init__(
+        self,
+        values: ArrayLike,
+        window: int,
+        state: Optional[PrefixState] = None,
+        start: int = 0,
+    ):
+        super().__init__(values, window)
+        self._start_state(state, start)
+        self._sum_prefix = self._float_prefix("_sum_prefix", _nan_to_zero(self.values))
+        self.values = None
+
+    def _evaluate(self, total, value):
+        return total(self._sum_prefix)
+
+
+class RollingMean(RollingSum):
+    """
+    Trailing mean.
+    """
+
+    def _evaluate(self, total, value):
+        return total(self._sum_prefix) / self.window
+
+
+class RollingCompoundReturn(_PrefixKernel):
+    """
+    Compounded simple return prod(1 + r) - 1.
+
+    Computed from prefix sums of log|1 + r|, with zero and negative growth
+    factors counted separately so total losses (r = -1) give exactly -1.
+    """
+
+    _float_prefixes = ("_log_prefix",)
+
+    def __init__(
+        self,
+        returns: ArrayLike,
+        window: int,
+        state: Optional[PrefixState] = None,
+        start: int = 0,
+    ):
+        super().__init__(returns, window)
+        self._start_state(state, start)
+
+        growth = 1.0 + self.values
+        with np.errstate(divide="ignore"):
+            log_growth = np.log(np.abs(growth))
+        log_growth[growth == 0.0] = 0.0
+
+        self._log_prefix = self._float_prefix("_log_prefix", _nan_to_zero(log_growth))
+        self._zero_prefix = _prefix((growth == 0.0).astype(np.int64))
+        self._negative_prefix = _prefix((growth < 0.0).astype(np.int64))
+        self.values = None
+
+    def _evaluate(self, total, value):
+        sign = np.where(total(self._negative_prefix) % 2 == 1, -1.0, 1.0)
+        out = sign * np.exp(total(self._log_prefix)) - 1.0
+        out[total(self._zero_prefix) > 0] = -1.0
+        return out
+
+
+class RollingCov(_PrefixKernel):
+    """
+    Trailing covariance of `x` and `y`.
+
+    `y` is broadcast against `x`, so a single market series can be paired with
+    every column of a returns frame. NaN wherever either input has NaN in the
+    window. Prefix sums are centred on each column's first valid value.
+    """
+
+    _float_prefixes = ("_x_prefix", "_y_prefix", "_xy_prefix")
+
+    def __init__(
+        self,
+        x: ArrayLike,
+        y: ArrayLike,
+        window: int,
+        ddof: int = 1,
+        state: Optional[PrefixState] = None,
+        start: int = 0,
+    ):
+        self.ddof = ddof
+        self._check_window(window)
+        self._start_state(state, start)
+
+        x_arr = _to_2d(x)
+        y_arr = np.broadcast_to(_to_2d(y), x_arr.shape)
+
+        x_c = x_arr - self._shift("x", x_arr)
+        y_c = y_arr - self._shift("y", y_arr)
+
+        joint = np.isnan(x_c) | np.isnan(y_c)
+        x_c = np.where(joint, np.nan, x_c)
+        y_c = np.where(joint, np.nan, y_c)
+
+        super().__init__(x_c, window)
+        self._x_prefix = self._float_prefix("_x_prefix", _nan_to_zero(x_c))
+        self._y_prefix = self._float_prefix("_y_prefix", _nan_to_zero(y_c))
+        self._xy_prefix = self._float_prefix("_xy_prefix", _nan_to_zero(x_c * y_c))
+        self.values = None
+
+    def _check_window(self, window: int) -> None:
+        if window <= self.ddof:
+            raise ValueError("window must be larger than ddof.")
+
+    def _evaluate(self, total, value):
+        sum_x = total(self._x_prefix)
+        sum_y = total(self._y_prefix)
+        return (total(self._xy_prefix) - sum_x * sum_y / self.window) / (self.window - self.ddof)
+
+
+class RollingVar(_PrefixKernel):
+    """
+    Trailing variance. Constant windows give exactly 0, and round-off never
+    makes the result negative.
+    """
+
+    _float_prefixes = ("_x_prefix", "_xx_prefix")
+
+    def __init__(
+        self,
+        values: ArrayLike,
+        window: int,
+        ddof: int = 1,
+        state: Optional[PrefixState] = None,
+        start: int = 0,
+    ):
+        self.ddof = ddof
+        super().__init__(values, window)
+        self._start_state(state, start)
+
+        centred = _nan_to_zero(self.values - self._shift("x", self.values))
+        self._x_prefix = self._float_prefix("_x_prefix", centred)
+        self._xx_prefix = self._float_prefix("_xx_prefix", centred * centred)
+
+        # changes[t] = 1 when row t+1 differs from row t; a window is constant
+        # when no change happens before its last row.
+        changes = np.zeros(self.values.shape, dtype=np.int64)
+        changes[:-1] = self.values[1:] != self.values[:-1]
+        self._changes = changes
+        self._change_prefix = _prefix(changes)
+        self.values = None
+
+    def _check_window(self, window: int) -> None:
+        if window <= self.ddof:
+            raise ValueError("window must be larger than ddof.")
+
+    def _evaluate(self, total, value):
+        sum_x = total(self._x_prefix)
+        out = (total(self._xx_prefix) - sum_x * sum_x / self.window) / (self.window - self.ddof)
+        out = np.maximum(out, 0.0)
+        out[total(self._change_prefix) - value(self._changes) == 0] = 0.0
+        return out
+
+
+class RollingStd(RollingVar):
+    """
+    Trailing standard deviation.
+    """
+
+    def _evaluate(self, total, value):
+        return np.sqrt(super()._evaluate(total, value))
+
+
+class _RollingExtreme(RollingKernel):
+    _reduce: np.ufunc = np.maximum
+    _fill: float = -np.inf
+
+    def __init__(self, values: ArrayLike, window: int):
+        super().__init__(values, window)
+        self._full_cache: np.ndarray | None = None
+
+    def _full_values(self) -> np.ndarray:
+        if self._full_cache is None:
+            self._full_cache = _rolling_extreme(self.values, self.window, self._reduce, self._fill)
+        return self._full_cache.copy()
+
+    def _cell_values(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        # Gathering windows costs O(window) per cell; past O(T * N) in total
+        # one blocked scan over the whole input is cheaper
+        if self._full_cache is not None or len(rows) * self.window > self.values.size:
+            if self._full_cache is None:
+                self._full_cache = _rolling_extreme(self.values, self.window, self._reduce, self._fill)
+            return self._full_cache[rows - self.window + 1, cols]
+
+        out = np.empty(rows.shape)
+        offsets = np.arange(1 - self.window, 1)
+        chunk = max(1, _GATHER_CHUNK // self.window)
+
+        for start in range(0, len(rows), chunk):
+            r = rows[start:start + chunk, None] + offsets
+            c = cols[start:start + chunk, None]
+            out[start:start + chunk] = self._reduce.reduce(self.values[r, c], axis=1)
+        return out
+
+
+class RollingMax(_RollingExtreme):
+    """
+    Trailing maximum.
+    """
+
+    _reduce = np.maximum
+    _fill = -np.inf
+
+
+class RollingMin(_RollingExtreme):
+    """
+    Trailing minimum.
+    """
+
+    _reduce = np.minimum
+    _fill = np.inf
+
+
+def rolling_sum(values: ArrayLike, window: int) -> ArrayLike:
+    return _wrap(RollingSum(values, window).full(), values)
+
+
+def rolling_mean(values: ArrayLike, window: int) -> ArrayLike:
+    return _wrap(RollingMean(values, window).full(), values)
+
+
+def rolling_compound_return(returns: ArrayLike, window: int) -> ArrayLike:
+    return _wrap(RollingCompoundReturn(returns, window).full(), returns)
+
+
+def rolling_max(values: ArrayLike, window: int) -> ArrayLike:
+    return _wrap(RollingMax(values, window).full(), values)
+
+
+def rolling_min(values: ArrayLike, window: int) -> ArrayLike:
+    return _wrap(RollingMin(values, window).full(), values)
+
+
+def rolling_cov(x: ArrayLike, y: ArrayLike, window: int, ddof: int = 1) -> ArrayLike:
+    return _wrap(RollingCov(x, y, window, ddof=ddof).full(), x)
+
+
+def rolling_var(values: ArrayLike, window: int, ddof: int = 1) -> ArrayLike:
+    return _wrap(RollingVar(values, window, ddof=ddof).full(), values)
+
+
+def rolling_std(values: ArrayLike, window: int, ddof: int = 1) -> ArrayLike:
+    return _wrap(RollingStd(values, window, ddof=ddof).full(), values)
+
+
+# =========================
+# MONTH-END SAMPLING
+# =========================
+
+def month_end_offsets(index: pd.DatetimeIndex) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """
+    Calendar month-ends spanning a sorted daily index, as produced by
+    `resample("ME")`, with the first and last row position of each month.
+    Months without rows get first > last.
+    """
+    index = pd.DatetimeIndex(index)
+    if len(index) == 0:
+        return pd.DatetimeIndex([], name=index.name, freq="ME"), np.empty(0, np.int64), np.empty(0, np.int64)
+
+    periods = np.asarray(index.year * 12 + index.month - 1, dtype=np.int64)
+    codes = periods - periods[0]
+    months = np.arange(codes[-1] + 1)
+
+    first_row = np.searchsorted(codes, months, side="left")
+    last_row = np.searchsorted(codes, months, side="right") - 1
+
+    month_ends = pd.date_range(
+        start=(index[0] + pd.offsets.MonthEnd(0)).normalize(),
+        periods=len(months),
+        freq="ME",
+        name=index.name,
+    )
+    return month_ends, first_row, last_row
+
+
+def sample_month_end(
+    index: pd.DatetimeIndex,
+    columns: pd.Index,
+    cell_fn: CellFunction,
+) -> pd.DataFrame:
+    """
+    Month-end sample of a daily feature without computing the daily frame.
+
+    Returns exactly what `feature.resample("ME").last()` gives, i.e. for each
+    month and column the value at the last row where the feature is not NaN.
+    `cell_fn(rows, cols)` evaluates the feature at integer cells of the daily
+    frame. Evaluation starts at each month's last row and steps back only for
+    cells that are still NaN.
+    """
+    month_ends, first_row, last_row = month_end_offsets(index)
+    out = np.full((len(month_ends), len(columns)), np.nan)
+
+    has_rows = np.broadcast_to((last_row >= first_row)[:, None], out.shape)
+    months, cols = np.nonzero(has_rows)
+    rows = last_row[months]
+
+    while len(rows):
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = np.asarray(cell_fn(rows, cols), dtype=np.float64)
+
+        found = ~np.isnan(values)
+        out[months[found], cols[found]] = values[found]
+
+        rows = rows - 1
+        pending = ~found & (rows >= first_row[months])
+        months, cols, rows = months[pending], cols[pending], rows[pending]
+
+    return pd.DataFrame(out, index=month_ends, columns=columns)
@@ -0,0 +1,175 @@
+# src/long_dataset.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.compact_dataset import feature_dtype
+from src.quantile_sketch import QuantileSketch
+
+
+@dataclass
+class LongDataset:
+    """
+    Long (date, ticker) dataset kept sorted by date, with cached model inputs.
+
+    - frame: the long table; rows of one month are contiguous
+    - X / y: feature matrix and target vector of `frame`, built once
+    - dates: the distinct dates in order
+    - offsets: rows of dates[i] are offsets[i]:offsets[i + 1]
+
+    Folds over contiguous date ranges are row slices, so `before`, `on` and
+    `between` share memory with this dataset instead of masking and copying.
+    They also share `sketches`, the quantile sketches of windows already
+    summarized (see `quantile_sketch`).
+    """
+    frame: pd.DataFrame
+    X: np.ndarray
+    y: np.ndarray
+    dates: pd.DatetimeIndex
+    offsets: np.ndarray
+    feature_cols: list[str]
+    target_col: str
+    sketches: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_long(
+        cls,
+        df_long: pd.DataFrame,
+        feature_cols: list[str],
+        target_col: str,
+    ) -> "LongDataset":
+        """
+        Build from a long table. Rows are stably sorted by date, so a table
+        already in date order keeps its row order.
+        """
+        if isinstance(df_long, LongDataset):
+            return df_long
+
+        dates = pd.DatetimeIndex(df_long.index.get_level_values("date"))
+        if not dates.is_monotonic_increasing:
+            order = np.argsort(dates.asi8, kind="stable")
+            df_long = df_long.iloc[order]
+            dates = dates[order]
+
+        unique_dates, counts = np.unique(dates.asi8, return_counts=True)
+        offsets = np.zeros(len(unique_dates) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        return cls(
+            frame=df_long,
+            X=np.ascontiguousarray(df_long[feature_cols].to_numpy(dtype=feature_dtype(df_long, feature_cols))),
+            y=df_long[target_col].to_numpy(dtype=float),
+            dates=pd.DatetimeIndex(unique_dates.astype(dates.dtype)),
+            offsets=offsets,
+            feature_cols=list(feature_cols),
+            target_col=target_col,
+        )
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def take(self, lo: int, hi: int) -> "LongDataset":
+        """
+        Dates lo:hi (positions in `dates`) as a dataset sharing memory.
+        """
+        start, end = self.offsets[lo], self.offsets[hi]
+        return LongDataset(
+            frame=self.frame.iloc[start:end],
+            X=self.X[start:end],
+            y=self.y[start:end],
+            dates=self.dates[lo:hi],
+            offsets=self.offsets[lo:hi + 1] - start,
+            feature_cols=self.feature_cols,
+            target_col=self.target_col,
+            sketches=self.sketches,
+        )
+
+    def before(self, date: pd.Timestamp) -> "LongDataset":
+        """
+        Rows dated strictly before `date`.
+        """
+        return self.take(0, self.dates.searchsorted(pd.Timestamp(date), side="left"))
+
+    def on(self, date: pd.Timestamp) -> "LongDataset":
+        """
+        Rows dated exactly `date`.
+        """
+        date = pd.Timestamp(date)
+        return self.take(
+            self.dates.searchsorted(date, side="left"),
+            self.dates.searchsorted(date, side="right"),
+        )
+
+    def between(
+        self,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> "LongDataset":
+        """
+        Rows with start <= date <= end.
+        """
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return self.take(lo, hi)
+
+    def for_dates(self, dates: pd.Index) -> "LongDataset":
+        """
+        Rows of `dates`, which must be a contiguous run of this dataset's
+        dates (as the expanding folds of the tuners are).
+        """
+        dates = pd.DatetimeIndex(dates).sort_values()
+        subset = self.between(dates[0], dates[-1])
+        if not subset.dates.equals(dates.intersection(self.dates)):
+            raise ValueError("dates must be a contiguous run of the dataset's dates.")
+        return subset
+
+    def xy(self, feature_cols: Optional[list[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (X, y); views of the cached arrays unless other feature columns
+        are requested.
+        """
+        if feature_cols is None or list(feature_cols) == self.feature_cols:
+            return self.X, self.y
+        positions = [self.feature_cols.index(col) for col in feature_cols]
+        return self.X[:, positions], self.y
+
+    def quantile_sketch(self, k: int = 256) -> QuantileSketch:
+        """
+        Quantile sketch of the feature columns. Sketches are cached by window
+        and shared with the datasets sliced from this one, so a window that
+        extends a cached one (the next walk-forward month, a longer expanding
+        fold) only sketches the months it adds. Treat the result as read-only.
+        """
+        if self.empty:
+            raise ValueError("Cannot sketch an empty dataset.")
+
+        first, last = self.dates[0], self.dates[-1]
+        key = (k, first, last)
+        if key in self.sketches:
+            return self.sketches[key]
+
+        # Longest cached window with the same start that this one extends
+        cached = [
+            end for (size, start, end) in self.sketches
+            if size == k and start == first and end < last
+        ]
+        if cached:
+            end = max(cached)
+            sketch = self.sketches[(k, first, end)].copy()
+            start_row = self.offsets[self.dates.searchsorted(end, side="right")]
+        else:
+            sketch = QuantileSketch(n_features=self.X.shape[1], k=k)
+            start_row = 0
+
+        sketch.update(self.X[start_row:])
+        self.sketches[key] = sketch
+        return sketch
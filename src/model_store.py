@@ -0,0 +1,457 @@
+# src/model_store.py
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.feature_cache import cache_key, fingerprint_modules
+
+
+MODEL_STORE_META_FILENAME = "meta.json"
+# Fit arguments that change how fast a model trains, not what it learns
+RUNTIME_FIT_KWARGS = {"n_jobs"}
+
+
+# =========================
+# SERIALIZATION
+# =========================
+
+def _save_joblib(artifacts: Any, directory: str) -> None:
+    # Uncompressed: loading is bound by disk reads, not decompression
+    joblib.dump(artifacts, os.path.join(directory, "artifacts.joblib"))
+
+
+def _load_joblib(directory: str) -> Any:
+    return joblib.load(os.path.join(directory, "artifacts.joblib"))
+
+
+def _save_without_model(artifacts: Any, directory: str) -> None:
+    with open(os.path.join(directory, "artifacts.pkl"), "wb") as f:
+        pickle.dump(dataclasses.replace(artifacts, model=None), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_without_model(directory: str) -> Any:
+    with open(os.path.join(directory, "artifacts.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+def _save_xgboost(artifacts: Any, directory: str) -> None:
+    artifacts.model.save_model(os.path.join(directory, "model.ubj"))
+    _save_without_model(artifacts, directory)
+
+
+def _load_xgboost(directory: str) -> Any:
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor()
+    model.load_model(os.path.join(directory, "model.ubj"))
+    return dataclasses.replace(_load_without_model(directory), model=model)
+
+
+def _save_keras(artifacts: Any, directory: str) -> None:
+    artifacts.model.save(os.path.join(directory, "model.keras"))
+    _save_without_model(artifacts, directory)
+
+
+def _load_keras(directory: str) -> Any:
+    from tensorflow import keras
+
+    model = keras.models.load_model(os.path.join(directory, "model.keras"))
+    return dataclasses.replace(_load_without_model(directory), model=model)
+
+
+@dataclass(frozen=True)
+class ModelFamily:
+    """
+    How one model family is keyed and stored.
+
+    - config_params: src.config settings that shape the fitted model
+    - module: the module that fits it; its source is part of the key
+    - save(artifacts, directory) / load(directory) -> artifacts
+    """
+    config_params: tuple[str, ...]
+    module: str
+    save: Callable[[Any, str], None]
+    load: Callable[[str], Any]
+
+
+MODEL_FAMILIES = {
+    "ridge": ModelFamily(
+        config_params=("SCALER_TYPE", "ROBUST_SCALER_SKETCH", "QUANTILE_SKETCH_SIZE"),
+        module="src.models.linear",
+        save=_save_joblib,
+        load=_load_joblib,
+    ),
+    "random_forest": ModelFamily(
+        config_params=(
+            "RF_N_ESTIMATORS", "RF_MAX_DEPTH", "RF_MIN_SAMPLES_LEAF",
+            "RF_MIN_SAMPLES_SPLIT", "RF_MAX_FEATURES", "RF_BOOTSTRAP",
+        ),
+        module="src.models.tree",
+        save=_save_joblib,
+        load=_load_joblib,
+    ),
+    "xgboost": ModelFamily(
+        config_params=(
+            "XGB_N_ESTIMATORS", "XGB_MAX_DEPTH", "XGB_LEARNING_RATE", "XGB_SUBSAMPLE",
+            "XGB_COLSAMPLE_BYTREE", "XGB_MIN_CHILD_WEIGHT", "XGB_GAMMA",
+            "XGB_REG_ALPHA", "XGB_REG_LAMBDA",
+        ),
+        module="src.models.xgboost_model",
+        save=_save_xgboost,
+        load=_load_xgboost,
+    ),
+    "mlp": ModelFamily(
+        config_params=(
+            "SCALER_TYPE", "ROBUST_SCALER_SKETCH", "QUANTILE_SKETCH_SIZE",
+            "NN_HIDDEN_1", "NN_HIDDEN_2", "NN_HIDDEN_3",
+            "NN_DROPOUT_1", "NN_DROPOUT_2", "NN_DROPOUT_3", "NN_L2", "NN_LEARNING_RATE",
+            "NN_EPOCHS", "NN_BATCH_SIZE", "NN_VALIDATION_FRACTION",
+            "NN_EARLY_STOPPING_PATIENCE", "NN_LR_PATIENCE",
+        ),
+        module="src.models.nn_mlp",
+        save=_save_keras,
+        load=_load_keras,
+    ),
+    "lstm": ModelFamily(
+        config_params=(
+            "LSTM_UNITS", "LSTM_DENSE_UNITS", "LSTM_DROPOUT", "LSTM_RECURRENT_DROPOUT",
+            "LSTM_L2", "LSTM_LEARNING_RATE", "LSTM_EPOCHS", "LSTM_BATCH_SIZE",
+            "LSTM_VALIDATION_FRACTION", "LSTM_EARLY_STOPPING_PATIENCE", "LSTM_LR_PATIENCE",
+        ),
+        module="src.models.lstm_model",
+        save=_save_keras,
+        load=_load_keras,
+    ),
+}
+
+
+# =========================
+# KEYS
+# =========================
+
+def fingerprint_arrays(*arrays: np.ndarray) -> str:
+    """
+    Content hash of numpy arrays: shapes, dtypes and values.
+    """
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(repr((array.shape, str(array.dtype))).encode("utf-8"))
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def training_fingerprint(
+    train_data: Any,
+    feature_cols: Optional[list[str]] = None,
+    target_col: Optional[str] = None,
+) -> tuple[str, Optional[str]]:
+    """
+    (fingerprint, cutoff date) of the data a model is trained on.
+
+    Long tables (DataFrame, LongDataset) are hashed on the model inputs
+    X and y; the LSTM datasets on their arrays. The cutoff is the last
+    training date.
+    """
+    from src.features_lstm import LSTMSampleSet, LSTMSequenceIndex
+    from src.long_dataset import LongDataset
+
+    if isinstance(train_data, LongDataset):
+        X, y = train_data.xy(feature_cols)
+        fingerprint = fingerprint_arrays(X, y)
+        dates = train_data.dates
+    elif isinstance(train_data, LSTMSequenceIndex):
+        fingerprint = fingerprint_arrays(
+            train_data.daily, train_data.end_rows, train_data.ticker_idx, train_data.y,
+            np.array([train_data.sequence_length, int(train_data.normalize_per_sequence)]),
+        )
+        dates = pd.DatetimeIndex(train_data.dates)
+    elif isinstance(train_data, LSTMSampleSet):
+        fingerprint = fingerprint_arrays(train_data.X, train_data.y)
+        dates = pd.DatetimeIndex(train_data.dates)
+    elif isinstance(train_data, pd.DataFrame):
+        fingerprint = fingerprint_arrays(
+            train_data[feature_cols].to_numpy(),
+            train_data[target_col].to_numpy(dtype=float),
+        )
+        dates = train_data.index.get_level_values("date")
+    else:
+        raise ValueError(f"Cannot fingerprint training data of type {type(train_data).__name__}.")
+
+    cutoff = str(pd.Timestamp(dates.max()).date()) if len(dates) else None
+    return cache_key(fingerprint, list(feature_cols or []), target_col), cutoff
+
+
+def model_params(family: str, fit_kwargs: Optional[dict] = None) -> dict:
+    """
+    Hyperparameters of `family`: its src.config settings, overridden by a
+    `params` fit argument of the same setting names, plus the other explicit
+    fit arguments (runtime-only ones like n_jobs excluded).
+    """
+    from src import config
+
+    if family not in MODEL_FAMILIES:
+        raise ValueError(f"Unknown model family: {family}")
+
+    params = {name: getattr(config, name, None) for name in MODEL_FAMILIES[family].config_params}
+    for name, value in (fit_kwargs or {}).items():
+        if name == "params":
+            params.update(value or {})
+        elif name not in RUNTIME_FIT_KWARGS:
+            params[name] = value
+    return params
+
+
+# =========================
+# STORE
+# =========================
+
+class StoredModel:
+    """
+    A model in the store. `meta` is read up front; the artifacts are only
+    loaded on first access.
+    """
+
+    def __init__(self, directory: str, family: str):
+        self.directory = directory
+        self.family = family
+        with open(os.path.join(directory, MODEL_STORE_META_FILENAME)) as f:
+            self.meta = json.load(f)
+
+    @cached_property
+    def artifacts(self) -> Any:
+        return MODEL_FAMILIES[self.family].load(self.directory)
+
+
+class ModelStore:
+    """
+    Content-addressed store of fitted models under `root`, one directory
+    per model: root/<family>/<key>/ with meta.json and the saved model.
+
+    Keys cover the model family, its hyperparameters, the model code, the
+    training-data fingerprint and the cutoff date. Loading a model
+    refreshes its modification time, and after each save the least
+    recently used models are evicted until the store holds at most
+    `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        family: str,
+        fit: Callable[..., Any],
+        params: dict,
+        train_data: Any,
+        feature_cols: Optional[list[str]] = None,
+        target_col: Optional[str] = None,
+    ) -> tuple[str, dict]:
+        """
+        Key of a model and the metadata saved with it. The fit function is
+        part of the key, e.g. incremental and full Ridge fits differ.
+        """
+        fingerprint, cutoff = training_fingerprint(train_data, feature_cols, target_col)
+        code = fingerprint_modules(importlib.import_module(MODEL_FAMILIES[family].module))
+        meta = {
+            "family": family,
+            "fit": f"{fit.__module__}.{fit.__qualname__}",
+            "params": params,
+            "data_fingerprint": fingerprint,
+            "cutoff_date": cutoff,
+            "code_fingerprint": code,
+        }
+        return cache_key(family, meta["fit"], params, fingerprint, cutoff, code), meta
+
+    def _directory(self, family: str, key: str) -> str:
+        return os.path.join(self.root, family, key)
+
+    def get(self, family: str, key: str) -> Optional[StoredModel]:
+        directory = self._directory(family, key)
+        meta_path = os.path.join(directory, MODEL_STORE_META_FILENAME)
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+
+        os.utime(meta_path)
+        self.hits += 1
+        return StoredModel(directory, family)
+
+    def save(self, family: str, key: str, artifacts: Any, meta: dict) -> None:
+        directory = self._directory(family, key)
+        tmp_directory = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        MODEL_FAMILIES[family].save(artifacts, tmp_directory)
+        with open(os.path.join(tmp_directory, MODEL_STORE_META_FILENAME), "w") as f:
+            json.dump({**meta, "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2, default=str)
+
+        # Another process may have saved the same model meanwhile
+        if os.path.exists(directory):
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+        else:
+            os.replace(tmp_directory, directory)
+
+        self.evict(keep=directory)
+
+    def fit_or_get(
+        self,
+        family: str,
+        fit: Callable[..., Any],
+        train_data: Any,
+        feature_cols: Optional[list[str]] = None,
+        target_col: Optional[str] = None,
+        fit_kwargs: Optional[dict] = None,
+        label: Optional[str] = None,
+    ) -> StoredModel:
+        """
+        Stored model of `fit(train_data, feature_cols, target_col,
+        **fit_kwargs)`, fitting and saving it on a miss. On a hit nothing
+        but meta.json is read until `.artifacts` is accessed. For the LSTM
+        pass `fit` taking the dataset alone (feature_cols=None).
+        """
+        fit_kwargs = fit_kwargs or {}
+        key, meta = self.key(family, fit, model_params(family, fit_kwargs), train_data, feature_cols, target_col)
+        label = label or family
+
+        stored = self.get(family, key)
+        if stored is not None:
+            print(f"Model store hit: {label} ({key[:12]}, cutoff {meta['cutoff_date']})")
+            return stored
+
+        print(f"Model store miss: {label} ({key[:12]}), training")
+        if feature_cols is None:
+            artifacts = fit(train_data, **fit_kwargs)
+        else:
+            artifacts = fit(train_data, feature_cols, target_col, **fit_kwargs)
+        self.save(family, key, artifacts, meta)
+
+        # The fitted artifacts stand in for loading them back
+        stored = StoredModel(self._directory(family, key), family)
+        stored.artifacts = artifacts
+        return stored
+
+    def fit_or_load(
+        self,
+        family: str,
+        fit: Callable[..., Any],
+        train_data: Any,
+        feature_cols: Optional[list[str]] = None,
+        target_col: Optional[str] = None,
+        fit_kwargs: Optional[dict] = None,
+        label: Optional[str] = None,
+    ) -> Any:
+        """
+        Artifacts of `fit_or_get`, loaded right away on a hit.
+        """
+        return self.fit_or_get(family, fit, train_data, feature_cols, target_col, fit_kwargs, label).artifacts
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for family in os.listdir(self.root):
+            family_dir = os.path.join(self.root, family)
+            if not os.path.isdir(family_dir):
+                continue
+            for name in os.listdir(family_dir):
+                directory = os.path.join(family_dir, name)
+                meta_path = os.path.join(directory, MODEL_STORE_META_FILENAME)
+                if ".tmp-" in name or not os.path.exists(meta_path):
+                    continue
+                size = sum(
+                    os.path.getsize(os.path.join(dirpath, filename))
+                    for dirpath, _, filenames in os.walk(directory)
+                    for filename in filenames
+                )
+                entries.append((directory, os.stat(meta_path).st_mtime, size))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used models until the store fits `max_bytes`.
+        The model directory `keep` is never removed. Returns the number removed.
+        """
+        if self.max_bytes is None:
+            return 0
+
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+
+        removed = 0
+        for directory, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if directory == keep:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+@dataclass
+class StoredFit:
+    """
+    A model's fit function routed through a ModelStore, with the same
+    signature, e.g. as the `fit` of a WalkForwardModel. Picklable as long
+    as `fit` is a module-level function.
+    """
+    store: ModelStore
+    family: str
+    fit: Callable[..., Any]
+
+    def __call__(self, train_df: Any, feature_cols: list[str], target_col: str, **fit_kwargs: Any) -> Any:
+        return self.store.fit_or_load(
+            self.family,
+            self.fit,
+            train_df,
+            feature_cols,
+            target_col,
+            fit_kwargs=fit_kwargs,
+        )
+
+
+def stored_fit(store: Optional[ModelStore], family: str, fit: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    `fit` through `store`, or `fit` itself without a store.
+    """
+    return fit if store is None else StoredFit(store=store, family=family, fit=fit)
+
+
+def model_store_from_config() -> Optional[ModelStore]:
+    """
+    Store described by the MODEL_STORE_* settings in src.config, or None
+    when it is turned off.
+    """
+    from src import config
+
+    if not getattr(config, "USE_MODEL_STORE", False):
+        return None
+
+    return ModelStore(
+        root=getattr(config, "MODEL_STORE_DIR", "data/cache/models"),
+        max_bytes=getattr(config, "MODEL_STORE_MAX_BYTES", None),
+    )
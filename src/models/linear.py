@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -12,6 +12,104 @@ from sklearn.linear_model import Ridge
 from sklearn.preprocessing import RobustScaler, StandardScaler
 
 from src import config
+from src.compact_dataset import feature_dtype
+from src.feature_panel import FeaturePanel
+from src.long_dataset import LongDataset
+from src.quantile_sketch import (
+    QuantileSketch,
+    SketchRobustScaler,
+    handle_zeros_in_scale,
+    sketch_scaler,
+)
+
+
+@dataclass
+class RidgeStatistics:
+    """
+    Running sufficient statistics of a Ridge fit, merged month by month.
+
+    - n, mean_x, mean_y: row count and column means
+    - cxx, cxy: centred cross products X'X and X'y
+    - sketch: per-column quantiles for the robust scaler
+    - last_date: newest date already included
+
+    Moments are merged with Chan's pairwise update, which stays accurate
+    without ever summing raw squares.
+    """
+    n: int
+    mean_x: np.ndarray
+    mean_y: float
+    cxx: np.ndarray
+    cxy: np.ndarray
+    sketch: QuantileSketch
+    last_date: Optional[pd.Timestamp] = None
+
+    @classmethod
+    def empty(cls, n_features: int) -> "RidgeStatistics":
+        return cls(
+            n=0,
+            mean_x=np.zeros(n_features),
+            mean_y=0.0,
+            cxx=np.zeros((n_features, n_features)),
+            cxy=np.zeros(n_features),
+            sketch=QuantileSketch(n_features=n_features, k=getattr(config, "QUANTILE_SKETCH_SIZE", 256)),
+        )
+
+    def copy(self) -> "RidgeStatistics":
+        return RidgeStatistics(
+            n=self.n,
+            mean_x=self.mean_x.copy(),
+            mean_y=self.mean_y,
+            cxx=self.cxx.copy(),
+            cxy=self.cxy.copy(),
+            sketch=self.sketch.copy(),
+            last_date=self.last_date,
+        )
+
+    def update(self, X: np.ndarray, y: np.ndarray) -> "RidgeStatistics":
+        """
+        Add the rows (X, y).
+        """
+        if not len(y):
+            return self
+
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n_new = len(y)
+        mean_x_new = X.mean(axis=0)
+        mean_y_new = float(y.mean())
+        Xc = X - mean_x_new
+        yc = y - mean_y_new
+
+        n = self.n + n_new
+        dx = mean_x_new - self.mean_x
+        dy = mean_y_new - self.mean_y
+        weight = self.n * n_new / n
+
+        self.cxx = self.cxx + Xc.T @ Xc + weight * np.outer(dx, dx)
+        self.cxy = self.cxy + Xc.T @ yc + weight * dx * dy
+        self.mean_x = self.mean_x + dx * n_new / n
+        self.mean_y = self.mean_y + dy * n_new / n
+        self.n = n
+        # Only the robust scaler reads the sketch
+        if getattr(config, "SCALER_TYPE", "robust").lower() != "standard":
+            self.sketch.update(X)
+        return self
+
+    def scaler(self, scaler_type: str) -> StandardScaler | SketchRobustScaler:
+        """
+        A fitted sklearn scaler built from the statistics: exact for
+        "standard", approximate (quantile sketch) for "robust".
+        """
+        if scaler_type == "standard":
+            scaler = StandardScaler()
+            scaler.mean_ = self.mean_x.copy()
+            scaler.var_ = np.diag(self.cxx) / self.n
+            scaler.scale_ = handle_zeros_in_scale(np.sqrt(scaler.var_))
+            scaler.n_samples_seen_ = self.n
+            scaler.n_features_in_ = len(self.mean_x)
+            return scaler
+        return SketchRobustScaler.from_sketch(self.sketch)
 
 
 @dataclass
@@ -23,17 +121,23 @@ class LinearModelArtifacts:
     model: Ridge
     feature_cols: list[str]
     target_col: str
+    stats: Optional[RidgeStatistics] = None
 
 
 def prepare_xy(
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | FeaturePanel | LongDataset,
     feature_cols: list[str],
     target_col: str,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert a long ML dataframe into feature matrix X and target vector y.
+    A FeaturePanel or LongDataset is read directly, without copying feature
+    columns out of a long frame, and float32 (compact) features are not upcast.
     """
-    X = df_long[feature_cols].to_numpy(dtype=float)
+    if isinstance(df_long, (FeaturePanel, LongDataset)):
+        return df_long.xy(feature_cols)
+
+    X = df_long[feature_cols].to_numpy(dtype=feature_dtype(df_long, feature_cols))
     y = df_long[target_col].to_numpy(dtype=float)
     return X, y
 
@@ -51,11 +155,13 @@ def fit_ridge_with_scaler(
 
     scaler_type = getattr(config, "SCALER_TYPE", "robust").lower()
     if scaler_type == "standard":
-        scaler = StandardScaler()
+        scaler = StandardScaler().fit(X_train)
+    elif getattr(config, "ROBUST_SCALER_SKETCH", False):
+        scaler = sketch_scaler(train_df, X_train, feature_cols)
     else:
-        scaler = RobustScaler()
+        scaler = RobustScaler().fit(X_train)
 
-    X_train_scaled = scaler.fit_transform(X_train)
+    X_train_scaled = scaler.transform(X_train)
 
     model = Ridge(alpha=alpha, random_state=42)
     model.fit(X_train_scaled, y_train)
@@ -68,9 +174,125 @@ def fit_ridge_with_scaler(
     )
 
 
+def _rows_after(
+    train_df: pd.DataFrame | LongDataset,
+    last_date: Optional[pd.Timestamp],
+) -> pd.DataFrame | LongDataset:
+    """
+    Rows of `train_df` dated after `last_date` (all rows when None).
+    """
+    if last_date is None:
+        return train_df
+    if isinstance(train_df, LongDataset):
+        return train_df.take(train_df.dates.searchsorted(last_date, side="right"), len(train_df.dates))
+    return train_df[train_df.index.get_level_values("date") > last_date]
+
+
+def _latest_date(train_df: pd.DataFrame | LongDataset) -> Optional[pd.Timestamp]:
+    if isinstance(train_df, LongDataset):
+        return train_df.dates[-1] if len(train_df.dates) else None
+    dates = train_df.index.get_level_values("date")
+    return dates.max() if len(dates) else None
+
+
+def solve_ridge(
+    stats: RidgeStatistics,
+    feature_cols: list[str],
+    target_col: str,
+    alpha: float = 1.0,
+) -> LinearModelArtifacts:
+    """
+    Ridge on the scaled features, solved from the statistics alone in
+    O(F^3) whatever the number of rows.
+
+    Scaling is affine per column, z = (x - center) / scale, so the centred
+    system of the scaled features is D^-1 Cxx D^-1 w = D^-1 Cxy with
+    D = diag(scale), and the intercept follows from the means. This is the
+    problem sklearn's Ridge solves on scaler.fit_transform(X).
+    """
+    if stats.n == 0:
+        raise ValueError("Cannot solve Ridge without training rows.")
+
+    scaler_type = getattr(config, "SCALER_TYPE", "robust").lower()
+    scaler = stats.scaler(scaler_type)
+    center = scaler.mean_ if scaler_type == "standard" else scaler.center_
+
+    inv_scale = 1.0 / scaler.scale_
+    gram = stats.cxx * np.outer(inv_scale, inv_scale)
+    gram[np.diag_indices_from(gram)] += alpha
+    coef = np.linalg.solve(gram, stats.cxy * inv_scale)
+    intercept = stats.mean_y - ((stats.mean_x - center) * inv_scale) @ coef
+
+    model = Ridge(alpha=alpha, random_state=42)
+    model.coef_ = coef
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = len(coef)
+
+    return LinearModelArtifacts(
+        scaler=scaler,
+        model=model,
+        feature_cols=feature_cols,
+        target_col=target_col,
+        stats=stats,
+    )
+
+
+def fit_ridge_incremental(
+    train_df: pd.DataFrame | LongDataset,
+    feature_cols: list[str],
+    target_col: str,
+    alpha: float = 1.0,
+) -> LinearModelArtifacts:
+    """
+    Ridge fitted through running statistics, so that `update_ridge_incremental`
+    can extend it month by month. Matches `fit_ridge_with_scaler` up to
+    rounding with SCALER_TYPE = "standard"; the robust scaler's medians and
+    IQRs come from a quantile sketch and are approximate.
+    """
+    stats = RidgeStatistics.empty(len(feature_cols))
+    stats.update(*prepare_xy(train_df, feature_cols, target_col))
+    stats.last_date = _latest_date(train_df)
+    return solve_ridge(stats, feature_cols, target_col, alpha=alpha)
+
+
+def update_ridge_incremental(
+    artifacts: LinearModelArtifacts,
+    train_df: pd.DataFrame | LongDataset,
+    feature_cols: list[str],
+    target_col: str,
+    alpha: float = 1.0,
+) -> LinearModelArtifacts:
+    """
+    Extend a fit from `fit_ridge_incremental` with the rows of `train_df`
+    dated after the ones it has seen, and re-solve. `train_df` is the
+    expanding window; only its new months are read. `artifacts` is left
+    unchanged.
+    """
+    if artifacts.stats is None or list(artifacts.feature_cols) != list(feature_cols):
+        return fit_ridge_incremental(train_df, feature_cols, target_col, alpha=alpha)
+
+    stats = artifacts.stats.copy()
+    new_rows = _rows_after(train_df, stats.last_date)
+    if len(new_rows):
+        stats.update(*prepare_xy(new_rows, feature_cols, target_col))
+        stats.last_date = _latest_date(new_rows)
+    return solve_ridge(stats, feature_cols, target_col, alpha=alpha)
+
+
+def ridge_coefficients(artifacts: LinearModelArtifacts) -> pd.Series:
+    """
+    Absolute Ridge coefficients on the scaled features, by feature.
+    """
+    return pd.Series(
+        np.abs(artifacts.model.coef_),
+        index=artifacts.feature_cols,
+        name="importance",
+    ).sort_values(ascending=False)
+
+
 def predict_returns(
     artifacts: LinearModelArtifacts,
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | LongDataset,
     pred_col: str = "pred_return",
 ) -> pd.DataFrame:
     """
@@ -80,6 +302,6 @@ def predict_returns(
     X_scaled = artifacts.scaler.transform(X)
     preds = artifacts.model.predict(X_scaled)
 
-    out = df_long.copy()
+    out = (df_long.frame if isinstance(df_long, LongDataset) else df_long).copy()
     out[pred_col] = preds
     return out
\ No newline at end of file
@@ -6,10 +6,17 @@ from dataclasses import dataclass
 from typing import Tuple
 
 import numpy as np
+import pandas as pd
 from tensorflow import keras
 from tensorflow.keras import layers, regularizers
 
 from src import config
+from src.features_lstm import LSTMSampleSet, LSTMSequenceIndex
+from src.long_dataset import LongDataset
+
+
+# Column of the walk-forward table holding each row's sample position
+LSTM_SAMPLE_COL = "lstm_sample"
 
 
 @dataclass
@@ -69,6 +76,70 @@ def build_lstm_regressor(
     return model
 
 
+def build_lstm_callbacks() -> list[keras.callbacks.Callback]:
+    """
+    Early stopping and learning-rate decay on the validation loss.
+    """
+    return [
+        keras.callbacks.EarlyStopping(
+            monitor="val_loss",
+            patience=getattr(config, "LSTM_EARLY_STOPPING_PATIENCE", 10),
+            restore_best_weights=True,
+        ),
+        keras.callbacks.ReduceLROnPlateau(
+            monitor="val_loss",
+            factor=0.5,
+            patience=getattr(config, "LSTM_LR_PATIENCE", 5),
+            min_lr=1e-5,
+            verbose=0,
+        ),
+    ]
+
+
+class LSTMWindowSequence(keras.utils.Sequence):
+    """
+    Batches of an LSTM dataset, with windows produced one batch at a time:
+    cut out of the daily tensor (and normalized) for an LSTMSequenceIndex,
+    or read from a memory-mapped X for an LSTMSampleSet.
+
+    With `shuffle`, the sample order is reshuffled every epoch, as
+    `model.fit` does for in-memory arrays.
+    """
+
+    def __init__(
+        self,
+        dataset: LSTMSampleSet | LSTMSequenceIndex,
+        rows: np.ndarray,
+        batch_size: int,
+        shuffle: bool = False,
+        seed: int = 42,
+        with_targets: bool = True,
+    ):
+        super().__init__()
+        self.dataset = dataset
+        self.rows = np.asarray(rows)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.with_targets = with_targets
+        self._rng = np.random.default_rng(seed)
+        self._order = self.rows
+        self.on_epoch_end()
+
+    def __len__(self) -> int:
+        return int(np.ceil(len(self.rows) / self.batch_size))
+
+    def __getitem__(self, batch: int):
+        rows = self._order[batch * self.batch_size:(batch + 1) * self.batch_size]
+        X = self.dataset.windows(rows)
+        if not self.with_targets:
+            return X
+        return X, self.dataset.y[rows]
+
+    def on_epoch_end(self) -> None:
+        if self.shuffle:
+            self._order = self._rng.permutation(self.rows)
+
+
 def split_train_validation(
     X: np.ndarray,
     y: np.ndarray,
@@ -122,21 +193,6 @@ def fit_lstm(
         n_features=n_features,
     )
 
-    callbacks = [
-        keras.callbacks.EarlyStopping(
-            monitor="val_loss",
-            patience=getattr(config, "LSTM_EARLY_STOPPING_PATIENCE", 10),
-            restore_best_weights=True,
-        ),
-        keras.callbacks.ReduceLROnPlateau(
-            monitor="val_loss",
-            factor=0.5,
-            patience=getattr(config, "LSTM_LR_PATIENCE", 5),
-            min_lr=1e-5,
-            verbose=0,
-        ),
-    ]
-
     history = model.fit(
         X_train,
         y_train,
@@ -144,7 +200,48 @@ def fit_lstm(
         epochs=getattr(config, "LSTM_EPOCHS", 50),
         batch_size=getattr(config, "LSTM_BATCH_SIZE", 64),
         verbose=0,
-        callbacks=callbacks,
+        callbacks=build_lstm_callbacks(),
+    )
+
+    return LSTMArtifacts(
+        model=model,
+        history=history.history,
+        sequence_length=sequence_length,
+        n_features=n_features,
+        target_name=target_name,
+    )
+
+
+def fit_lstm_batched(
+    dataset: LSTMSampleSet | LSTMSequenceIndex,
+    target_name: str,
+) -> LSTMArtifacts:
+    """
+    Fit the LSTM model with the same time-aware validation split as
+    `fit_lstm`, producing the windows of `dataset` batch by batch.
+    """
+    validation_fraction = getattr(config, "LSTM_VALIDATION_FRACTION", 0.15)
+    batch_size = getattr(config, "LSTM_BATCH_SIZE", 64)
+
+    rows = np.arange(len(dataset))
+    train_rows, _, val_rows, _ = split_train_validation(
+        X=rows,
+        y=rows,
+        validation_fraction=validation_fraction,
+    )
+
+    _, sequence_length, n_features = dataset.shape
+    model = build_lstm_regressor(
+        sequence_length=sequence_length,
+        n_features=n_features,
+    )
+
+    history = model.fit(
+        LSTMWindowSequence(dataset, train_rows, batch_size, shuffle=True),
+        validation_data=LSTMWindowSequence(dataset, val_rows, batch_size),
+        epochs=getattr(config, "LSTM_EPOCHS", 50),
+        verbose=0,
+        callbacks=build_lstm_callbacks(),
     )
 
     return LSTMArtifacts(
@@ -167,4 +264,82 @@ def predict_lstm(
         raise ValueError("X must be 3D: (samples, sequence_length, n_features).")
 
     preds = artifacts.model.predict(X, verbose=0).reshape(-1)
-    return preds.astype(float)
\ No newline at end of file
+    return preds.astype(float)
+
+
+def predict_lstm_batched(
+    artifacts: LSTMArtifacts,
+    dataset: LSTMSampleSet | LSTMSequenceIndex,
+) -> np.ndarray:
+    """
+    Predict next-month returns for every sample of `dataset`, in sample
+    order, producing the windows batch by batch.
+    """
+    batches = LSTMWindowSequence(
+        dataset,
+        np.arange(len(dataset)),
+        getattr(config, "LSTM_BATCH_SIZE", 64),
+        with_targets=False,
+    )
+    preds = artifacts.model.predict(batches, verbose=0).reshape(-1)
+    return preds.astype(float)
+
+
+# =========================
+# WALK-FORWARD
+# =========================
+
+def lstm_walk_forward_frame(dataset: LSTMSampleSet | LSTMSequenceIndex) -> pd.DataFrame:
+    """
+    Long (date, ticker) table of an LSTM dataset for the walk-forward
+    engine: the target and LSTM_SAMPLE_COL, the row's sample position in
+    `dataset`, which serves as the engine's only feature column.
+    """
+    index = pd.MultiIndex.from_arrays(
+        [pd.to_datetime(dataset.dates), dataset.tickers],
+        names=["date", "ticker"],
+    )
+    return pd.DataFrame(
+        {
+            dataset.target_name: dataset.y.astype(float),
+            LSTM_SAMPLE_COL: np.arange(len(dataset)),
+        },
+        index=index,
+    )
+
+
+@dataclass
+class LSTMWalkForward:
+    """
+    LSTM fit / predict with the WalkForwardModel signature.
+
+    The engine slices the table from `lstm_walk_forward_frame(dataset)` by
+    cutoff date; each slice is mapped back to its samples of `dataset`,
+    which are fitted or predicted batch by batch. Slices are in date order,
+    so the validation split of each fit is still the latest samples.
+    """
+    dataset: LSTMSampleSet | LSTMSequenceIndex
+
+    def _samples(self, df: pd.DataFrame | LongDataset) -> LSTMSampleSet | LSTMSequenceIndex:
+        frame = df.frame if isinstance(df, LongDataset) else df
+        return self.dataset.subset(frame[LSTM_SAMPLE_COL].to_numpy(dtype=np.int64))
+
+    def fit(
+        self,
+        train_df: pd.DataFrame | LongDataset,
+        feature_cols: list[str],
+        target_col: str,
+    ) -> LSTMArtifacts:
+        return fit_lstm_batched(self._samples(train_df), target_name=target_col)
+
+    def predict(
+        self,
+        artifacts: LSTMArtifacts,
+        df: pd.DataFrame | LongDataset,
+        pred_col: str = "pred_return",
+    ) -> pd.DataFrame:
+        preds = predict_lstm_batched(artifacts, self._samples(df))
+
+        out = (df.frame if isinstance(df, LongDataset) else df).drop(columns=LSTM_SAMPLE_COL)
+        out[pred_col] = preds
+        return out
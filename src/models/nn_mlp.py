@@ -13,6 +13,10 @@ from tensorflow import keras
 from tensorflow.keras import layers, regularizers
 
 from src import config
+from src.compact_dataset import feature_dtype
+from src.feature_panel import FeaturePanel
+from src.long_dataset import LongDataset
+from src.quantile_sketch import sketch_scaler
 
 
 @dataclass
@@ -28,14 +32,19 @@ class MLPArtifacts:
 
 
 def prepare_xy(
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | FeaturePanel | LongDataset,
     feature_cols: list[str],
     target_col: str,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert a long ML dataframe into feature matrix X and target vector y.
+    A FeaturePanel or LongDataset is read directly, without copying feature
+    columns out of a long frame, and float32 (compact) features are not upcast.
     """
-    X = df_long[feature_cols].to_numpy(dtype=float)
+    if isinstance(df_long, (FeaturePanel, LongDataset)):
+        return df_long.xy(feature_cols)
+
+    X = df_long[feature_cols].to_numpy(dtype=feature_dtype(df_long, feature_cols))
     y = df_long[target_col].to_numpy(dtype=float)
     return X, y
 
@@ -105,11 +114,13 @@ def fit_mlp_with_scaler(
 
     scaler_type = getattr(config, "SCALER_TYPE", "robust").lower()
     if scaler_type == "standard":
-        scaler = StandardScaler()
+        scaler = StandardScaler().fit(X_train)
+    elif getattr(config, "ROBUST_SCALER_SKETCH", False):
+        scaler = sketch_scaler(train_df, X_train, feature_cols)
     else:
-        scaler = RobustScaler()
+        scaler = RobustScaler().fit(X_train)
 
-    X_train_scaled = scaler.fit_transform(X_train)
+    X_train_scaled = scaler.transform(X_train)
 
     val_fraction = getattr(config, "NN_VALIDATION_FRACTION", 0.15)
     n_rows = len(X_train_scaled)
@@ -158,7 +169,7 @@ def fit_mlp_with_scaler(
 
 def predict_returns(
     artifacts: MLPArtifacts,
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | LongDataset,
     pred_col: str = "pred_return",
 ) -> pd.DataFrame:
     """
@@ -168,6 +179,6 @@ def predict_returns(
     X_scaled = artifacts.scaler.transform(X)
     preds = artifacts.model.predict(X_scaled, verbose=0).reshape(-1)
 
-    out = df_long.copy()
+    out = (df_long.frame if isinstance(df_long, LongDataset) else df_long).copy()
     out[pred_col] = preds
     return out
\ No newline at end of file
@@ -2,15 +2,20 @@
 
 from __future__ import annotations
 
+import copy
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor
 
 from src import config
+from src.compact_dataset import feature_dtype
+from src.feature_panel import FeaturePanel
+from src.long_dataset import LongDataset
 
 
 @dataclass
@@ -22,40 +27,72 @@ class RandomForestArtifacts:
     feature_cols: list[str]
     target_col: str
     feature_importances_: pd.Series
+    n_updates: int = 0
 
 
 def prepare_xy(
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | FeaturePanel | LongDataset,
     feature_cols: list[str],
     target_col: str,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert a long ML dataframe into feature matrix X and target vector y.
+    A FeaturePanel or LongDataset is read directly, without copying feature
+    columns out of a long frame, and float32 (compact) features are not upcast.
     """
-    X = df_long[feature_cols].to_numpy(dtype=float)
+    if isinstance(df_long, (FeaturePanel, LongDataset)):
+        return df_long.xy(feature_cols)
+
+    X = df_long[feature_cols].to_numpy(dtype=feature_dtype(df_long, feature_cols))
     y = df_long[target_col].to_numpy(dtype=float)
     return X, y
 
 
+# src.config setting -> (RandomForestRegressor argument, default)
+RF_PARAMS = {
+    "RF_N_ESTIMATORS": ("n_estimators", 300),
+    "RF_MAX_DEPTH": ("max_depth", 6),
+    "RF_MIN_SAMPLES_LEAF": ("min_samples_leaf", 20),
+    "RF_MIN_SAMPLES_SPLIT": ("min_samples_split", 40),
+    "RF_MAX_FEATURES": ("max_features", "sqrt"),
+    "RF_BOOTSTRAP": ("bootstrap", True),
+}
+
+
+def random_forest_params(params: Optional[dict] = None) -> dict:
+    """
+    RandomForestRegressor arguments from the RF_* settings in src.config,
+    with `params` (keyed by the same setting names) taking precedence.
+    """
+    params = params or {}
+    unknown = set(params) - set(RF_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown Random Forest parameters: {sorted(unknown)}")
+
+    return {
+        argument: params[name] if name in params else getattr(config, name, default)
+        for name, (argument, default) in RF_PARAMS.items()
+    }
+
+
 def fit_random_forest(
     train_df: pd.DataFrame,
     feature_cols: list[str],
     target_col: str,
+    n_jobs: int = -1,
+    params: Optional[dict] = None,
 ) -> RandomForestArtifacts:
     """
-    Fit a Random Forest regressor using the configured hyperparameters.
+    Fit a Random Forest regressor using the configured hyperparameters,
+    overridden by `params` (e.g. {"RF_MAX_DEPTH": 4}) without touching
+    src.config.
     """
     X_train, y_train = prepare_xy(train_df, feature_cols, target_col)
 
     model = RandomForestRegressor(
-        n_estimators=getattr(config, "RF_N_ESTIMATORS", 300),
-        max_depth=getattr(config, "RF_MAX_DEPTH", 6),
-        min_samples_leaf=getattr(config, "RF_MIN_SAMPLES_LEAF", 20),
-        min_samples_split=getattr(config, "RF_MIN_SAMPLES_SPLIT", 40),
-        max_features=getattr(config, "RF_MAX_FEATURES", "sqrt"),
-        bootstrap=getattr(config, "RF_BOOTSTRAP", True),
+        **random_forest_params(params),
         random_state=42,
-        n_jobs=-1,
+        n_jobs=n_jobs,
     )
 
     model.fit(X_train, y_train)
@@ -74,9 +111,66 @@ def fit_random_forest(
     )
 
 
+def update_random_forest(
+    artifacts: RandomForestArtifacts,
+    train_df: pd.DataFrame,
+    feature_cols: list[str],
+    target_col: str,
+    n_jobs: int = -1,
+    replace_fraction: float | None = None,
+    params: Optional[dict] = None,
+) -> RandomForestArtifacts:
+    """
+    Refresh a fitted forest on an extended training window.
+
+    The oldest `replace_fraction` of the trees (RF_INCREMENTAL_REPLACE_FRACTION
+    by default) are retired and as many new trees, with the same
+    hyperparameters, are grown on bootstrap samples of `train_df`. The cost
+    scales with the replaced trees rather than the whole forest. The given
+    artifacts are left unchanged. The new trees copy the fitted forest's
+    hyperparameters, so `params` (the overrides it was fitted with) is
+    only accepted to match `fit_random_forest`.
+    """
+    if replace_fraction is None:
+        replace_fraction = getattr(config, "RF_INCREMENTAL_REPLACE_FRACTION", 0.10)
+    if not 0.0 < replace_fraction <= 1.0:
+        raise ValueError("replace_fraction must be in (0, 1].")
+
+    X_train, y_train = prepare_xy(train_df, feature_cols, target_col)
+
+    previous = artifacts.model
+    n_new = max(1, int(round(len(previous.estimators_) * replace_fraction)))
+    n_updates = artifacts.n_updates + 1
+
+    # Trees are kept oldest first, so the first `n_new` are retired
+    grower = clone(previous).set_params(
+        n_estimators=n_new,
+        random_state=42 + n_updates,
+        n_jobs=n_jobs,
+    )
+    grower.fit(X_train, y_train)
+
+    model = copy.copy(previous)
+    model.estimators_ = previous.estimators_[n_new:] + grower.estimators_
+
+    feature_importances = pd.Series(
+        model.feature_importances_,
+        index=feature_cols,
+        name="importance",
+    ).sort_values(ascending=False)
+
+    return RandomForestArtifacts(
+        model=model,
+        feature_cols=feature_cols,
+        target_col=target_col,
+        feature_importances_=feature_importances,
+        n_updates=n_updates,
+    )
+
+
 def predict_returns(
     artifacts: RandomForestArtifacts,
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | LongDataset,
     pred_col: str = "pred_return",
 ) -> pd.DataFrame:
     """
@@ -85,6 +179,6 @@ def predict_returns(
     X, _ = prepare_xy(df_long, artifacts.feature_cols, artifacts.target_col)
     preds = artifacts.model.predict(X)
 
-    out = df_long.copy()
+    out = (df_long.frame if isinstance(df_long, LongDataset) else df_long).copy()
     out[pred_col] = preds
     return out
\ No newline at end of file
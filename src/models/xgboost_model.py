@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -11,6 +11,9 @@ import pandas as pd
 from xgboost import XGBRegressor
 
 from src import config
+from src.compact_dataset import feature_dtype
+from src.feature_panel import FeaturePanel
+from src.long_dataset import LongDataset
 
 
 @dataclass
@@ -22,44 +25,77 @@ class XGBoostArtifacts:
     feature_cols: list[str]
     target_col: str
     feature_importances_: pd.Series
+    n_updates: int = 0
+    reference_rmse: Optional[float] = None
 
 
 def prepare_xy(
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | FeaturePanel | LongDataset,
     feature_cols: list[str],
     target_col: str,
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert a long ML dataframe into feature matrix X and target vector y.
+    A FeaturePanel or LongDataset is read directly, without copying feature
+    columns out of a long frame, and float32 (compact) features are not upcast.
     """
-    X = df_long[feature_cols].to_numpy(dtype=float)
+    if isinstance(df_long, (FeaturePanel, LongDataset)):
+        return df_long.xy(feature_cols)
+
+    X = df_long[feature_cols].to_numpy(dtype=feature_dtype(df_long, feature_cols))
     y = df_long[target_col].to_numpy(dtype=float)
     return X, y
 
 
+# src.config setting -> (XGBRegressor argument, default)
+XGB_PARAMS = {
+    "XGB_N_ESTIMATORS": ("n_estimators", 300),
+    "XGB_MAX_DEPTH": ("max_depth", 4),
+    "XGB_LEARNING_RATE": ("learning_rate", 0.05),
+    "XGB_SUBSAMPLE": ("subsample", 0.8),
+    "XGB_COLSAMPLE_BYTREE": ("colsample_bytree", 0.8),
+    "XGB_REG_ALPHA": ("reg_alpha", 0.0),
+    "XGB_REG_LAMBDA": ("reg_lambda", 1.0),
+    "XGB_MIN_CHILD_WEIGHT": ("min_child_weight", 5),
+    "XGB_GAMMA": ("gamma", 0.0),
+}
+
+
+def xgboost_params(params: Optional[dict] = None) -> dict:
+    """
+    XGBRegressor arguments from the XGB_* settings in src.config, with
+    `params` (keyed by the same setting names) taking precedence.
+    """
+    params = params or {}
+    unknown = set(params) - set(XGB_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown XGBoost parameters: {sorted(unknown)}")
+
+    return {
+        argument: params[name] if name in params else getattr(config, name, default)
+        for name, (argument, default) in XGB_PARAMS.items()
+    }
+
+
 def fit_xgboost(
     train_df: pd.DataFrame,
     feature_cols: list[str],
     target_col: str,
+    n_jobs: int = -1,
+    params: Optional[dict] = None,
 ) -> XGBoostArtifacts:
     """
-    Fit an XGBoost regressor using the configured hyperparameters.
+    Fit an XGBoost regressor using the configured hyperparameters,
+    overridden by `params` (e.g. {"XGB_MAX_DEPTH": 3}) without touching
+    src.config.
     """
     X_train, y_train = prepare_xy(train_df, feature_cols, target_col)
 
     model = XGBRegressor(
-        n_estimators=getattr(config, "XGB_N_ESTIMATORS", 300),
-        max_depth=getattr(config, "XGB_MAX_DEPTH", 4),
-        learning_rate=getattr(config, "XGB_LEARNING_RATE", 0.05),
-        subsample=getattr(config, "XGB_SUBSAMPLE", 0.8),
-        colsample_bytree=getattr(config, "XGB_COLSAMPLE_BYTREE", 0.8),
-        reg_alpha=getattr(config, "XGB_REG_ALPHA", 0.0),
-        reg_lambda=getattr(config, "XGB_REG_LAMBDA", 1.0),
-        min_child_weight=getattr(config, "XGB_MIN_CHILD_WEIGHT", 5),
-        gamma=getattr(config, "XGB_GAMMA", 0.0),
+        **xgboost_params(params),
         objective="reg:squarederror",
         random_state=42,
-        n_jobs=-1,
+        n_jobs=n_jobs,
     )
 
     model.fit(X_train, y_train)
@@ -78,9 +114,88 @@ def fit_xgboost(
     )
 
 
+def _latest_month(train_df: pd.DataFrame | LongDataset) -> pd.DataFrame | LongDataset:
+    if isinstance(train_df, LongDataset):
+        return train_df.on(train_df.dates[-1])
+    dates = train_df.index.get_level_values("date")
+    return train_df[dates == dates.max()]
+
+
+def update_xgboost(
+    artifacts: XGBoostArtifacts,
+    train_df: pd.DataFrame | LongDataset,
+    feature_cols: list[str],
+    target_col: str,
+    n_jobs: int = -1,
+    rounds: Optional[int] = None,
+    refit_every: Optional[int] = None,
+    max_degradation: Optional[float] = None,
+    params: Optional[dict] = None,
+) -> XGBoostArtifacts:
+    """
+    Continue a fitted booster on an extended training window by appending
+    `rounds` boosting rounds (XGB_CONTINUATION_ROUNDS) fitted on `train_df`.
+
+    A full refit with `fit_xgboost` is done instead every `refit_every`
+    months (XGB_CONTINUATION_REFIT_EVERY), or when the booster's RMSE on the
+    newest month of `train_df`, which it has not been trained on, exceeds the
+    RMSE measured the same way after the last refit by more than
+    `max_degradation` (XGB_CONTINUATION_MAX_DEGRADATION, relative).
+    Full refits use the hyperparameter overrides `params`.
+    """
+    if rounds is None:
+        rounds = getattr(config, "XGB_CONTINUATION_ROUNDS", 20)
+    if refit_every is None:
+        refit_every = getattr(config, "XGB_CONTINUATION_REFIT_EVERY", 6)
+    if max_degradation is None:
+        max_degradation = getattr(config, "XGB_CONTINUATION_MAX_DEGRADATION", None)
+    if rounds < 1:
+        raise ValueError("rounds must be at least 1.")
+
+    X_new, y_new = prepare_xy(_latest_month(train_df), feature_cols, target_col)
+    new_rmse = float(np.sqrt(np.mean((artifacts.model.predict(X_new) - y_new) ** 2)))
+    reference_rmse = new_rmse if artifacts.reference_rmse is None else artifacts.reference_rmse
+
+    n_updates = artifacts.n_updates + 1
+    degraded = max_degradation is not None and new_rmse > reference_rmse * (1.0 + max_degradation)
+    if (refit_every and n_updates >= refit_every) or degraded:
+        return fit_xgboost(train_df, feature_cols, target_col, n_jobs=n_jobs, params=params)
+
+    X_train, y_train = prepare_xy(train_df, feature_cols, target_col)
+
+    model = XGBRegressor(**artifacts.model.get_params())
+    model.set_params(n_estimators=rounds, n_jobs=n_jobs)
+    model.fit(X_train, y_train, xgb_model=artifacts.model.get_booster())
+
+    feature_importances = pd.Series(
+        model.feature_importances_,
+        index=feature_cols,
+        name="importance",
+    ).sort_values(ascending=False)
+
+    return XGBoostArtifacts(
+        model=model,
+        feature_cols=feature_cols,
+        target_col=target_col,
+        feature_importances_=feature_importances,
+        n_updates=n_updates,
+        reference_rmse=reference_rmse,
+    )
+
+
+def describe_xgboost(artifacts: XGBoostArtifacts) -> dict:
+    """
+    Boosting rounds and months since the last full refit.
+    """
+    return {
+        "boosted_rounds": artifacts.model.get_booster().num_boosted_rounds(),
+        "months_since_refit": artifacts.n_updates,
+    }
+
+
 def predict_returns(
     artifacts: XGBoostArtifacts,
-    df_long: pd.DataFrame,
+    df_long: pd.DataFrame | LongDataset,
     pred_col: str = "pred_return",
 ) -> pd.DataFrame:
     """
@@ -89,6 +204,6 @@ def predict_returns(
     X, _ = prepare_xy(df_long, artifacts.feature_cols, artifacts.target_col)
     preds = artifacts.model.predict(X)
 
-    out = df_long.copy()
+    out = (df_long.frame if isinstance(df_long, LongDataset) else df_long).copy()
     out[pred_col] = preds
     return out
\ No newline at end of file
@@ -0,0 +1,227 @@
+# src/ohlcv_store.py
+
+from __future__ import annotations
+
+import os
+import shutil
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.data_download import OHLCV_FIELDS
+
+
+CALENDAR_FILENAME = "_calendar.parquet"
+
+_PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+
+
+def _store_schema(fields: list[str]) -> pa.Schema:
+    """
+    Long-format schema: dictionary-encoded tickers, float32 prices and
+    float64 volume.
+    """
+    columns = [
+        pa.field("date", pa.timestamp("ns")),
+        pa.field("ticker", pa.dictionary(pa.int32(), pa.string())),
+    ]
+    for field in fields:
+        dtype = pa.float64() if field == "Volume" else pa.float32()
+        columns.append(pa.field(field, dtype))
+    columns.append(pa.field("year", pa.int16()))
+    return pa.schema(columns)
+
+
+def _date_scalar(value) -> pa.Scalar:
+    return pa.scalar(pd.Timestamp(value).as_unit("ns").to_datetime64(), pa.timestamp("ns"))
+
+
+def ohlcv_wide_to_long(ohlcv: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the raw (field, ticker) OHLCV frame into long rows
+    (date, ticker, fields...). Rows where every field is missing are dropped.
+    """
+    if not isinstance(ohlcv.columns, pd.MultiIndex):
+        raise ValueError("OHLCV dataframe must have MultiIndex columns.")
+
+    fields = [f for f in OHLCV_FIELDS if f in ohlcv.columns.get_level_values(0)]
+
+    long_df = ohlcv[fields].stack(level=1, future_stack=True)
+    long_df.index.names = ["date", "ticker"]
+    long_df = long_df.dropna(how="all").reset_index()
+    long_df.columns.name = None
+
+    long_df["date"] = pd.to_datetime(long_df["date"]).astype("datetime64[ns]")
+    long_df["ticker"] = long_df["ticker"].astype(str)
+    long_df["year"] = long_df["date"].dt.year.astype(np.int16)
+    return long_df[["date", "ticker"] + fields + ["year"]]
+
+
+def write_ohlcv_store(ohlcv: pd.DataFrame, root: str) -> None:
+    """
+    Write OHLCV as long-format parquet partitioned by year under `root`.
+
+    Only the years present in `ohlcv` are rewritten, so appending a new month
+    touches a single partition. Stored rows of those years that fall outside
+    the date range of `ohlcv` are carried over. The store also keeps the full
+    trading-date calendar, so readers can rebuild the wide frame row for row.
+    """
+    long_df = ohlcv_wide_to_long(ohlcv)
+    fields = [c for c in long_df.columns if c not in ("date", "ticker", "year")]
+    schema = _store_schema(fields)
+
+    table = pa.Table.from_pandas(long_df, schema=schema, preserve_index=False)
+
+    if ohlcv_store_exists(root) and len(long_df):
+        first_date = pd.Timestamp(pd.to_datetime(ohlcv.index).min())
+        last_date = pd.Timestamp(pd.to_datetime(ohlcv.index).max())
+        years = sorted(long_df["year"].unique().tolist())
+
+        stored = ds.dataset(root, format="parquet", partitioning=_PARTITIONING).to_table(
+            columns=schema.names,
+            filter=(
+                pc.is_in(ds.field("year"), value_set=pa.array(years, pa.int16()))
+                & (
+                    (ds.field("date") < _date_scalar(first_date))
+                    | (ds.field("date") > _date_scalar(last_date))
+                )
+            ),
+        )
+        if stored.num_rows:
+            table = pa.concat_tables([stored.cast(schema), table]).unify_dictionaries()
+
+    os.makedirs(root, exist_ok=True)
+    ds.write_dataset(
+        table,
+        base_dir=root,
+        format="parquet",
+        partitioning=_PARTITIONING,
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+
+    calendar_path = os.path.join(root, CALENDAR_FILENAME)
+    dates = pd.DatetimeIndex(pd.to_datetime(ohlcv.index)).astype("datetime64[ns]")
+    if os.path.exists(calendar_path):
+        stored = pd.DatetimeIndex(pd.read_parquet(calendar_path)["date"])
+        dates = stored.union(dates)
+
+    calendar = pd.DataFrame({"date": dates.sort_values().unique()})
+    tmp_path = f"{calendar_path}.tmp"
+    calendar.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, calendar_path)
+
+
+def clear_ohlcv_store(root: str) -> None:
+    """
+    Remove the whole store directory.
+    """
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+
+
+def ohlcv_store_exists(root: str) -> bool:
+    return os.path.exists(os.path.join(root, CALENDAR_FILENAME))
+
+
+def read_ohlcv_store(
+    root: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tickers: Optional[list[str]] = None,
+    fields: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read a slice of the store back into the raw wide layout.
+
+    Date bounds are inclusive. The date range prunes year partitions and the
+    ticker subset is pushed down as a row filter, so only the requested data is
+    decoded. Only the requested fields are read.
+
+    Output matches the raw OHLCV parquet: DateTimeIndex over the stored trading
+    calendar and MultiIndex columns (field, ticker), as float64.
+    """
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        partitioning=_PARTITIONING,
+        exclude_invalid_files=True,
+        ignore_prefixes=["_", "."],
+    )
+
+    available_fields = [f for f in OHLCV_FIELDS if f in dataset.schema.names]
+    fields = available_fields if fields is None else list(fields)
+    missing = [f for f in fields if f not in available_fields]
+    if missing:
+        raise ValueError(f"Fields not found in OHLCV store: {missing}")
+
+    start_ts = pd.Timestamp(start_date) if start_date is not None else None
+    end_ts = pd.Timestamp(end_date) if end_date is not None else None
+
+    expr = None
+
+    def _and(current, new):
+        return new if current is None else current & new
+
+    if start_ts is not None:
+        expr = _and(expr, ds.field("year") >= start_ts.year)
+        expr = _and(expr, ds.field("date") >= _date_scalar(start_ts))
+    if end_ts is not None:
+        expr = _and(expr, ds.field("year") <= end_ts.year)
+        expr = _and(expr, ds.field("date") <= _date_scalar(end_ts))
+    if tickers is not None:
+        expr = _and(expr, pc.is_in(ds.field("ticker"), value_set=pa.array(list(tickers), pa.string())))
+
+    table = dataset.to_table(columns=["date", "ticker"] + fields, filter=expr)
+
+    long_df = table.to_pandas()
+    long_df["ticker"] = long_df["ticker"].astype(str)
+    for field in fields:
+        long_df[field] = long_df[field].astype(np.float64)
+
+    calendar = pd.DatetimeIndex(pd.read_parquet(os.path.join(root, CALENDAR_FILENAME))["date"])
+    if start_ts is not None:
+        calendar = calendar[calendar >= start_ts]
+    if end_ts is not None:
+        calendar = calendar[calendar <= end_ts]
+
+    if tickers is None:
+        tickers = sorted(long_df["ticker"].unique())
+
+    wide = long_df.pivot(index="date", columns="ticker", values=fields)
+    columns = pd.MultiIndex.from_product([fields, list(tickers)])
+    wide = wide.reindex(index=calendar, columns=columns)
+    wide.index.name = "Date"
+    wide.columns.names = ["Price", "Ticker"]
+    return wide
+
+
+def load_raw_ohlcv(
+    parquet_path: str,
+    store_root: Optional[str] = None,
+    tickers: Optional[list[str]] = None,
+    fields: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load raw OHLCV from the partitioned store when it exists, otherwise from
+    the wide parquet file (then filtered in memory).
+    """
+    if store_root is not None and ohlcv_store_exists(store_root):
+        return read_ohlcv_store(store_root, tickers=tickers, fields=fields)
+
+    ohlcv = pd.read_parquet(parquet_path)
+    ohlcv.index = pd.to_datetime(ohlcv.index)
+    ohlcv = ohlcv.sort_index()
+
+    if isinstance(ohlcv.columns, pd.MultiIndex):
+        keep_cols = [
+            col for col in ohlcv.columns
+            if (tickers is None or col[1] in tickers) and (fields is None or col[0] in fields)
+        ]
+        ohlcv = ohlcv[keep_cols]
+
+    return ohlcv
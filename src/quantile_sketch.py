@@ -0,0 +1,215 @@
+# src/quantile_sketch.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+@dataclass
+class QuantileSketch:
+    """
+    Approximate per-column quantiles of a stream of (rows, features) blocks,
+    in bounded memory.
+
+    Rows are kept in levels: a row at level h stands for 2**h original rows.
+    When a level holds `k` rows, each column is sorted and every other value
+    (alternating offset) is promoted to the next level, so memory grows with
+    log(n / k) instead of n. All columns see the same rows, so the levels
+    are (m, n_features) arrays and every column is compacted at once.
+
+    Until the first compaction the quantiles are exact, matching
+    np.percentile with linear interpolation. Sketches of the same columns
+    merge, e.g. one per month or per shard.
+    """
+    n_features: int
+    k: int = 256
+    n: int = 0
+    levels: list[np.ndarray] = field(default_factory=list)
+    _offsets: list[int] = field(default_factory=list)
+
+    def update(self, X: np.ndarray) -> "QuantileSketch":
+        """
+        Add the rows of X (n_rows, n_features).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X must have shape (n_rows, {self.n_features}).")
+        # Blocks of k rows, so no sort is ever larger than 2k rows
+        for start in range(0, len(X), self.k):
+            self._push(0, X[start:start + self.k])
+        self.n += len(X)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Add the rows summarized by `other`, level by level.
+        """
+        if other.n_features != self.n_features:
+            raise ValueError("Cannot merge sketches of different numbers of features.")
+        for level, rows in enumerate(other.levels):
+            if len(rows):
+                self._push(level, rows)
+        self.n += other.n
+        return self
+
+    def copy(self) -> "QuantileSketch":
+        # Level arrays are replaced, never modified, so they can be shared
+        return QuantileSketch(
+            n_features=self.n_features,
+            k=self.k,
+            n=self.n,
+            levels=list(self.levels),
+            _offsets=list(self._offsets),
+        )
+
+    def _push(self, level: int, rows: np.ndarray) -> None:
+        while len(self.levels) <= level:
+            self.levels.append(np.empty((0, self.n_features)))
+            self._offsets.append(0)
+
+        buffer = np.concatenate([self.levels[level], rows])
+        if len(buffer) < self.k:
+            self.levels[level] = buffer
+            return
+
+        # Keep one row back when the count is odd, so the weight is preserved
+        buffer.sort(axis=0)
+        keep = len(buffer) % 2
+        offset = self._offsets[level]
+        self._offsets[level] = 1 - offset
+
+        self.levels[level] = buffer[len(buffer) - keep:]
+        self._push(level + 1, buffer[offset:len(buffer) - keep:2])
+
+    def quantile(self, q: float | np.ndarray) -> np.ndarray:
+        """
+        Quantiles `q` (in [0, 1]) of every column: shape (n_features,) for
+        a scalar q, (len(q), n_features) otherwise.
+        """
+        if not self.n:
+            raise ValueError("Cannot take quantiles of an empty sketch.")
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(rows), 2.0 ** level) for level, rows in enumerate(self.levels)
+        ])
+
+        order = np.argsort(values, axis=0, kind="stable")
+        values = np.take_along_axis(values, order, axis=0)
+        weights = weights[order]
+
+        # 0-based rank at the middle of each value's weight, so unit weights
+        # give ranks 0..n-1 as np.percentile does
+        ranks = np.cumsum(weights, axis=0) - (weights + 1.0) / 2.0
+
+        q = np.asarray(q, dtype=np.float64)
+        out = np.empty(q.shape + (self.n_features,))
+        columns = np.arange(self.n_features)
+        for i, target in np.ndenumerate(q * (self.n - 1)):
+            hi = np.clip((ranks < target).sum(axis=0), 1, len(values) - 1)
+            lo = hi - 1
+            r_lo, r_hi = ranks[lo, columns], ranks[hi, columns]
+            v_lo, v_hi = values[lo, columns], values[hi, columns]
+            frac = np.clip((target - r_lo) / np.where(r_hi > r_lo, r_hi - r_lo, 1.0), 0.0, 1.0)
+            out[i] = v_lo + frac * (v_hi - v_lo)
+        return out
+
+
+class SketchRobustScaler(TransformerMixin, BaseEstimator):
+    """
+    RobustScaler (median / IQR scaling) whose quantiles come from a
+    QuantileSketch instead of exact percentiles of the whole matrix.
+
+    Same fitted attributes (center_, scale_) and transform as
+    sklearn.preprocessing.RobustScaler; `partial_fit` adds rows and
+    `from_sketch` reuses a sketch built elsewhere.
+    """
+
+    def __init__(
+        self,
+        quantile_range: tuple[float, float] = (25.0, 75.0),
+        with_centering: bool = True,
+        with_scaling: bool = True,
+        sketch_size: int = 256,
+    ):
+        self.quantile_range = quantile_range
+        self.with_centering = with_centering
+        self.with_scaling = with_scaling
+        self.sketch_size = sketch_size
+
+    @classmethod
+    def from_sketch(cls, sketch: QuantileSketch, **params: Any) -> "SketchRobustScaler":
+        scaler = cls(sketch_size=sketch.k, **params)
+        scaler.sketch_ = sketch.copy()
+        return scaler._set_quantiles()
+
+    def fit(self, X: np.ndarray, y: Any = None) -> "SketchRobustScaler":
+        X = np.asarray(X)
+        self.sketch_ = QuantileSketch(n_features=X.shape[1], k=self.sketch_size)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X: np.ndarray, y: Any = None) -> "SketchRobustScaler":
+        X = np.asarray(X)
+        if not hasattr(self, "sketch_"):
+            self.sketch_ = QuantileSketch(n_features=X.shape[1], k=self.sketch_size)
+        self.sketch_.update(X)
+        return self._set_quantiles()
+
+    def _set_quantiles(self) -> "SketchRobustScaler":
+        q_min, q_max = self.quantile_range
+        if not 0 <= q_min <= q_max <= 100:
+            raise ValueError(f"Invalid quantile range: {self.quantile_range}")
+
+        q_lo, median, q_hi = self.sketch_.quantile(np.array([q_min, 50.0, q_max]) / 100.0)
+        self.center_ = median if self.with_centering else None
+        self.scale_ = handle_zeros_in_scale(q_hi - q_lo) if self.with_scaling else None
+        self.n_features_in_ = self.sketch_.n_features
+        return self
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.result_type(np.asarray(X).dtype, np.float32))
+        if self.with_centering:
+            X -= self.center_.astype(X.dtype)
+        if self.with_scaling:
+            X /= self.scale_.astype(X.dtype)
+        return X
+
+    def inverse_transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.result_type(np.asarray(X).dtype, np.float32))
+        if self.with_scaling:
+            X *= self.scale_.astype(X.dtype)
+        if self.with_centering:
+            X += self.center_.astype(X.dtype)
+        return X
+
+
+def handle_zeros_in_scale(scale: np.ndarray) -> np.ndarray:
+    # Constant columns are left unscaled, as the sklearn scalers do
+    return np.where(scale < 10 * np.finfo(scale.dtype).eps, 1.0, scale)
+
+
+def sketch_scaler(
+    train_df: Any,
+    X_train: np.ndarray,
+    feature_cols: list[str],
+    sketch_size: Optional[int] = None,
+) -> SketchRobustScaler:
+    """
+    SketchRobustScaler of the training features. For a LongDataset the
+    sketch comes from its cache of expanding windows, so walk-forward steps
+    and expanding tuning folds only sketch the months they add.
+    """
+    from src import config
+    from src.long_dataset import LongDataset
+
+    if sketch_size is None:
+        sketch_size = getattr(config, "QUANTILE_SKETCH_SIZE", 256)
+
+    if isinstance(train_df, LongDataset) and list(feature_cols) == train_df.feature_cols:
+        return SketchRobustScaler.from_sketch(train_df.quantile_sketch(sketch_size))
+    return SketchRobustScaler(sketch_size=sketch_size).fit(X_train)
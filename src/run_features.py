@@ -1,9 +1,14 @@
 # src/run_features.py
 
 import os
+from dataclasses import asdict
+
 import pandas as pd
 
-from src import config
+from src import config, features, kernels
+from src.compact_dataset import compact_if_enabled
+from src.feature_cache import cached_build, feature_cache_from_config
+from src.feature_panel import FeaturePanel, save_feature_panel
 from src.features import (
     spec_from_config,
     compute_monthly_prices_from_adj_close,
@@ -31,12 +36,19 @@ def main() -> None:
 
     spec = spec_from_config()
 
-    ml_dataset = build_ml_dataset(
-        returns_monthly=returns_monthly,
-        prices_monthly=prices_monthly,
-        spec=spec,
-        include_rsi=True,
-        use_log_returns=config.USE_LOG_RETURNS,
+    ml_dataset = cached_build(
+        feature_cache_from_config(),
+        "monthly_dataset",
+        inputs={"returns_monthly": returns_monthly, "adj_close": adj_close_daily},
+        settings={"spec": asdict(spec), "use_log_returns": config.USE_LOG_RETURNS},
+        modules=(features, kernels),
+        build=lambda: build_ml_dataset(
+            returns_monthly=returns_monthly,
+            prices_monthly=prices_monthly,
+            spec=spec,
+            include_rsi=True,
+            use_log_returns=config.USE_LOG_RETURNS,
+        ),
     )
 
     train_df, test_df = split_by_date(
@@ -45,9 +57,13 @@ def main() -> None:
         test_start_date=config.TEST_START_DATE,
     )
 
-    ml_dataset.to_parquet(FEATURE_PATHS["full"])
-    train_df.to_parquet(FEATURE_PATHS["train"])
-    test_df.to_parquet(FEATURE_PATHS["test"])
+    compact_if_enabled(ml_dataset).to_parquet(FEATURE_PATHS["full"])
+    compact_if_enabled(train_df).to_parquet(FEATURE_PATHS["train"])
+    compact_if_enabled(test_df).to_parquet(FEATURE_PATHS["test"])
+    save_feature_panel(
+        FeaturePanel.from_long(ml_dataset, target_col=f"{spec.target_name}_{spec.target_horizon_months}m"),
+        FEATURE_PATHS["panel"],
+    )
 
     target_cols = [c for c in train_df.columns if c.startswith("y_next")]
     feature_cols = [c for c in train_df.columns if c not in target_cols]
@@ -61,6 +77,7 @@ def main() -> None:
     print("Full ->", FEATURE_PATHS["full"])
     print("Train ->", FEATURE_PATHS["train"])
     print("Test ->", FEATURE_PATHS["test"])
+    print("Panel ->", FEATURE_PATHS["panel"])
 
     print("\nFeature columns:")
     print(feature_cols)
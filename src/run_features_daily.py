@@ -3,7 +3,12 @@ from __future__ import annotations
 import os
 import pandas as pd
 
-from src import config
+from src import config, feature_panel, feature_registry, features_daily, kernels
+from src.compact_dataset import compact_if_enabled
+from src.feature_cache import cached_build, feature_cache_from_config
+from src.feature_panel import FeaturePanel, save_feature_panel
+from src.feature_registry import FeatureGraph
+from src.feature_update import daily_settings_from_config
 from src.features_daily import build_daily_feature_dataset
 from src.preprocessing import (
     compute_returns,
@@ -15,6 +20,7 @@ from src.utils.paths import get_feature_dataset_paths
 
 
 FEATURE_PATHS = get_feature_dataset_paths("daily")
+FEATURE_MODULES = (features_daily, feature_registry, feature_panel, kernels)
 
 
 def main() -> None:
@@ -49,20 +55,25 @@ def main() -> None:
     if config.MARKET_TICKER is not None and config.MARKET_TICKER in daily_returns.columns:
         market_daily_returns = daily_returns[config.MARKET_TICKER]
 
-    dataset = build_daily_feature_dataset(
-        adj_close=adj_close,
-        daily_returns=daily_returns,
-        monthly_returns=monthly_returns,
-        use_log_returns=config.USE_LOG_RETURNS,
-        market_daily_returns=market_daily_returns,
-        return_windows=config.DAILY_RETURN_WINDOWS,
-        vol_windows=config.DAILY_VOL_WINDOWS,
-        ma_pairs=config.DAILY_MA_PAIRS,
-        high_windows=config.DAILY_HIGH_WINDOWS,
-        drawdown_windows=config.DAILY_DRAWDOWN_WINDOWS,
-        beta_windows=config.DAILY_BETA_WINDOWS,
-        rsi_window=config.DAILY_RSI_WINDOW,
-        target_name="y_next_1m",
+    settings = daily_settings_from_config("daily")
+
+    # Skips the build when prices, settings and feature code are unchanged;
+    # on a miss, features whose family and params are unchanged still hit
+    cache = feature_cache_from_config()
+    dataset = cached_build(
+        cache,
+        "daily_dataset",
+        inputs={"adj_close": adj_close},
+        settings={**settings, "market_ticker": config.MARKET_TICKER},
+        modules=FEATURE_MODULES,
+        build=lambda: build_daily_feature_dataset(
+            adj_close=adj_close,
+            daily_returns=daily_returns,
+            monthly_returns=monthly_returns,
+            market_daily_returns=market_daily_returns,
+            graph=FeatureGraph({}, cache=cache, workers=getattr(config, "FEATURE_WORKERS", 1)),
+            **settings,
+        ),
     )
 
     train_df, test_df = split_train_test_by_date(
@@ -71,9 +82,10 @@ def main() -> None:
         test_start_date=config.TEST_START_DATE,
     )
 
-    save_dataframe(dataset, FEATURE_PATHS["full"])
-    save_dataframe(train_df, FEATURE_PATHS["train"])
-    save_dataframe(test_df, FEATURE_PATHS["test"])
+    save_dataframe(compact_if_enabled(dataset), FEATURE_PATHS["full"])
+    save_dataframe(compact_if_enabled(train_df), FEATURE_PATHS["train"])
+    save_dataframe(compact_if_enabled(test_df), FEATURE_PATHS["test"])
+    save_feature_panel(FeaturePanel.from_long(dataset, target_col="y_next_1m"), FEATURE_PATHS["panel"])
 
     target_cols = [c for c in train_df.columns if c.startswith("y_next")]
     feature_cols = [c for c in train_df.columns if c not in target_cols]
@@ -3,8 +3,14 @@ from __future__ import annotations
 import os
 import pandas as pd
 
-from src import config
+from src import config, feature_panel, feature_registry, features_daily, features_daily_ohlcv, kernels
+from src.compact_dataset import compact_if_enabled
+from src.feature_cache import cached_build, feature_cache_from_config
+from src.feature_panel import FeaturePanel, save_feature_panel
+from src.feature_registry import FeatureGraph
+from src.feature_update import daily_settings_from_config
 from src.features_daily_ohlcv import build_daily_ohlcv_feature_dataset
+from src.ohlcv_store import load_raw_ohlcv
 from src.preprocessing import (
     compute_returns,
     daily_to_monthly_compound,
@@ -14,26 +20,28 @@ from src.preprocessing import (
 from src.utils.paths import get_feature_dataset_paths
 
 
+FEATURE_MODULES = (features_daily_ohlcv, features_daily, feature_registry, feature_panel, kernels)
+
+
 def main() -> None:
     paths = get_feature_dataset_paths("daily_ohlcv")
     os.makedirs(paths["base_dir"], exist_ok=True)
 
-    ohlcv = pd.read_parquet(config.RAW_OHLCV_PATH)
     adj_close = pd.read_parquet(config.RAW_ADJ_CLOSE_PATH)
 
-    ohlcv.index = pd.to_datetime(ohlcv.index)
-    ohlcv = ohlcv.sort_index()
-
     adj_close.index = pd.to_datetime(adj_close.index)
     adj_close = adj_close.sort_index()
 
     available_tickers = [t for t in config.TICKERS if t in adj_close.columns]
     adj_close = adj_close[available_tickers]
 
-    # Restrict OHLCV multiindex columns to selected tickers
-    if isinstance(ohlcv.columns, pd.MultiIndex):
-        keep_cols = [col for col in ohlcv.columns if col[1] in available_tickers]
-        ohlcv = ohlcv[keep_cols]
+    # Only the selected tickers and the fields the builders use are loaded
+    ohlcv = load_raw_ohlcv(
+        config.RAW_OHLCV_PATH,
+        store_root=config.RAW_OHLCV_STORE_DIR if getattr(config, "USE_OHLCV_STORE", False) else None,
+        tickers=available_tickers,
+        fields=["Open", "High", "Low", "Close", "Volume"],
+    )
 
     print("Loaded adjusted close shape:", adj_close.shape)
     print("Loaded OHLCV shape:", ohlcv.shape)
@@ -54,25 +62,24 @@ def main() -> None:
     if config.MARKET_TICKER is not None and config.MARKET_TICKER in daily_returns.columns:
         market_daily_returns = daily_returns[config.MARKET_TICKER]
 
-    dataset = build_daily_ohlcv_feature_dataset(
-        ohlcv=ohlcv,
-        adj_close=adj_close,
-        daily_returns=daily_returns,
-        monthly_returns=monthly_returns,
-        use_log_returns=config.USE_LOG_RETURNS,
-        market_daily_returns=market_daily_returns,
-        return_windows=config.DAILY_RETURN_WINDOWS,
-        vol_windows=config.DAILY_VOL_WINDOWS,
-        ma_pairs=config.DAILY_MA_PAIRS,
-        high_windows=config.DAILY_HIGH_WINDOWS,
-        drawdown_windows=config.DAILY_DRAWDOWN_WINDOWS,
-        beta_windows=config.DAILY_BETA_WINDOWS,
-        rsi_window=config.DAILY_RSI_WINDOW,
-        volume_windows=getattr(config, "DAILY_OHLCV_VOL_WINDOWS", [20, 60]),
-        abnormal_volume_windows=getattr(config, "DAILY_OHLCV_ABVOL_WINDOWS", [20]),
-        range_windows=getattr(config, "DAILY_OHLCV_RANGE_WINDOWS", [5, 20]),
-        clv_windows=getattr(config, "DAILY_OHLCV_CLV_WINDOWS", [5, 20]),
-        target_name="y_next_1m",
+    settings = daily_settings_from_config("daily_ohlcv")
+
+    cache = feature_cache_from_config()
+    dataset = cached_build(
+        cache,
+        "daily_ohlcv_dataset",
+        inputs={"adj_close": adj_close, "ohlcv": ohlcv},
+        settings={**settings, "market_ticker": config.MARKET_TICKER},
+        modules=FEATURE_MODULES,
+        build=lambda: build_daily_ohlcv_feature_dataset(
+            ohlcv=ohlcv,
+            adj_close=adj_close,
+            daily_returns=daily_returns,
+            monthly_returns=monthly_returns,
+            market_daily_returns=market_daily_returns,
+            graph=FeatureGraph({}, cache=cache, workers=getattr(config, "FEATURE_WORKERS", 1)),
+            **settings,
+        ),
     )
 
     train_df, test_df = split_train_test_by_date(
@@ -81,9 +88,10 @@ def main() -> None:
         test_start_date=config.TEST_START_DATE,
     )
 
-    save_dataframe(dataset, paths["full"])
-    save_dataframe(train_df, paths["train"])
-    save_dataframe(test_df, paths["test"])
+    save_dataframe(compact_if_enabled(dataset), paths["full"])
+    save_dataframe(compact_if_enabled(train_df), paths["train"])
+    save_dataframe(compact_if_enabled(test_df), paths["test"])
+    save_feature_panel(FeaturePanel.from_long(dataset, target_col="y_next_1m"), paths["panel"])
 
     feature_cols = [c for c in dataset.columns if c != "y_next_1m"]
 
@@ -7,11 +7,15 @@ from pathlib import Path
 
 import pandas as pd
 
-from src import config
+from src import config, feature_registry, features_lstm, kernels
+from src.feature_cache import cached_build, feature_cache_from_config
 from src.features_lstm import (
     build_lstm_multifeature_sequence_dataset,
+    build_lstm_sequence_index,
     split_lstm_dataset_by_date,
+    save_lstm_dataset_dir,
     save_lstm_sample_set,
+    save_lstm_sequence_index,
     lstm_sample_set_to_long_dataframe,
 )
 
@@ -21,6 +25,11 @@ LSTM_FEATURE_DIR = Path("data/processed/features_lstm")
 FULL_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_full_daily.npz"
 TRAIN_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_train_daily_2015_2024.npz"
 TEST_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_test_daily_2025.npz"
+INDEX_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_index_daily.npz"
+
+# Uncompressed .npy stores; train/test are sliced from the full set on load
+FULL_STORE_DIR = LSTM_FEATURE_DIR / "lstm_full_daily"
+INDEX_STORE_DIR = LSTM_FEATURE_DIR / "lstm_index_daily"
 
 FULL_META_PATH = LSTM_FEATURE_DIR / "lstm_full_daily_metadata.parquet"
 TRAIN_META_PATH = LSTM_FEATURE_DIR / "lstm_train_daily_2015_2024_metadata.parquet"
@@ -48,13 +57,26 @@ def main() -> None:
     sequence_length = getattr(config, "LSTM_SEQUENCE_LENGTH", 60)
     normalize_per_sequence = getattr(config, "LSTM_NORMALIZE_PER_SEQUENCE", True)
 
-    dataset = build_lstm_multifeature_sequence_dataset(
-        adj_close=adj_close,
-        market_ticker=getattr(config, "LSTM_MARKET_TICKER", None),
-        sequence_length=sequence_length,
-        target_horizon_months=1,
-        target_name="y_next_1m",
-        normalize_per_sequence=normalize_per_sequence,
+    settings = {
+        "market_ticker": getattr(config, "LSTM_MARKET_TICKER", None),
+        "sequence_length": sequence_length,
+        "target_horizon_months": 1,
+        "target_name": "y_next_1m",
+        "normalize_per_sequence": normalize_per_sequence,
+    }
+
+    dataset_format = getattr(config, "LSTM_DATASET_FORMAT", "windows")
+    if dataset_format not in ("windows", "index"):
+        raise ValueError(f"Unsupported LSTM_DATASET_FORMAT: {dataset_format}")
+    build = build_lstm_sequence_index if dataset_format == "index" else build_lstm_multifeature_sequence_dataset
+
+    dataset = cached_build(
+        feature_cache_from_config(),
+        "lstm_sequence_index" if dataset_format == "index" else "lstm_dataset",
+        inputs={"adj_close": adj_close},
+        settings=settings,
+        modules=(features_lstm, feature_registry, kernels),
+        build=lambda: build(adj_close=adj_close, **settings),
     )
 
     train_set, test_set = split_lstm_dataset_by_date(
@@ -63,9 +85,26 @@ def main() -> None:
         test_start_date=config.TEST_START_DATE,
     )
 
-    save_lstm_sample_set(dataset, str(FULL_NPZ_PATH))
-    save_lstm_sample_set(train_set, str(TRAIN_NPZ_PATH))
-    save_lstm_sample_set(test_set, str(TEST_NPZ_PATH))
+    storage_format = getattr(config, "LSTM_STORAGE_FORMAT", "npz")
+    if storage_format == "npy":
+        store_dir = INDEX_STORE_DIR if dataset_format == "index" else FULL_STORE_DIR
+        save_lstm_dataset_dir(dataset, str(store_dir))
+        saved_files = [("Store dir ->", store_dir)]
+    elif storage_format != "npz":
+        raise ValueError(f"Unsupported LSTM_STORAGE_FORMAT: {storage_format}")
+    elif dataset_format == "index":
+        # Train/test are recovered from the dates, no need to store them apart
+        save_lstm_sequence_index(dataset, str(INDEX_NPZ_PATH))
+        saved_files = [("Index NPZ ->", INDEX_NPZ_PATH)]
+    else:
+        save_lstm_sample_set(dataset, str(FULL_NPZ_PATH))
+        save_lstm_sample_set(train_set, str(TRAIN_NPZ_PATH))
+        save_lstm_sample_set(test_set, str(TEST_NPZ_PATH))
+        saved_files = [
+            ("Full NPZ  ->", FULL_NPZ_PATH),
+            ("Train NPZ ->", TRAIN_NPZ_PATH),
+            ("Test NPZ  ->", TEST_NPZ_PATH),
+        ]
 
     full_meta = lstm_sample_set_to_long_dataframe(dataset)
     train_meta = lstm_sample_set_to_long_dataframe(train_set)
@@ -79,14 +118,14 @@ def main() -> None:
     print("Sequence length:", sequence_length)
     print("Normalize per sequence:", normalize_per_sequence)
     print("Feature names:", dataset.feature_names)
-    print("Full X shape:", dataset.X.shape)
-    print("Train X shape:", train_set.X.shape)
-    print("Test X shape:", test_set.X.shape)
+    print("Dataset format:", dataset_format, f"({storage_format})")
+    print("Full X shape:", dataset.shape)
+    print("Train X shape:", train_set.shape)
+    print("Test X shape:", test_set.shape)
 
     print("\nSaved files:")
-    print("Full NPZ  ->", FULL_NPZ_PATH)
-    print("Train NPZ ->", TRAIN_NPZ_PATH)
-    print("Test NPZ  ->", TEST_NPZ_PATH)
+    for label, path in saved_files:
+        print(label, path)
     print("Full meta ->", FULL_META_PATH)
     print("Train meta->", TRAIN_META_PATH)
     print("Test meta ->", TEST_META_PATH)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.compact_dataset import compact_if_enabled, from_compact
+from src.feature_panel import FeaturePanel, save_feature_panel
+from src.feature_update import (
+    build_feature_dataset_with_state,
+    daily_settings_from_config,
+    load_update_state,
+    save_update_state,
+    update_feature_dataset,
+)
+from src.ohlcv_store import load_raw_ohlcv
+from src.preprocessing import split_train_test_by_date, save_dataframe
+from src.utils.paths import get_feature_dataset_paths
+
+
+def _load_prices(source: str) -> tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    adj_close = pd.read_parquet(config.RAW_ADJ_CLOSE_PATH)
+    adj_close.index = pd.to_datetime(adj_close.index)
+    adj_close = adj_close.sort_index()
+
+    available_tickers = [t for t in config.TICKERS if t in adj_close.columns]
+    adj_close = adj_close[available_tickers]
+
+    ohlcv = None
+    if source == "daily_ohlcv":
+        ohlcv = load_raw_ohlcv(
+            config.RAW_OHLCV_PATH,
+            store_root=config.RAW_OHLCV_STORE_DIR if getattr(config, "USE_OHLCV_STORE", False) else None,
+            tickers=available_tickers,
+            fields=["Open", "High", "Low", "Close", "Volume"],
+        )
+    return adj_close, ohlcv
+
+
+def update_source(source: str) -> None:
+    """
+    Bring one daily feature dataset up to date with the raw prices.
+
+    With a matching saved state, only the new month-end rows (and the
+    previous month's now-resolved target) are computed; otherwise the
+    dataset is rebuilt in full and the state saved for the next run.
+    """
+    paths = get_feature_dataset_paths(source)
+    os.makedirs(paths["base_dir"], exist_ok=True)
+
+    start = time.time()
+    adj_close, ohlcv = _load_prices(source)
+    settings = daily_settings_from_config(source)
+    target_col = settings["target_name"]
+
+    state = load_update_state(paths["update_state"])
+    usable = (
+        state is not None
+        and state.matches(source, settings, config.MARKET_TICKER)
+        and os.path.exists(paths["full"])
+    )
+
+    if not usable:
+        print(f"[{source}] No usable update state, building in full")
+        dataset, state = build_feature_dataset_with_state(
+            source,
+            adj_close,
+            settings,
+            market_ticker=config.MARKET_TICKER,
+            ohlcv=ohlcv,
+        )
+    elif adj_close.index[-1] <= state.last_date:
+        print(f"[{source}] Up to date at {state.last_date.date()}")
+        return
+    else:
+        print(f"[{source}] Updating from {state.last_date.date()} to {adj_close.index[-1].date()}")
+        dataset, state = update_feature_dataset(
+            state,
+            from_compact(pd.read_parquet(paths["full"]), dtype=np.float64),
+            adj_close,
+            ohlcv,
+        )
+
+    train_df, test_df = split_train_test_by_date(
+        dataset,
+        train_end_date=config.TRAIN_END_DATE,
+        test_start_date=config.TEST_START_DATE,
+    )
+
+    save_dataframe(compact_if_enabled(dataset), paths["full"])
+    save_dataframe(compact_if_enabled(train_df), paths["train"])
+    save_dataframe(compact_if_enabled(test_df), paths["test"])
+    save_feature_panel(FeaturePanel.from_long(dataset, target_col=target_col), paths["panel"])
+    save_update_state(state, paths["update_state"])
+
+    print(f"[{source}] Full dataset shape: {dataset.shape}, last date: {dataset.index.get_level_values('date').max().date()}")
+    print(f"[{source}] Done in {time.time() - start:.1f}s")
+
+
+def main() -> None:
+    for source in getattr(config, "FEATURE_UPDATE_SOURCES", ["daily", "daily_ohlcv"]):
+        update_source(source)
+
+
+if __name__ == "__main__":
+    main()
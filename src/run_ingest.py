@@ -0,0 +1,116 @@
+# src/run_ingest.py
+
+from __future__ import annotations
+
+from typing import Optional
+
+import pandas as pd
+
+from src import config
+from src.batch_download import provider_from_config
+from src.data_download import (
+    OHLCVDownloadResult,
+    PriceProvider,
+    download_ohlcv,
+    update_ohlcv_incremental,
+    print_missing_summary,
+    save_dataframe_atomic,
+)
+from src.ohlcv_store import write_ohlcv_store
+from src.preprocessing import (
+    PreprocessResult,
+    preprocess_prices_to_returns,
+    save_dataframe,
+    basic_sanity_report,
+)
+from src.utils.paths import get_processed_returns_paths
+
+
+def ingest_raw_prices(provider: Optional[PriceProvider] = None) -> OHLCVDownloadResult:
+    """
+    Fetch OHLCV once and write every raw artefact derived from it.
+
+    Adjusted close is taken from the same download, so the raw OHLCV and
+    adjusted close files always agree. With config.INGEST_INCREMENTAL set,
+    only the tail missing from the stored OHLCV file is fetched.
+    """
+    provider = provider if provider is not None else provider_from_config()
+
+    if config.INGEST_INCREMENTAL:
+        result = update_ohlcv_incremental(
+            path=config.RAW_OHLCV_PATH,
+            tickers=config.TICKERS,
+            start_date=config.START_DATE,
+            end_date=config.END_DATE,
+            auto_adjust=False,
+            provider=provider,
+            overlap_days=config.INGEST_OVERLAP_DAYS,
+        )
+        print(f"Updated RAW OHLCV -> {config.RAW_OHLCV_PATH}")
+    else:
+        result = download_ohlcv(
+            tickers=config.TICKERS,
+            start_date=config.START_DATE,
+            end_date=config.END_DATE,
+            auto_adjust=False,
+            provider=provider,
+        )
+        save_dataframe_atomic(result.ohlcv, config.RAW_OHLCV_PATH)
+        print(f"Saved RAW OHLCV -> {config.RAW_OHLCV_PATH}")
+
+    if getattr(config, "USE_OHLCV_STORE", False):
+        write_ohlcv_store(result.ohlcv, config.RAW_OHLCV_STORE_DIR)
+        print(f"Saved OHLCV store -> {config.RAW_OHLCV_STORE_DIR}")
+
+    save_dataframe_atomic(result.adj_close, config.RAW_ADJ_CLOSE_PATH)
+    print(f"Saved RAW Adjusted Close -> {config.RAW_ADJ_CLOSE_PATH}")
+
+    print_missing_summary(result.missing_ratio_adj_close)
+    return result
+
+
+def build_processed_returns(adj_close: pd.DataFrame) -> PreprocessResult:
+    """
+    Compute daily/monthly returns and the train/test split from adjusted
+    close prices already in memory, then save them to the standard paths.
+    """
+    returns_paths = get_processed_returns_paths()
+
+    prep = preprocess_prices_to_returns(
+        adj_close=adj_close,
+        train_end_date=config.TRAIN_END_DATE,
+        test_start_date=config.TEST_START_DATE,
+        max_missing_ratio=0.10,
+        fill_gap_limit=1,
+        use_log_returns=config.USE_LOG_RETURNS,
+    )
+
+    save_dataframe(prep.returns_daily, returns_paths["daily"])
+    save_dataframe(prep.returns_monthly, returns_paths["monthly"])
+    save_dataframe(prep.train_monthly, returns_paths["train_monthly"])
+    save_dataframe(prep.test_monthly, returns_paths["test_monthly"])
+
+    print(f"Saved daily returns -> {returns_paths['daily']}")
+    print(f"Saved monthly returns -> {returns_paths['monthly']}")
+    print(f"Saved train monthly set -> {returns_paths['train_monthly']}")
+    print(f"Saved test monthly set -> {returns_paths['test_monthly']}")
+
+    basic_sanity_report(prep.returns_monthly)
+    return prep
+
+
+def main() -> None:
+    """
+    Single-pass ingest stage.
+
+    1. Fetches OHLCV once through the configured provider
+    2. Writes raw OHLCV, raw adjusted close (and the OHLCV store if enabled)
+    3. Builds and saves the processed return datasets from the same
+       in-memory adjusted close, without re-reading any parquet
+    """
+    result = ingest_raw_prices()
+    build_processed_returns(result.adj_close)
+
+
+if __name__ == "__main__":
+    main()
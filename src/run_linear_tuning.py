@@ -8,6 +8,8 @@ import pandas as pd
 from sklearn.metrics import mean_squared_error
 
 from src import config
+from src.feature_panel import read_feature_split
+from src.long_dataset import LongDataset
 from src.models.linear import fit_ridge_with_scaler, predict_returns
 from src.utils.paths import get_feature_dataset_paths, get_experiment_dir
 
@@ -122,7 +124,7 @@ def main() -> None:
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
 
     target_cols = [c for c in ml_train.columns if c.startswith("y_next")]
     if len(target_cols) != 1:
@@ -139,15 +141,16 @@ def main() -> None:
     unique_dates = ml_train.index.get_level_values("date").unique().sort_values()
     folds = build_time_folds_from_dates(unique_dates, n_splits=n_splits)
 
+    # Folds are contiguous date ranges: row slices of one date-sorted dataset,
+    # which also share robust-scaler sketches across alphas and folds
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
+
     all_results = []
 
     for alpha in alpha_grid:
         for fold_id, (train_dates, val_dates) in enumerate(folds, start=1):
-            train_mask = ml_train.index.get_level_values("date").isin(train_dates)
-            val_mask = ml_train.index.get_level_values("date").isin(val_dates)
-
-            fold_train = ml_train.loc[train_mask].copy()
-            fold_val = ml_train.loc[val_mask].copy()
+            fold_train = ml_data.for_dates(train_dates)
+            fold_val = ml_data.for_dates(val_dates)
 
             artifacts = fit_ridge_with_scaler(
                 train_df=fold_train,
@@ -20,8 +20,27 @@ from src.evaluation.backtest import (
     compute_portfolio_returns,
 )
 from src.evaluation.metrics import summarize_metrics, turnover
-from src.features_lstm import load_lstm_sample_set, lstm_sample_set_to_long_dataframe
-from src.models.lstm_model import fit_lstm, predict_lstm
+from src.evaluation.walk_forward import WalkForwardModel, print_fold, walk_forward_predict
+from src.features_lstm import (
+    LSTMSampleSet,
+    LSTMSequenceIndex,
+    load_lstm_dataset_dir,
+    load_lstm_sample_set,
+    load_lstm_sequence_index,
+    lstm_sample_set_to_long_dataframe,
+    split_lstm_dataset_by_date,
+)
+from src.model_store import model_store_from_config
+from src.models.lstm_model import (
+    LSTM_SAMPLE_COL,
+    LSTMArtifacts,
+    LSTMWalkForward,
+    fit_lstm,
+    fit_lstm_batched,
+    predict_lstm,
+    predict_lstm_batched,
+    lstm_walk_forward_frame,
+)
 from src.strategies.momentum import build_equal_weight_weights, select_top_assets
 from src.utils.paths import get_experiment_dir, get_processed_returns_paths
 
@@ -30,6 +49,9 @@ LSTM_FEATURE_DIR = Path("data/processed/features_lstm")
 
 TRAIN_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_train_daily_2015_2024.npz"
 TEST_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_test_daily_2025.npz"
+INDEX_NPZ_PATH = LSTM_FEATURE_DIR / "lstm_index_daily.npz"
+FULL_STORE_DIR = LSTM_FEATURE_DIR / "lstm_full_daily"
+INDEX_STORE_DIR = LSTM_FEATURE_DIR / "lstm_index_daily"
 
 RETURNS_PATHS = get_processed_returns_paths()
 RET_TRAIN_PATH = RETURNS_PATHS["train_monthly"]
@@ -64,6 +86,88 @@ def set_seed(seed: int = 42) -> None:
     tf.random.set_seed(seed)
 
 
+def load_lstm_full_dataset() -> LSTMSampleSet | LSTMSequenceIndex | None:
+    """
+    The whole LSTM dataset (all dates) in the configured format, None for
+    the separate train / test .npz files.
+    """
+    use_index = getattr(config, "LSTM_DATASET_FORMAT", "windows") == "index"
+    use_store = getattr(config, "LSTM_STORAGE_FORMAT", "npz") == "npy"
+
+    if use_store:
+        return load_lstm_dataset_dir(str(INDEX_STORE_DIR if use_index else FULL_STORE_DIR), mmap=True)
+    if use_index:
+        return load_lstm_sequence_index(str(INDEX_NPZ_PATH))
+    return None
+
+
+def load_lstm_splits():
+    """
+    Train and test LSTM datasets in the configured format, and whether they
+    should be fed to the model batch by batch.
+
+    The .npy store is memory-mapped and the splits are views of it; the
+    index format materializes windows per batch.
+    """
+    full_set = load_lstm_full_dataset()
+    if full_set is None:
+        return load_lstm_sample_set(str(TRAIN_NPZ_PATH)), load_lstm_sample_set(str(TEST_NPZ_PATH)), False
+
+    train_set, test_set = split_lstm_dataset_by_date(
+        dataset=full_set,
+        train_end_date=config.TRAIN_END_DATE,
+        test_start_date=config.TEST_START_DATE,
+    )
+    return train_set, test_set, True
+
+
+def fit_lstm_model(
+    train_set: LSTMSampleSet | LSTMSequenceIndex,
+    target_name: str,
+    batched: bool,
+) -> LSTMArtifacts:
+    """
+    Fit the LSTM batch by batch or on the materialized windows.
+    """
+    if batched:
+        return fit_lstm_batched(train_set, target_name=target_name)
+    return fit_lstm(
+        X_train_full=train_set.X,
+        y_train_full=train_set.y,
+        target_name=target_name,
+    )
+
+
+def rolling_test_predictions(pred_col: str = "pred_return") -> pd.DataFrame:
+    """
+    Test-period predictions from an LSTM refitted every month on all
+    samples dated before it, through the walk-forward engine.
+    """
+    full_set = load_lstm_full_dataset()
+    if full_set is None:
+        raise ValueError(
+            "LSTM walk-forward needs the full dataset: set LSTM_DATASET_FORMAT = 'index' "
+            "or LSTM_STORAGE_FORMAT = 'npy'."
+        )
+
+    ml_all = lstm_walk_forward_frame(full_set)
+    dates = ml_all.index.get_level_values("date").unique().sort_values()
+    test_dates = dates[dates >= pd.Timestamp(config.TEST_START_DATE)]
+
+    # Keras models are fitted one at a time, so months run serially
+    adapter = LSTMWalkForward(full_set)
+    predictions, _ = walk_forward_predict(
+        ml_all=ml_all,
+        test_dates=test_dates,
+        model=WalkForwardModel(fit=adapter.fit, predict=adapter.predict),
+        feature_cols=[LSTM_SAMPLE_COL],
+        target_col=full_set.target_name,
+        pred_col=pred_col,
+        on_fold=print_fold,
+    )
+    return predictions
+
+
 def predictions_to_weights(pred_long: pd.DataFrame, top_pct: float) -> pd.DataFrame:
     """
     Convert long predictions into equal-weight portfolio weights.
@@ -251,8 +355,7 @@ def main() -> None:
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
     print("Loading LSTM datasets...")
-    train_set = load_lstm_sample_set(str(TRAIN_NPZ_PATH))
-    test_set = load_lstm_sample_set(str(TEST_NPZ_PATH))
+    train_set, test_set, batched = load_lstm_splits()
 
     train_meta = lstm_sample_set_to_long_dataframe(train_set)
     test_meta = lstm_sample_set_to_long_dataframe(test_set)
@@ -263,26 +366,36 @@ def main() -> None:
     target_col = train_set.target_name
     top_pct = getattr(config, "TOP_PERCENTAGE", 0.20)
 
-    print("Train X shape:", train_set.X.shape)
-    print("Test X shape:", test_set.X.shape)
+    print("Train X shape:", train_set.shape)
+    print("Test X shape:", test_set.shape)
     print("Target column:", target_col)
 
-    artifacts = fit_lstm(
-        X_train_full=train_set.X,
-        y_train_full=train_set.y,
-        target_name=target_col,
-    )
+    # Loaded from the model store when nothing it depends on has changed
+    fit_kwargs = {"target_name": target_col, "batched": batched}
+    store = model_store_from_config()
+    if store is None:
+        artifacts = fit_lstm_model(train_set, **fit_kwargs)
+    else:
+        artifacts = store.fit_or_load("lstm", fit_lstm_model, train_set, fit_kwargs=fit_kwargs)
 
     with open(TRAINING_HISTORY_PATH, "w") as f:
         json.dump(artifacts.history, f, indent=4)
 
     plot_loss_curve(artifacts.history, LOSS_CURVE_PATH)
 
-    pred_train_values = predict_lstm(artifacts, train_set.X)
-    pred_test_values = predict_lstm(artifacts, test_set.X)
+    if batched:
+        pred_train_values = predict_lstm_batched(artifacts, train_set)
+        pred_test_values = predict_lstm_batched(artifacts, test_set)
+    else:
+        pred_train_values = predict_lstm(artifacts, train_set.X)
+        pred_test_values = predict_lstm(artifacts, test_set.X)
 
     pred_train = build_prediction_dataframe(train_meta, pred_train_values, pred_col="pred_return")
-    pred_test = build_prediction_dataframe(test_meta, pred_test_values, pred_col="pred_return")
+    if getattr(config, "LSTM_WALK_FORWARD", False):
+        print("Refitting the LSTM month by month over the test period...")
+        pred_test = rolling_test_predictions(pred_col="pred_return")
+    else:
+        pred_test = build_prediction_dataframe(test_meta, pred_test_values, pred_col="pred_return")
 
     save_prediction_table(
         df_pred=pred_train,
@@ -10,6 +10,8 @@ import tensorflow as tf
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from src import config
+from src.feature_panel import read_feature_split
+from src.model_store import model_store_from_config, stored_fit
 from src.models.nn_mlp import fit_mlp_with_scaler, predict_returns
 from src.strategies.momentum import select_top_assets, build_equal_weight_weights
 from src.evaluation.backtest import (
@@ -196,8 +198,8 @@ def main() -> None:
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
-    ml_test = pd.read_parquet(ML_TEST_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
+    ml_test = read_feature_split(FEATURE_DATASET_PATHS, "test")
 
     ret_train = pd.read_parquet(RET_TRAIN_PATH)
     ret_test = pd.read_parquet(RET_TEST_PATH)
@@ -210,7 +212,8 @@ def main() -> None:
     feature_cols = [c for c in ml_train.columns if c != target_col]
     top_pct = getattr(config, "TOP_PERCENTAGE", 0.20)
 
-    artifacts = fit_mlp_with_scaler(
+    # Loaded from the model store when nothing it depends on has changed
+    artifacts = stored_fit(model_store_from_config(), "mlp", fit_mlp_with_scaler)(
         train_df=ml_train,
         feature_cols=feature_cols,
         target_col=target_col,
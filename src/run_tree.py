@@ -8,6 +8,8 @@ import numpy as np
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from src import config
+from src.feature_panel import read_feature_split
+from src.model_store import model_store_from_config, stored_fit
 from src.models.tree import fit_random_forest, predict_returns
 from src.strategies.momentum import select_top_assets, build_equal_weight_weights
 from src.evaluation.backtest import (
@@ -150,8 +152,8 @@ def main() -> None:
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
-    ml_test = pd.read_parquet(ML_TEST_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
+    ml_test = read_feature_split(FEATURE_DATASET_PATHS, "test")
 
     ret_train = pd.read_parquet(RET_TRAIN_PATH)
     ret_test = pd.read_parquet(RET_TEST_PATH)
@@ -164,7 +166,8 @@ def main() -> None:
     feature_cols = [c for c in ml_train.columns if c != target_col]
     top_pct = getattr(config, "TOP_PERCENTAGE", 0.20)
 
-    artifacts = fit_random_forest(
+    # Loaded from the model store when nothing it depends on has changed
+    artifacts = stored_fit(model_store_from_config(), "random_forest", fit_random_forest)(
         train_df=ml_train,
         feature_cols=feature_cols,
         target_col=target_col,
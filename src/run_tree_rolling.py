@@ -1,5 +1,6 @@
 # src/run_tree_rolling.py
 
+import argparse
 import os
 import json
 import pandas as pd
@@ -8,7 +9,9 @@ import numpy as np
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from src import config
-from src.models.tree import fit_random_forest, predict_returns
+from src.feature_panel import read_feature_split
+from src.model_store import model_params, model_store_from_config, stored_fit
+from src.models.tree import fit_random_forest, predict_returns, update_random_forest
 from src.strategies.momentum import select_top_assets, build_equal_weight_weights
 from src.evaluation.backtest import (
     compute_portfolio_returns,
@@ -16,6 +19,14 @@ from src.evaluation.backtest import (
     apply_transaction_costs,
 )
 from src.evaluation.metrics import summarize_metrics, turnover
+from src.evaluation.walk_forward import (
+    WalkForwardModel,
+    feature_importances,
+    prediction_drift,
+    print_fold,
+    walk_forward_from_config,
+    walk_forward_predict,
+)
 from src.utils.paths import (
     get_feature_dataset_paths,
     get_processed_returns_paths,
@@ -44,6 +55,8 @@ EQUITY_TEST_PATH = os.path.join(RESULTS_DIR, "equity_test_2025.csv")
 PRED_METRICS_PATH = os.path.join(RESULTS_DIR, "prediction_metrics.json")
 FEATURE_IMPORTANCE_MEAN_PATH = os.path.join(RESULTS_DIR, "feature_importance_mean.csv")
 TEST_PREDICTIONS_PATH = os.path.join(RESULTS_DIR, "test_predictions.csv")
+INCREMENTAL_DRIFT_PATH = os.path.join(RESULTS_DIR, "incremental_drift.csv")
+CHECKPOINT_DIR = os.path.join(RESULTS_DIR, "checkpoints")
 
 
 def predictions_to_weights(pred_long: pd.DataFrame, top_pct: float) -> pd.DataFrame:
@@ -145,6 +158,7 @@ def fit_predict_rolling_test(
     ml_test: pd.DataFrame,
     feature_cols: list[str],
     target_col: str,
+    resume: bool = False,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Fit Random Forest in a rolling expanding-window way for each test month.
@@ -153,6 +167,9 @@ def fit_predict_rolling_test(
     - train on all rows dated strictly before that month
     - predict rows for that month only
 
+    Completed months are checkpointed under CHECKPOINT_DIR; with `resume`,
+    those of an interrupted run with the same inputs are not refitted.
+
     Returns
     -------
     pred_train_static : pd.DataFrame
@@ -160,55 +177,70 @@ def fit_predict_rolling_test(
     pred_test_rolling : pd.DataFrame
         Out-of-sample rolling predictions for test months.
     """
+    # Fits go through the model store: a rerun loads them instead of training
+    store = model_store_from_config()
+
     # Static train fit for train diagnostics
-    static_artifacts = fit_random_forest(
+    static_artifacts = stored_fit(store, "random_forest", fit_random_forest)(
         train_df=ml_train,
         feature_cols=feature_cols,
         target_col=target_col,
     )
     pred_train_static = predict_returns(static_artifacts, ml_train, pred_col="pred_return")
 
-    # Rolling test predictions
+    # Rolling test predictions, one independent fit per month
     ml_all = pd.concat([ml_train, ml_test]).sort_index()
     test_dates = ml_test.index.get_level_values("date").unique().sort_values()
 
-    rolling_preds = []
-    importances = []
-
-    for current_date in test_dates:
-        train_mask = ml_all.index.get_level_values("date") < current_date
-        test_mask = ml_all.index.get_level_values("date") == current_date
-
-        fold_train = ml_all.loc[train_mask].copy()
-        fold_test = ml_all.loc[test_mask].copy()
-
-        if fold_train.empty or fold_test.empty:
-            continue
+    # Incremental mode refreshes last month's forest instead of refitting it
+    incremental = getattr(config, "RF_INCREMENTAL", False)
+    workers, inner_jobs = walk_forward_from_config()
+    model = WalkForwardModel(
+        fit=stored_fit(store, "random_forest", fit_random_forest),
+        predict=predict_returns,
+        importances=feature_importances,
+        fit_kwargs={"n_jobs": inner_jobs},
+        update=update_random_forest if incremental else None,
+    )
+    # Each month is checkpointed as it completes; --resume skips those done
+    rf_params = model_params("random_forest")
+    pred_test_rolling, mean_importance = walk_forward_predict(
+        ml_all=ml_all,
+        test_dates=test_dates,
+        model=model,
+        feature_cols=feature_cols,
+        target_col=target_col,
+        workers=workers,
+        on_fold=print_fold,
+        checkpoint_dir=os.path.join(CHECKPOINT_DIR, "rolling"),
+        resume=resume,
+        run_settings={
+            **rf_params,
+            "RF_INCREMENTAL_REPLACE_FRACTION": getattr(config, "RF_INCREMENTAL_REPLACE_FRACTION", 0.10),
+        },
+    )
 
-        artifacts = fit_random_forest(
-            train_df=fold_train,
+    if incremental and getattr(config, "RF_INCREMENTAL_DRIFT_CHECK", False):
+        print("Fitting full refits for the incremental drift check")
+        pred_test_full, _ = walk_forward_predict(
+            ml_all=ml_all,
+            test_dates=test_dates,
+            model=WalkForwardModel(fit=model.fit, predict=model.predict, fit_kwargs=model.fit_kwargs),
             feature_cols=feature_cols,
             target_col=target_col,
+            workers=workers,
+            checkpoint_dir=os.path.join(CHECKPOINT_DIR, "full_refit"),
+            resume=resume,
+            run_settings=rf_params,
         )
-
-        pred_fold = predict_returns(artifacts, fold_test, pred_col="pred_return")
-        rolling_preds.append(pred_fold)
-
-        imp = artifacts.feature_importances_.rename(current_date)
-        importances.append(imp)
-
+        drift = prediction_drift(pred_test_rolling, pred_test_full, pred_col="pred_return")
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        drift.to_csv(INCREMENTAL_DRIFT_PATH)
         print(
-            f"Predicted {pd.Timestamp(current_date).date()} "
-            f"using {fold_train.index.get_level_values('date').nunique()} train months"
+            f"Incremental vs full refit: mean abs diff {drift['mean_abs_diff'].mean():.6f}, "
+            f"mean rank corr {drift['rank_corr'].mean():.4f} -> {INCREMENTAL_DRIFT_PATH}"
         )
 
-    if not rolling_preds:
-        raise ValueError("No rolling predictions were generated for test period.")
-
-    pred_test_rolling = pd.concat(rolling_preds).sort_index()
-    mean_importance = pd.concat(importances, axis=1).mean(axis=1).sort_values(ascending=False)
-    mean_importance.name = "importance_mean"
-
     return pred_train_static, pred_test_rolling, mean_importance
 
 
@@ -216,14 +248,22 @@ def main() -> None:
     """
     Run Random Forest with rolling monthly retraining on the selected feature dataset.
     """
+    parser = argparse.ArgumentParser(description="Random Forest with rolling monthly retraining.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse the months checkpointed by an interrupted run with the same inputs.",
+    )
+    args = parser.parse_args()
+
     print(f"Using feature source: {config.FEATURE_SOURCE}")
     print(f"ML train path: {ML_TRAIN_PATH}")
     print(f"ML test path: {ML_TEST_PATH}")
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
-    ml_test = pd.read_parquet(ML_TEST_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
+    ml_test = read_feature_split(FEATURE_DATASET_PATHS, "test")
 
     ret_train = pd.read_parquet(RET_TRAIN_PATH)
     ret_test = pd.read_parquet(RET_TEST_PATH)
@@ -241,6 +281,7 @@ def main() -> None:
         ml_test=ml_test,
         feature_cols=feature_cols,
         target_col=target_col,
+        resume=args.resume,
     )
 
     mean_importance.to_csv(FEATURE_IMPORTANCE_MEAN_PATH, header=True)
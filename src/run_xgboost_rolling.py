@@ -1,5 +1,6 @@
 # src/run_xgboost_rolling.py
 
+import argparse
 import os
 import json
 import pandas as pd
@@ -8,7 +9,9 @@ import numpy as np
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from src import config
-from src.models.xgboost_model import fit_xgboost, predict_returns
+from src.feature_panel import read_feature_split
+from src.model_store import model_params, model_store_from_config, stored_fit
+from src.models.xgboost_model import describe_xgboost, fit_xgboost, predict_returns, update_xgboost
 from src.strategies.momentum import select_top_assets, build_equal_weight_weights
 from src.evaluation.backtest import (
     compute_portfolio_returns,
@@ -16,6 +19,16 @@ from src.evaluation.backtest import (
     apply_transaction_costs,
 )
 from src.evaluation.metrics import summarize_metrics, turnover
+from src.evaluation.walk_forward import (
+    WalkForwardModel,
+    WalkForwardFold,
+    feature_importances,
+    monthly_rmse,
+    prediction_drift,
+    print_fold,
+    walk_forward_from_config,
+    walk_forward_predict,
+)
 from src.utils.paths import (
     get_feature_dataset_paths,
     get_processed_returns_paths,
@@ -44,6 +57,8 @@ EQUITY_TEST_PATH = os.path.join(RESULTS_DIR, "equity_test_2025.csv")
 PRED_METRICS_PATH = os.path.join(RESULTS_DIR, "prediction_metrics.json")
 FEATURE_IMPORTANCE_MEAN_PATH = os.path.join(RESULTS_DIR, "feature_importance_mean.csv")
 TEST_PREDICTIONS_PATH = os.path.join(RESULTS_DIR, "test_predictions.csv")
+CONTINUATION_REPORT_PATH = os.path.join(RESULTS_DIR, "continuation_report.csv")
+CHECKPOINT_DIR = os.path.join(RESULTS_DIR, "checkpoints")
 
 
 def predictions_to_weights(pred_long: pd.DataFrame, top_pct: float) -> pd.DataFrame:
@@ -140,15 +155,42 @@ def compute_cost_adjusted_results(
     return turnover_series, cost_results
 
 
+def continuation_report(
+    folds: list[WalkForwardFold],
+    full_folds: list[WalkForwardFold],
+    pred_test: pd.DataFrame,
+    pred_test_full: pd.DataFrame,
+    target_col: str,
+) -> pd.DataFrame:
+    """
+    Per-month fit time and accuracy of the continued boosters against full
+    refits, with the gap between their predictions.
+    """
+    report = pd.DataFrame({
+        "months_since_refit": {f.date: f.info.get("months_since_refit") for f in folds},
+        "boosted_rounds": {f.date: f.info.get("boosted_rounds") for f in folds},
+        "fit_seconds": {f.date: f.fit_seconds for f in folds},
+        "fit_seconds_full": {f.date: f.fit_seconds for f in full_folds},
+    }).sort_index()
+    report.index.name = "date"
+    report["rmse"] = monthly_rmse(pred_test, target_col)
+    report["rmse_full"] = monthly_rmse(pred_test_full, target_col)
+    return report.join(prediction_drift(pred_test, pred_test_full))
+
+
 def fit_predict_rolling_test(
     ml_train: pd.DataFrame,
     ml_test: pd.DataFrame,
     feature_cols: list[str],
     target_col: str,
+    resume: bool = False,
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
     """
     Fit XGBoost in a rolling expanding-window way for each test month.
 
+    Completed months are checkpointed under CHECKPOINT_DIR; with `resume`,
+    those of an interrupted run with the same inputs are not refitted.
+
     Returns
     -------
     pred_train_static : pd.DataFrame
@@ -158,53 +200,81 @@ def fit_predict_rolling_test(
     mean_importance : pd.Series
         Mean feature importance across rolling fits.
     """
-    static_artifacts = fit_xgboost(
+    # Fits go through the model store: a rerun loads them instead of training
+    store = model_store_from_config()
+
+    static_artifacts = stored_fit(store, "xgboost", fit_xgboost)(
         train_df=ml_train,
         feature_cols=feature_cols,
         target_col=target_col,
     )
     pred_train_static = predict_returns(static_artifacts, ml_train, pred_col="pred_return")
 
+    # Rolling test predictions; continuation mode extends last month's booster
     ml_all = pd.concat([ml_train, ml_test]).sort_index()
     test_dates = ml_test.index.get_level_values("date").unique().sort_values()
 
-    rolling_preds = []
-    importances = []
+    continuation = getattr(config, "XGB_CONTINUATION", False)
+    workers, inner_jobs = walk_forward_from_config()
+    model = WalkForwardModel(
+        fit=stored_fit(store, "xgboost", fit_xgboost),
+        predict=predict_returns,
+        importances=feature_importances,
+        fit_kwargs={"n_jobs": inner_jobs},
+        update=update_xgboost if continuation else None,
+        describe=describe_xgboost,
+    )
 
-    for current_date in test_dates:
-        train_mask = ml_all.index.get_level_values("date") < current_date
-        test_mask = ml_all.index.get_level_values("date") == current_date
+    folds: list[WalkForwardFold] = []
 
-        fold_train = ml_all.loc[train_mask].copy()
-        fold_test = ml_all.loc[test_mask].copy()
+    def on_fold(fold: WalkForwardFold) -> None:
+        print_fold(fold)
+        folds.append(fold)
 
-        if fold_train.empty or fold_test.empty:
-            continue
+    # Each month is checkpointed as it completes; --resume skips those done
+    xgb_params = model_params("xgboost")
+    pred_test_rolling, mean_importance = walk_forward_predict(
+        ml_all=ml_all,
+        test_dates=test_dates,
+        model=model,
+        feature_cols=feature_cols,
+        target_col=target_col,
+        workers=workers,
+        on_fold=on_fold,
+        checkpoint_dir=os.path.join(CHECKPOINT_DIR, "rolling"),
+        resume=resume,
+        run_settings={
+            **xgb_params,
+            "XGB_CONTINUATION_ROUNDS": getattr(config, "XGB_CONTINUATION_ROUNDS", 20),
+            "XGB_CONTINUATION_REFIT_EVERY": getattr(config, "XGB_CONTINUATION_REFIT_EVERY", 6),
+            "XGB_CONTINUATION_MAX_DEGRADATION": getattr(config, "XGB_CONTINUATION_MAX_DEGRADATION", 0.10),
+        },
+    )
 
-        artifacts = fit_xgboost(
-            train_df=fold_train,
+    if continuation and getattr(config, "XGB_CONTINUATION_REPORT", False):
+        print("Fitting full refits for the continuation report")
+        full_folds: list[WalkForwardFold] = []
+        pred_test_full, _ = walk_forward_predict(
+            ml_all=ml_all,
+            test_dates=test_dates,
+            model=WalkForwardModel(fit=model.fit, predict=model.predict, fit_kwargs=model.fit_kwargs),
             feature_cols=feature_cols,
             target_col=target_col,
+            workers=workers,
+            on_fold=full_folds.append,
+            checkpoint_dir=os.path.join(CHECKPOINT_DIR, "full_refit"),
+            resume=resume,
+            run_settings=xgb_params,
         )
-
-        pred_fold = predict_returns(artifacts, fold_test, pred_col="pred_return")
-        rolling_preds.append(pred_fold)
-
-        imp = artifacts.feature_importances_.rename(current_date)
-        importances.append(imp)
-
+        report = continuation_report(folds, full_folds, pred_test_rolling, pred_test_full, target_col)
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        report.to_csv(CONTINUATION_REPORT_PATH)
         print(
-            f"Predicted {pd.Timestamp(current_date).date()} "
-            f"using {fold_train.index.get_level_values('date').nunique()} train months"
+            f"Continuation vs full refit: fit time {report['fit_seconds'].sum():.1f}s vs "
+            f"{report['fit_seconds_full'].sum():.1f}s, mean RMSE {report['rmse'].mean():.6f} vs "
+            f"{report['rmse_full'].mean():.6f} -> {CONTINUATION_REPORT_PATH}"
         )
 
-    if not rolling_preds:
-        raise ValueError("No rolling predictions were generated for test period.")
-
-    pred_test_rolling = pd.concat(rolling_preds).sort_index()
-    mean_importance = pd.concat(importances, axis=1).mean(axis=1).sort_values(ascending=False)
-    mean_importance.name = "importance_mean"
-
     return pred_train_static, pred_test_rolling, mean_importance
 
 
@@ -212,14 +282,22 @@ def main() -> None:
     """
     Run XGBoost with rolling monthly retraining on the selected feature dataset.
     """
+    parser = argparse.ArgumentParser(description="XGBoost with rolling monthly retraining.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse the months checkpointed by an interrupted run with the same inputs.",
+    )
+    args = parser.parse_args()
+
     print(f"Using feature source: {config.FEATURE_SOURCE}")
     print(f"ML train path: {ML_TRAIN_PATH}")
     print(f"ML test path: {ML_TEST_PATH}")
 
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
-    ml_test = pd.read_parquet(ML_TEST_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
+    ml_test = read_feature_split(FEATURE_DATASET_PATHS, "test")
 
     ret_train = pd.read_parquet(RET_TRAIN_PATH)
     ret_test = pd.read_parquet(RET_TEST_PATH)
@@ -237,6 +315,7 @@ def main() -> None:
         ml_test=ml_test,
         feature_cols=feature_cols,
         target_col=target_col,
+        resume=args.resume,
     )
 
     mean_importance.to_csv(FEATURE_IMPORTANCE_MEAN_PATH, header=True)
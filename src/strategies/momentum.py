@@ -5,6 +5,8 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 
+from src import kernels
+
 
 def compute_momentum_signal(
     returns_monthly: pd.DataFrame,
@@ -25,13 +27,10 @@ def compute_momentum_signal(
     returns_monthly = returns_monthly.sort_index()
 
     if use_log_returns:
-        past_cum = returns_monthly.rolling(window=lookback_months).sum()
-    # Use log-style compounding without logs: Π(1+r) - 1
+        past_cum = kernels.rolling_sum(returns_monthly, lookback_months)
+    # Π(1+r) - 1, computed from prefix sums of log(1+r)
     else:
-        past_cum = (1.0 + returns_monthly).rolling(window=lookback_months).apply(
-            lambda x: np.prod(x) - 1.0,
-            raw=True
-        )
+        past_cum = kernels.rolling_compound_return(returns_monthly, lookback_months)
 
     # Shift by 1 month so signal at t uses data up to t-1
     signal = past_cum.shift(1)
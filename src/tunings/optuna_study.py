@@ -0,0 +1,151 @@
+# src/tunings/optuna_study.py
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import optuna
+
+from src.evaluation.walk_forward import split_jobs
+
+
+SAMPLER_SEED = 42
+
+
+def tuning_jobs_from_config() -> tuple[int, int]:
+    """
+    (trial workers, n_jobs per fit) from the TUNING_* settings in src.config.
+    """
+    from src import config
+
+    return split_jobs(
+        getattr(config, "TUNING_WORKERS", 1),
+        getattr(config, "TUNING_INNER_JOBS", None),
+    )
+
+
+def study_storage(db_path: Path | str) -> optuna.storages.RDBStorage:
+    """
+    SQLite storage shared by every process of a study. Trials left running
+    by a dead process are marked failed through the storage heartbeat.
+    """
+    return optuna.storages.RDBStorage(
+        url=f"sqlite:///{db_path}",
+        heartbeat_interval=60,
+        grace_period=180,
+        # Workers wait for each other's writes instead of failing on a locked database
+        engine_kwargs={"connect_args": {"timeout": 60}},
+    )
+
+
+def make_sampler(seed: int = SAMPLER_SEED, parallel: bool = False) -> optuna.samplers.TPESampler:
+    # Concurrent trials see each other's pending parameters as a guessed
+    # value, so workers do not all sample the same region
+    return optuna.samplers.TPESampler(seed=seed, constant_liar=parallel)
+
+
+def open_study(db_path: Path | str, study_name: str, run_key: str, resume: bool) -> optuna.Study:
+    """
+    Optuna study in the local SQLite storage at `db_path`. With `resume`,
+    the stored study of the same `run_key` is continued; otherwise it starts
+    empty.
+    """
+    storage = study_storage(db_path)
+    sampler = make_sampler()
+
+    if resume:
+        try:
+            study = optuna.load_study(study_name=study_name, storage=storage, sampler=sampler)
+            if study.user_attrs.get("run_key") == run_key:
+                return study
+            print("Stored study is from different inputs, starting over")
+        except KeyError:
+            pass
+
+    try:
+        optuna.delete_study(study_name=study_name, storage=storage)
+    except KeyError:
+        pass
+
+    study = optuna.create_study(
+        direction="maximize",
+        study_name=study_name,
+        storage=storage,
+        sampler=sampler,
+    )
+    study.set_user_attr("run_key", run_key)
+    return study
+
+
+def completed_trials(study: optuna.Study) -> list[optuna.trial.FrozenTrial]:
+    return study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+
+
+def _optimize_in_worker(
+    db_path: str,
+    study_name: str,
+    make_objective: Callable[..., Callable[[optuna.Trial], float]],
+    objective_kwargs: dict[str, Any],
+    n_trials: int,
+    seed: int,
+) -> None:
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=study_storage(db_path),
+        sampler=make_sampler(seed, parallel=True),
+    )
+    # Runs until the study as a whole has n_trials complete ones
+    study.optimize(
+        make_objective(**objective_kwargs),
+        callbacks=[optuna.study.MaxTrialsCallback(n_trials, states=(optuna.trial.TrialState.COMPLETE,))],
+    )
+
+
+def optimize(
+    study: optuna.Study,
+    db_path: Path | str,
+    make_objective: Callable[..., Callable[[optuna.Trial], float]],
+    objective_kwargs: dict[str, Any],
+    n_trials: int,
+    workers: int = 1,
+    inner_jobs: int = -1,
+) -> None:
+    """
+    Run trials until the study has `n_trials` complete ones.
+
+    The objective is built in each process as
+    make_objective(**objective_kwargs, n_jobs=inner_jobs). With several
+    `workers`, each process loads the study from the shared storage and
+    samples from every worker's finished trials; a few trials past
+    `n_trials` can complete when workers finish at the same time.
+    """
+    objective_kwargs = {**objective_kwargs, "n_jobs": inner_jobs}
+
+    n_done = len(completed_trials(study))
+    if n_done:
+        print(f"Resuming study with {n_done} of {n_trials} trials complete")
+    if n_done >= n_trials:
+        return
+
+    if workers == 1:
+        study.optimize(make_objective(**objective_kwargs), n_trials=n_trials - n_done, show_progress_bar=True)
+        return
+
+    print(f"Running {n_trials - n_done} trials in {workers} processes (n_jobs={inner_jobs} each)")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _optimize_in_worker,
+                str(db_path),
+                study.study_name,
+                make_objective,
+                objective_kwargs,
+                n_trials,
+                SAMPLER_SEED + worker,
+            )
+            for worker in range(workers)
+        ]
+        for future in futures:
+            future.result()
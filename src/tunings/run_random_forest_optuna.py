@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
+import sys
 
 import numpy as np
 import optuna
@@ -11,7 +13,12 @@ import pandas as pd
 from sklearn.metrics import mean_squared_error
 
 from src import config
+from src.feature_cache import cache_key, fingerprint_modules
+from src.feature_panel import read_feature_split
+from src.long_dataset import LongDataset
+from src.model_store import training_fingerprint
 from src.models.tree import fit_random_forest, predict_returns
+from src.tunings.optuna_study import completed_trials, open_study, optimize, tuning_jobs_from_config
 from src.utils.paths import get_feature_dataset_paths
 
 
@@ -94,7 +101,116 @@ def combined_score(
     )
 
 
+def suggest_rf_params(trial: optuna.Trial) -> dict:
+    return {
+        "RF_N_ESTIMATORS": trial.suggest_int("RF_N_ESTIMATORS", 200, 700, step=100),
+        "RF_MAX_DEPTH": trial.suggest_int("RF_MAX_DEPTH", 3, 8),
+        "RF_MIN_SAMPLES_LEAF": trial.suggest_int("RF_MIN_SAMPLES_LEAF", 5, 40, step=5),
+        "RF_MIN_SAMPLES_SPLIT": trial.suggest_int("RF_MIN_SAMPLES_SPLIT", 10, 80, step=10),
+        "RF_MAX_FEATURES": trial.suggest_categorical("RF_MAX_FEATURES", ["sqrt", "log2", 0.4, 0.5, 0.7]),
+    }
+
+
+def make_objective(
+    ml_train: pd.DataFrame | LongDataset,
+    feature_cols: list[str],
+    target_col: str,
+    folds: list[tuple[pd.Index, pd.Index]],
+    top_pct: float,
+    n_jobs: int = -1,
+):
+    # Folds are contiguous date ranges: row slices of one date-sorted dataset
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
+
+    def objective(trial: optuna.Trial) -> float:
+        # Passed to the fits rather than set on src.config, so trials can
+        # run side by side
+        params = suggest_rf_params(trial)
+
+        rmse_values = []
+        diracc_values = []
+        spearman_values = []
+        topk_values = []
+
+        for train_dates, val_dates in folds:
+            fold_train = ml_data.for_dates(train_dates)
+            fold_val = ml_data.for_dates(val_dates)
+
+            artifacts = fit_random_forest(
+                train_df=fold_train,
+                feature_cols=feature_cols,
+                target_col=target_col,
+                n_jobs=n_jobs,
+                params=params,
+            )
+
+            pred_val = predict_returns(artifacts, fold_val, pred_col="pred_return")
+
+            y_true = pred_val[target_col].to_numpy(dtype=float)
+            y_pred = pred_val["pred_return"].to_numpy(dtype=float)
+
+            rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
+            dir_acc = directional_accuracy(y_true, y_pred)
+
+            rank_metrics = ranking_metrics_by_month(
+                pred_val,
+                target_col=target_col,
+                pred_col="pred_return",
+                top_pct=top_pct,
+            )
+
+            rmse_values.append(rmse)
+            diracc_values.append(dir_acc)
+            spearman_values.append(rank_metrics["SpearmanRankCorr_mean"])
+            topk_values.append(rank_metrics["TopKHitRate_mean"])
+
+        rmse_mean = float(np.mean(rmse_values))
+        diracc_mean = float(np.mean(diracc_values))
+        spearman_mean = float(np.mean(spearman_values))
+        topk_mean = float(np.mean(topk_values))
+
+        score = combined_score(
+            rmse=rmse_mean,
+            directional_accuracy_value=diracc_mean,
+            spearman_value=spearman_mean,
+            topk_value=topk_mean,
+        )
+
+        trial.set_user_attr("RMSE_mean", rmse_mean)
+        trial.set_user_attr("DirectionalAccuracy_mean", diracc_mean)
+        trial.set_user_attr("SpearmanRankCorr_mean", spearman_mean)
+        trial.set_user_attr("TopKHitRate_mean", topk_mean)
+        trial.set_user_attr("CombinedScore_mean", score)
+
+        return score
+
+    return objective
+
+
+def tuning_run_key(ml_data: LongDataset, n_splits: int, top_pct: float) -> str:
+    """
+    Hash of what the trials' results depend on: the training data, the
+    folds, and this module's search space and objective.
+    """
+    fingerprint, _ = training_fingerprint(ml_data, ml_data.feature_cols, ml_data.target_col)
+    return cache_key(
+        "rf_optuna",
+        fingerprint,
+        n_splits,
+        top_pct,
+        fingerprint_modules(sys.modules[__name__]),
+    )
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Tune Random Forest hyperparameters with Optuna.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the stored study of an interrupted run with the same inputs.",
+    )
+    args = parser.parse_args()
+
     feature_paths = get_feature_dataset_paths(config.FEATURE_SOURCE)
     ml_train_path = feature_paths["train"]
 
@@ -107,8 +223,10 @@ def main() -> None:
 
     trials_path = os.path.join(results_dir, "rf_optuna_trials.csv")
     best_params_path = os.path.join(results_dir, "best_rf_optuna_params.json")
+    # Shared by the TUNING_WORKERS processes; kept for --resume
+    study_db_path = os.path.join(results_dir, "optuna_study.db")
 
-    ml_train = pd.read_parquet(ml_train_path)
+    ml_train = read_feature_split(feature_paths, "train")
 
     target_cols = [c for c in ml_train.columns if c.startswith("y_next")]
     if len(target_cols) != 1:
@@ -124,101 +242,29 @@ def main() -> None:
     unique_dates = ml_train.index.get_level_values("date").unique().sort_values()
     folds = build_time_folds_from_dates(unique_dates, n_splits=n_splits)
 
-    def objective(trial: optuna.Trial) -> float:
-        n_estimators = trial.suggest_int("RF_N_ESTIMATORS", 200, 700, step=100)
-        max_depth = trial.suggest_int("RF_MAX_DEPTH", 3, 8)
-        min_samples_leaf = trial.suggest_int("RF_MIN_SAMPLES_LEAF", 5, 40, step=5)
-        min_samples_split = trial.suggest_int("RF_MIN_SAMPLES_SPLIT", 10, 80, step=10)
-        max_features = trial.suggest_categorical("RF_MAX_FEATURES", ["sqrt", "log2", 0.4, 0.5, 0.7])
-
-        rmse_values = []
-        diracc_values = []
-        spearman_values = []
-        topk_values = []
-
-        old_n_estimators = getattr(config, "RF_N_ESTIMATORS", None)
-        old_max_depth = getattr(config, "RF_MAX_DEPTH", None)
-        old_min_samples_leaf = getattr(config, "RF_MIN_SAMPLES_LEAF", None)
-        old_min_samples_split = getattr(config, "RF_MIN_SAMPLES_SPLIT", None)
-        old_max_features = getattr(config, "RF_MAX_FEATURES", None)
-
-        try:
-            for train_dates, val_dates in folds:
-                train_mask = ml_train.index.get_level_values("date").isin(train_dates)
-                val_mask = ml_train.index.get_level_values("date").isin(val_dates)
-
-                fold_train = ml_train.loc[train_mask].copy()
-                fold_val = ml_train.loc[val_mask].copy()
-
-                config.RF_N_ESTIMATORS = n_estimators
-                config.RF_MAX_DEPTH = max_depth
-                config.RF_MIN_SAMPLES_LEAF = min_samples_leaf
-                config.RF_MIN_SAMPLES_SPLIT = min_samples_split
-                config.RF_MAX_FEATURES = max_features
-
-                artifacts = fit_random_forest(
-                    train_df=fold_train,
-                    feature_cols=feature_cols,
-                    target_col=target_col,
-                )
-
-                pred_val = predict_returns(artifacts, fold_val, pred_col="pred_return")
-
-                y_true = pred_val[target_col].to_numpy(dtype=float)
-                y_pred = pred_val["pred_return"].to_numpy(dtype=float)
-
-                rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
-                dir_acc = directional_accuracy(y_true, y_pred)
-
-                rank_metrics = ranking_metrics_by_month(
-                    pred_val,
-                    target_col=target_col,
-                    pred_col="pred_return",
-                    top_pct=top_pct,
-                )
-
-                rmse_values.append(rmse)
-                diracc_values.append(dir_acc)
-                spearman_values.append(rank_metrics["SpearmanRankCorr_mean"])
-                topk_values.append(rank_metrics["TopKHitRate_mean"])
-
-            rmse_mean = float(np.mean(rmse_values))
-            diracc_mean = float(np.mean(diracc_values))
-            spearman_mean = float(np.mean(spearman_values))
-            topk_mean = float(np.mean(topk_values))
-
-            score = combined_score(
-                rmse=rmse_mean,
-                directional_accuracy_value=diracc_mean,
-                spearman_value=spearman_mean,
-                topk_value=topk_mean,
-            )
-
-            trial.set_user_attr("RMSE_mean", rmse_mean)
-            trial.set_user_attr("DirectionalAccuracy_mean", diracc_mean)
-            trial.set_user_attr("SpearmanRankCorr_mean", spearman_mean)
-            trial.set_user_attr("TopKHitRate_mean", topk_mean)
-            trial.set_user_attr("CombinedScore_mean", score)
-
-            return score
-
-        finally:
-            if old_n_estimators is not None:
-                config.RF_N_ESTIMATORS = old_n_estimators
-            if old_max_depth is not None:
-                config.RF_MAX_DEPTH = old_max_depth
-            if old_min_samples_leaf is not None:
-                config.RF_MIN_SAMPLES_LEAF = old_min_samples_leaf
-            if old_min_samples_split is not None:
-                config.RF_MIN_SAMPLES_SPLIT = old_min_samples_split
-            if old_max_features is not None:
-                config.RF_MAX_FEATURES = old_max_features
-
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=n_trials)
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
+    run_key = tuning_run_key(ml_data, n_splits=n_splits, top_pct=top_pct)
+    study = open_study(study_db_path, f"rf_optuna_{config.FEATURE_SOURCE}", run_key, resume=args.resume)
+
+    workers, inner_jobs = tuning_jobs_from_config()
+    optimize(
+        study,
+        study_db_path,
+        make_objective,
+        dict(
+            ml_train=ml_data,
+            feature_cols=feature_cols,
+            target_col=target_col,
+            folds=folds,
+            top_pct=top_pct,
+        ),
+        n_trials=n_trials,
+        workers=workers,
+        inner_jobs=inner_jobs,
+    )
 
     trials_rows = []
-    for trial in study.trials:
+    for trial in completed_trials(study):
         row = {
             "trial_number": trial.number,
             "objective_value": trial.value,
@@ -9,6 +9,8 @@ import pandas as pd
 from sklearn.metrics import mean_squared_error
 
 from src import config
+from src.feature_panel import read_feature_split
+from src.long_dataset import LongDataset
 from src.models.tree import fit_random_forest, predict_returns
 from src.utils.paths import get_feature_dataset_paths
 
@@ -143,7 +145,7 @@ def main() -> None:
     summary_results_path = os.path.join(results_dir, "rf_tuning_summary.csv")
     best_params_path = os.path.join(results_dir, "best_rf_params.json")
 
-    ml_train = pd.read_parquet(ml_train_path)
+    ml_train = read_feature_split(feature_paths, "train")
 
     target_cols = [c for c in ml_train.columns if c.startswith("y_next")]
     if len(target_cols) != 1:
@@ -159,6 +161,9 @@ def main() -> None:
     unique_dates = ml_train.index.get_level_values("date").unique().sort_values()
     folds = build_time_folds_from_dates(unique_dates, n_splits=n_splits)
 
+    # Folds are contiguous date ranges: row slices of one date-sorted dataset
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
+
     n_estimators_grid = getattr(config, "RF_N_ESTIMATORS_GRID", [300, 500])
     max_depth_grid = getattr(config, "RF_MAX_DEPTH_GRID", [4, 6, 8])
     min_samples_leaf_grid = getattr(config, "RF_MIN_SAMPLES_LEAF_GRID", [10, 20, 30])
@@ -185,28 +190,20 @@ def main() -> None:
         max_features,
     ) in param_grid:
         for fold_id, (train_dates, val_dates) in enumerate(folds, start=1):
-            train_mask = ml_train.index.get_level_values("date").isin(train_dates)
-            val_mask = ml_train.index.get_level_values("date").isin(val_dates)
-
-            fold_train = ml_train.loc[train_mask].copy()
-            fold_val = ml_train.loc[val_mask].copy()
-
-            old_n_estimators = getattr(config, "RF_N_ESTIMATORS", None)
-            old_max_depth = getattr(config, "RF_MAX_DEPTH", None)
-            old_min_samples_leaf = getattr(config, "RF_MIN_SAMPLES_LEAF", None)
-            old_min_samples_split = getattr(config, "RF_MIN_SAMPLES_SPLIT", None)
-            old_max_features = getattr(config, "RF_MAX_FEATURES", None)
-
-            config.RF_N_ESTIMATORS = n_estimators
-            config.RF_MAX_DEPTH = max_depth
-            config.RF_MIN_SAMPLES_LEAF = min_samples_leaf
-            config.RF_MIN_SAMPLES_SPLIT = min_samples_split
-            config.RF_MAX_FEATURES = max_features
+            fold_train = ml_data.for_dates(train_dates)
+            fold_val = ml_data.for_dates(val_dates)
 
             artifacts = fit_random_forest(
                 train_df=fold_train,
                 feature_cols=feature_cols,
                 target_col=target_col,
+                params={
+                    "RF_N_ESTIMATORS": n_estimators,
+                    "RF_MAX_DEPTH": max_depth,
+                    "RF_MIN_SAMPLES_LEAF": min_samples_leaf,
+                    "RF_MIN_SAMPLES_SPLIT": min_samples_split,
+                    "RF_MAX_FEATURES": max_features,
+                },
             )
 
             pred_val = predict_returns(artifacts, fold_val, pred_col="pred_return")
@@ -252,17 +249,6 @@ def main() -> None:
                 }
             )
 
-            if old_n_estimators is not None:
-                config.RF_N_ESTIMATORS = old_n_estimators
-            if old_max_depth is not None:
-                config.RF_MAX_DEPTH = old_max_depth
-            if old_min_samples_leaf is not None:
-                config.RF_MIN_SAMPLES_LEAF = old_min_samples_leaf
-            if old_min_samples_split is not None:
-                config.RF_MIN_SAMPLES_SPLIT = old_min_samples_split
-            if old_max_features is not None:
-                config.RF_MAX_FEATURES = old_max_features
-
     fold_df = pd.DataFrame(all_results)
     fold_df.to_csv(fold_results_path, index=False)
 
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Any
 
@@ -12,7 +14,13 @@ import pandas as pd
 from sklearn.metrics import mean_squared_error
 
 from src import config
+from src.evaluation.checkpoint import RunJournal
+from src.feature_cache import cache_key, fingerprint_modules
+from src.feature_panel import read_feature_split
+from src.long_dataset import LongDataset
+from src.model_store import training_fingerprint
 from src.models.xgboost_model import fit_xgboost, predict_returns
+from src.tunings.optuna_study import completed_trials, open_study, optimize, tuning_jobs_from_config
 from src.utils.paths import get_feature_dataset_paths, get_experiment_dir
 
 
@@ -25,6 +33,10 @@ FOLD_RESULTS_PATH = RESULTS_DIR / "xgboost_tuning_fold_results.csv"
 SUMMARY_RESULTS_PATH = RESULTS_DIR / "xgboost_tuning_summary.csv"
 BEST_PARAMS_PATH = RESULTS_DIR / "best_xgboost_params.json"
 STUDY_CSV_PATH = RESULTS_DIR / "optuna_trials.csv"
+# Trials are stored as they finish, so an interrupted study can resume, and
+# shared by the TUNING_WORKERS processes
+STUDY_DB_PATH = RESULTS_DIR / "optuna_study.db"
+CHECKPOINT_DIR = RESULTS_DIR / "checkpoints"
 
 
 def directional_accuracy(y_true: np.ndarray, y_pred: np.ndarray) -> float:
@@ -130,25 +142,6 @@ def suggest_xgb_params(trial: optuna.Trial) -> dict[str, Any]:
     }
 
 
-def apply_temp_xgb_config(params: dict[str, Any]) -> dict[str, Any]:
-    """
-    Temporarily override config values for one trial.
-    """
-    old_values: dict[str, Any] = {}
-    for key, value in params.items():
-        old_values[key] = getattr(config, key)
-        setattr(config, key, value)
-    return old_values
-
-
-def restore_temp_xgb_config(old_values: dict[str, Any]) -> None:
-    """
-    Restore original config values after a trial.
-    """
-    for key, value in old_values.items():
-        setattr(config, key, value)
-
-
 def make_combined_score(
     rmse_mean: float,
     directional_accuracy_mean: float,
@@ -179,111 +172,149 @@ def make_combined_score(
 
 
 def make_objective(
-    ml_train: pd.DataFrame,
+    ml_train: pd.DataFrame | LongDataset,
     feature_cols: list[str],
     target_col: str,
     folds: list[tuple[pd.Index, pd.Index]],
     top_pct: float,
-    fold_records: list[dict[str, Any]],
+    journal: RunJournal,
+    n_jobs: int = -1,
 ):
     """
     Create Optuna objective function using a combined validation score.
+    Each trial's fold results are appended to `journal` as it finishes.
+    Trial parameters are passed to the fits, never set on src.config, so
+    trials can run side by side.
     """
+    # Folds are contiguous date ranges: row slices of one date-sorted dataset
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
 
     def objective(trial: optuna.Trial) -> float:
         params = suggest_xgb_params(trial)
-        old_values = apply_temp_xgb_config(params)
 
+        fold_records: list[dict[str, Any]] = []
         rmse_values: list[float] = []
         dir_values: list[float] = []
         spearman_values: list[float] = []
         topk_values: list[float] = []
 
-        try:
-            for fold_id, (train_dates, val_dates) in enumerate(folds, start=1):
-                train_mask = ml_train.index.get_level_values("date").isin(train_dates)
-                val_mask = ml_train.index.get_level_values("date").isin(val_dates)
-
-                fold_train = ml_train.loc[train_mask].copy()
-                fold_val = ml_train.loc[val_mask].copy()
-
-                artifacts = fit_xgboost(
-                    train_df=fold_train,
-                    feature_cols=feature_cols,
-                    target_col=target_col,
-                )
-
-                pred_val = predict_returns(artifacts, fold_val, pred_col="pred_return")
-
-                y_true = pred_val[target_col].to_numpy(dtype=float)
-                y_pred = pred_val["pred_return"].to_numpy(dtype=float)
-
-                rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
-                dir_acc = directional_accuracy(y_true, y_pred)
-                rank_metrics = ranking_metrics_by_month(
-                    pred_val,
-                    target_col=target_col,
-                    pred_col="pred_return",
-                    top_pct=top_pct,
-                )
-
-                rmse_values.append(rmse)
-                dir_values.append(dir_acc)
-                spearman_values.append(rank_metrics["SpearmanRankCorr_mean"])
-                topk_values.append(rank_metrics["TopKHitRate_mean"])
-
-                fold_records.append({
-                    "trial_number": trial.number,
-                    **params,
-                    "fold": fold_id,
-                    "train_start": str(train_dates.min().date()),
-                    "train_end": str(train_dates.max().date()),
-                    "val_start": str(val_dates.min().date()),
-                    "val_end": str(val_dates.max().date()),
-                    "RMSE": rmse,
-                    "DirectionalAccuracy": dir_acc,
-                    "SpearmanRankCorr_mean": rank_metrics["SpearmanRankCorr_mean"],
-                    "TopKHitRate_mean": rank_metrics["TopKHitRate_mean"],
-                    "Months_evaluated": rank_metrics["Months_evaluated"],
-                })
-
-            rmse_mean = float(np.mean(rmse_values))
-            dir_mean = float(np.mean(dir_values))
-            spearman_mean = float(np.mean(spearman_values))
-            topk_mean = float(np.mean(topk_values))
-
-            combined_score = make_combined_score(
-                rmse_mean=rmse_mean,
-                directional_accuracy_mean=dir_mean,
-                spearman_mean=spearman_mean,
-                topk_mean=topk_mean,
+        for fold_id, (train_dates, val_dates) in enumerate(folds, start=1):
+            fold_train = ml_data.for_dates(train_dates)
+            fold_val = ml_data.for_dates(val_dates)
+
+            artifacts = fit_xgboost(
+                train_df=fold_train,
+                feature_cols=feature_cols,
+                target_col=target_col,
+                n_jobs=n_jobs,
+                params=params,
+            )
+
+            pred_val = predict_returns(artifacts, fold_val, pred_col="pred_return")
+
+            y_true = pred_val[target_col].to_numpy(dtype=float)
+            y_pred = pred_val["pred_return"].to_numpy(dtype=float)
+
+            rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
+            dir_acc = directional_accuracy(y_true, y_pred)
+            rank_metrics = ranking_metrics_by_month(
+                pred_val,
+                target_col=target_col,
+                pred_col="pred_return",
+                top_pct=top_pct,
             )
 
-            trial.set_user_attr("RMSE_mean", rmse_mean)
-            trial.set_user_attr("DirectionalAccuracy_mean", dir_mean)
-            trial.set_user_attr("SpearmanRankCorr_mean", spearman_mean)
-            trial.set_user_attr("TopKHitRate_mean", topk_mean)
-            trial.set_user_attr("CombinedScore_mean", combined_score)
+            rmse_values.append(rmse)
+            dir_values.append(dir_acc)
+            spearman_values.append(rank_metrics["SpearmanRankCorr_mean"])
+            topk_values.append(rank_metrics["TopKHitRate_mean"])
+
+            fold_records.append({
+                "trial_number": trial.number,
+                **params,
+                "fold": fold_id,
+                "train_start": str(train_dates.min().date()),
+                "train_end": str(train_dates.max().date()),
+                "val_start": str(val_dates.min().date()),
+                "val_end": str(val_dates.max().date()),
+                "RMSE": rmse,
+                "DirectionalAccuracy": dir_acc,
+                "SpearmanRankCorr_mean": rank_metrics["SpearmanRankCorr_mean"],
+                "TopKHitRate_mean": rank_metrics["TopKHitRate_mean"],
+                "Months_evaluated": rank_metrics["Months_evaluated"],
+            })
+
+        rmse_mean = float(np.mean(rmse_values))
+        dir_mean = float(np.mean(dir_values))
+        spearman_mean = float(np.mean(spearman_values))
+        topk_mean = float(np.mean(topk_values))
+
+        combined_score = make_combined_score(
+            rmse_mean=rmse_mean,
+            directional_accuracy_mean=dir_mean,
+            spearman_mean=spearman_mean,
+            topk_mean=topk_mean,
+        )
 
-            return combined_score
+        trial.set_user_attr("RMSE_mean", rmse_mean)
+        trial.set_user_attr("DirectionalAccuracy_mean", dir_mean)
+        trial.set_user_attr("SpearmanRankCorr_mean", spearman_mean)
+        trial.set_user_attr("TopKHitRate_mean", topk_mean)
+        trial.set_user_attr("CombinedScore_mean", combined_score)
 
-        finally:
-            restore_temp_xgb_config(old_values)
+        journal.append(f"trial_{trial.number}", {"trial_number": trial.number, "folds": fold_records})
+        return combined_score
 
     return objective
 
 
+def tuning_run_key(ml_data: LongDataset, n_splits: int, top_pct: float) -> str:
+    """
+    Hash of what the trials' results depend on: the training data, the
+    folds, and this module's search space and objective.
+    """
+    fingerprint, _ = training_fingerprint(ml_data, ml_data.feature_cols, ml_data.target_col)
+    return cache_key(
+        "xgboost_tuning",
+        fingerprint,
+        n_splits,
+        top_pct,
+        fingerprint_modules(sys.modules[__name__]),
+    )
+
+
+def completed_fold_records(study: optuna.Study, journal: RunJournal) -> list[dict[str, Any]]:
+    """
+    Fold results of the study's completed trials, from the journal.
+    """
+    completed = {trial.number for trial in completed_trials(study)}
+    return [
+        fold
+        for record in journal.records()
+        if record["trial_number"] in completed
+        for fold in record["folds"]
+    ]
+
+
 def main() -> None:
     """
     Tune XGBoost hyperparameters with Optuna using time-aware folds
     and a combined validation objective.
     """
+    parser = argparse.ArgumentParser(description="Tune XGBoost hyperparameters with Optuna.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the stored study of an interrupted run with the same inputs.",
+    )
+    args = parser.parse_args()
+
     print(f"Using feature source: {config.FEATURE_SOURCE}")
     print(f"ML train path: {ML_TRAIN_PATH}")
 
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    ml_train = pd.read_parquet(ML_TRAIN_PATH)
+    ml_train = read_feature_split(FEATURE_DATASET_PATHS, "train")
     target_col, feature_cols = get_target_and_features(ml_train)
 
     n_trials = getattr(config, "XGB_TUNING_TRIALS", 40)
@@ -293,26 +324,30 @@ def main() -> None:
     unique_dates = ml_train.index.get_level_values("date").unique().sort_values()
     folds = build_time_folds_from_dates(unique_dates, n_splits=n_splits)
 
-    fold_records: list[dict[str, Any]] = []
-
-    study = optuna.create_study(
-        direction="maximize",
-        study_name=f"xgboost_tuning_{config.FEATURE_SOURCE}",
-        sampler=optuna.samplers.TPESampler(seed=42),
-    )
-
-    objective = make_objective(
-        ml_train=ml_train,
-        feature_cols=feature_cols,
-        target_col=target_col,
-        folds=folds,
-        top_pct=top_pct,
-        fold_records=fold_records,
+    ml_data = LongDataset.from_long(ml_train, feature_cols, target_col)
+    run_key = tuning_run_key(ml_data, n_splits=n_splits, top_pct=top_pct)
+    journal = RunJournal(str(CHECKPOINT_DIR), run_key, resume=args.resume)
+    study = open_study(STUDY_DB_PATH, f"xgboost_tuning_{config.FEATURE_SOURCE}", run_key, resume=args.resume)
+
+    workers, inner_jobs = tuning_jobs_from_config()
+    optimize(
+        study,
+        STUDY_DB_PATH,
+        make_objective,
+        dict(
+            ml_train=ml_data,
+            feature_cols=feature_cols,
+            target_col=target_col,
+            folds=folds,
+            top_pct=top_pct,
+            journal=journal,
+        ),
+        n_trials=n_trials,
+        workers=workers,
+        inner_jobs=inner_jobs,
     )
 
-    study.optimize(objective, n_trials=n_trials, show_progress_bar=True)
-
-    fold_df = pd.DataFrame(fold_records)
+    fold_df = pd.DataFrame(completed_fold_records(study, journal))
     fold_df.to_csv(FOLD_RESULTS_PATH, index=False)
 
     summary_df = (
@@ -30,6 +30,8 @@ def get_feature_dataset_paths(
         "full": str(base / f"ml_full_{feature_source}.parquet"),
         "train": str(base / f"ml_train_{feature_source}_2015_2024.parquet"),
         "test": str(base / f"ml_test_{feature_source}_2025.parquet"),
+        "panel": str(base / f"panel_{feature_source}"),
+        "update_state": str(base / f"update_state_{feature_source}.pkl"),
     }
 
 
@@ -0,0 +1,87 @@
+# tests/test_batch_download.py
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_download import BatchedProvider
+from src.data_download import PriceProvider
+
+
+START_DATE = "2024-01-01"
+END_DATE = "2024-01-10"
+
+
+def price_frame(tickers: list[str], empty: tuple[str, ...] = ()) -> pd.DataFrame:
+    """
+    yfinance-layout prices of `tickers`, with all-NaN columns for `empty`.
+    """
+    index = pd.bdate_range(START_DATE, END_DATE, inclusive="left")
+    columns = pd.MultiIndex.from_product([["Close", "Volume"], tickers])
+    data = pd.DataFrame(
+        np.arange(len(index) * len(columns), dtype=float).reshape(len(index), -1) + 1.0,
+        index=index,
+        columns=columns,
+    )
+    for ticker in empty:
+        data.loc[:, (slice(None), ticker)] = np.nan
+    return data
+
+
+class FlakyProvider(PriceProvider):
+    """
+    Serves `responses` in turn (a frame, or a function of the requested
+    tickers), then full data; records every request.
+    """
+
+    def __init__(self, responses: list):
+        self.responses = list(responses)
+        self.requests: list[list[str]] = []
+
+    def fetch(self, tickers, start_date, end_date, auto_adjust=False):
+        self.requests.append(list(tickers))
+        if self.responses:
+            response = self.responses.pop(0)
+            return response(tickers) if callable(response) else response
+        return price_frame(tickers)
+
+
+def provider(inner: PriceProvider, max_retries: int = 3) -> BatchedProvider:
+    return BatchedProvider(inner=inner, batch_size=10, max_workers=1, max_retries=max_retries, backoff_seconds=0.0)
+
+
+def test_empty_batch_is_retried():
+    inner = FlakyProvider([pd.DataFrame(), pd.DataFrame()])
+    data = provider(inner).fetch(["A", "B"], START_DATE, END_DATE)
+
+    assert inner.requests == [["A", "B"]] * 3
+    assert list(data.columns.get_level_values(1).unique()) == ["A", "B"]
+    assert data.notna().all().all()
+
+
+def test_all_nan_tickers_are_retried_alone():
+    inner = FlakyProvider([lambda tickers: price_frame(tickers, empty=("B",))])
+    data = provider(inner).fetch(["A", "B", "C"], START_DATE, END_DATE)
+
+    assert inner.requests == [["A", "B", "C"], ["B"]]
+    assert list(data.columns) == [(field, t) for field in ["Close", "Volume"] for t in ["A", "B", "C"]]
+    assert data.notna().all().all()
+
+
+def test_tickers_missing_after_retries_are_left_out():
+    inner = FlakyProvider([lambda tickers: price_frame(tickers, empty=("B",))] * 3)
+    data = provider(inner, max_retries=2).fetch(["A", "B"], START_DATE, END_DATE)
+
+    assert inner.requests == [["A", "B"], ["B"], ["B"]]
+    assert list(data.columns.get_level_values(1).unique()) == ["A"]
+
+
+def test_errors_after_retries_fail_the_fetch():
+    class Failing(PriceProvider):
+        def fetch(self, tickers, start_date, end_date, auto_adjust=False):
+            raise ConnectionError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        provider(Failing(), max_retries=1).fetch(["A"], START_DATE, END_DATE)
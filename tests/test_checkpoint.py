@@ -0,0 +1,42 @@
+# tests/test_checkpoint.py
+
+from __future__ import annotations
+
+from src.evaluation.checkpoint import RunJournal
+
+
+def test_resume_after_torn_line(tmp_path):
+    directory = str(tmp_path / "journal")
+    journal = RunJournal(directory, "run", resume=True)
+    journal.append("m1", {"rmse": 0.1}, payload={"month": 1})
+
+    # Crash part-way through writing the record of m2
+    with open(journal.path, "a") as f:
+        f.write('{"unit": "m2", "rm')
+
+    journal = RunJournal(directory, "run", resume=True)
+    assert journal.completed() == {"m1"}
+    journal.append("m2", {"rmse": 0.2}, payload={"month": 2})
+    journal.append("m3", {"rmse": 0.3})
+
+    journal = RunJournal(directory, "run", resume=True)
+    assert [record["unit"] for record in journal.records()] == ["m1", "m2", "m3"]
+    assert journal.load_payload("m2") == {"month": 2}
+
+
+def test_undecodable_lines_are_skipped(tmp_path):
+    journal = RunJournal(str(tmp_path), "run")
+    journal.append("m1", {})
+    with open(journal.path, "a") as f:
+        f.write("not json\n")
+    journal.append("m2", {})
+
+    assert journal.completed() == {"m1", "m2"}
+
+
+def test_new_key_starts_over(tmp_path):
+    journal = RunJournal(str(tmp_path), "run", resume=True)
+    journal.append("m1", {})
+
+    assert RunJournal(str(tmp_path), "other", resume=True).completed() == set()
+    assert RunJournal(str(tmp_path), "other", resume=False).completed() == set()
@@ -0,0 +1,231 @@
+# tests/test_kernels.py
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import kernels
+from src.feature_registry import FeatureGraph
+
+
+RTOL = 1e-9
+ATOL = 1e-12
+
+N_ROWS = 300
+WINDOWS = [1, 5, 21, 63, N_ROWS + 50]
+VAR_WINDOWS = [2, 5, 21, 63, N_ROWS + 50]
+
+
+@pytest.fixture
+def returns() -> pd.DataFrame:
+    """
+    Daily returns with leading NaNs, interior NaN gaps, a total loss
+    (r = -1), a loss beyond -100% and a constant stretch.
+    """
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range("2020-01-01", periods=N_ROWS, name="date")
+    data = pd.DataFrame(
+        rng.normal(0.0005, 0.02, size=(N_ROWS, 6)),
+        index=index,
+        columns=[f"T{i}" for i in range(6)],
+    )
+    data.iloc[:40, 1] = np.nan
+    data.iloc[100:106, 2] = np.nan
+    data.iloc[200, 2] = np.nan
+    data.iloc[150, 3] = -1.0
+    data.iloc[220, 3] = -1.5
+    data.iloc[60:120, 4] = 0.001
+    data.iloc[:, 5] = np.nan
+    return data
+
+
+@pytest.fixture
+def prices(returns: pd.DataFrame) -> pd.DataFrame:
+    return 100.0 * (1.0 + returns.fillna(0.0).clip(lower=-0.5)).cumprod().where(returns.notna())
+
+
+@pytest.fixture
+def market(returns: pd.DataFrame) -> pd.Series:
+    market = returns.iloc[:, 0].rename("market") * 0.5 + 0.001
+    market.iloc[:10] = np.nan
+    market.iloc[130] = np.nan
+    return market
+
+
+def assert_matches(result, expected) -> None:
+    np.testing.assert_allclose(np.asarray(result), np.asarray(expected), rtol=RTOL, atol=ATOL)
+
+
+def pandas_compound_return(returns: pd.DataFrame, window: int) -> pd.DataFrame:
+    # The rolling().apply code the compound-return kernel replaced
+    return (1.0 + returns).rolling(window=window, min_periods=window).apply(
+        lambda x: np.prod(x) - 1.0,
+        raw=True,
+    )
+
+
+# =========================
+# FULL KERNELS VS PANDAS
+# =========================
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rolling_sum_and_mean(returns, window):
+    rolling = returns.rolling(window=window, min_periods=window)
+    assert_matches(kernels.rolling_sum(returns, window), rolling.sum())
+    assert_matches(kernels.rolling_mean(returns, window), rolling.mean())
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rolling_compound_return(returns, window):
+    result = kernels.rolling_compound_return(returns, window)
+    assert_matches(result, pandas_compound_return(returns, window))
+
+
+def test_rolling_compound_return_total_loss_is_exact(returns):
+    result = kernels.rolling_compound_return(returns, 5)
+    assert (result.iloc[150:155, 3] == -1.0).all()
+
+
+@pytest.mark.parametrize("window", VAR_WINDOWS)
+def test_rolling_var_and_std(returns, window):
+    rolling = returns.rolling(window=window, min_periods=window)
+    assert_matches(kernels.rolling_var(returns, window), rolling.var())
+    assert_matches(kernels.rolling_std(returns, window), rolling.std())
+
+
+def test_rolling_var_constant_window_is_zero(returns):
+    result = kernels.rolling_var(returns, 21)
+    assert (result.iloc[80:120, 4] == 0.0).all()
+
+
+@pytest.mark.parametrize("window", VAR_WINDOWS)
+def test_rolling_cov_with_market(returns, market, window):
+    expected = pd.DataFrame({
+        col: returns[col].rolling(window=window, min_periods=window).cov(market)
+        for col in returns.columns
+    })
+    assert_matches(kernels.rolling_cov(returns, market, window), expected)
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_rolling_max_and_min(prices, window):
+    rolling = prices.rolling(window=window, min_periods=window)
+    assert_matches(kernels.rolling_max(prices, window), rolling.max())
+    assert_matches(kernels.rolling_min(prices, window), rolling.min())
+
+
+def test_results_keep_input_type(returns):
+    assert isinstance(kernels.rolling_mean(returns, 5), pd.DataFrame)
+    series = kernels.rolling_mean(returns["T0"], 5)
+    assert isinstance(series, pd.Series) and series.name == "T0"
+    assert kernels.rolling_mean(returns["T0"].to_numpy(), 5).ndim == 1
+
+
+def test_window_validation(returns):
+    with pytest.raises(ValueError):
+        kernels.RollingSum(returns, 0)
+    with pytest.raises(ValueError):
+        kernels.RollingVar(returns, 1)
+
+
+# =========================
+# CELL EVALUATION
+# =========================
+
+@pytest.mark.parametrize(
+    "make_kernel",
+    [
+        lambda r, m, p: kernels.RollingSum(r, 21),
+        lambda r, m, p: kernels.RollingMean(r, 21),
+        lambda r, m, p: kernels.RollingCompoundReturn(r, 21),
+        lambda r, m, p: kernels.RollingVar(r, 21),
+        lambda r, m, p: kernels.RollingStd(r, 21),
+        lambda r, m, p: kernels.RollingCov(r, m, 21),
+        lambda r, m, p: kernels.RollingMax(p, 21),
+        lambda r, m, p: kernels.RollingMin(p, 21),
+    ],
+)
+def test_cells_match_full_exactly(returns, market, prices, make_kernel):
+    kernel = make_kernel(returns, market, prices)
+    full = kernel.full()
+
+    rows, cols = np.meshgrid(np.arange(N_ROWS), np.arange(returns.shape[1]), indexing="ij")
+    cells = kernel.at(rows.ravel(), cols.ravel())
+    np.testing.assert_array_equal(cells, full.ravel())
+
+
+# =========================
+# MONTH-END SAMPLING
+# =========================
+
+@pytest.mark.parametrize("window", [5, 21, 63])
+def test_sample_month_end_matches_resample(returns, window):
+    kernel = kernels.RollingCompoundReturn(returns, window)
+    daily = pd.DataFrame(kernel.full(), index=returns.index, columns=returns.columns)
+
+    sampled = kernels.sample_month_end(returns.index, returns.columns, kernel.at)
+    pd.testing.assert_frame_equal(sampled, daily.resample("ME").last(), check_freq=False)
+
+
+def test_month_end_offsets_with_empty_month():
+    index = pd.DatetimeIndex(["2020-01-30", "2020-01-31", "2020-03-02"])
+    month_ends, first_row, last_row = kernels.month_end_offsets(index)
+
+    assert list(month_ends) == list(pd.date_range("2020-01-31", periods=3, freq="ME"))
+    assert list(first_row) == [0, 2, 2]
+    assert list(last_row) == [1, 1, 2]
+
+
+FEATURE_REQUESTS = {
+    "ret_21": ("ret", {"window": 21}),
+    "logret_63": ("ret", {"window": 63, "use_log_returns": True}),
+    "vol_21": ("vol", {"window": 21}),
+    "ma_ratio": ("ma_ratio", {"short_window": 5, "long_window": 63}),
+    "dist_high_63": ("dist_high", {"window": 63}),
+    "rsi_14": ("rsi", {"window": 14}),
+    "beta_63": ("beta", {"window": 63}),
+}
+
+
+@pytest.mark.parametrize("month_end_only", [False, True])
+def test_feature_graph_matches_pandas(returns, prices, market, month_end_only):
+    graph = FeatureGraph({
+        "daily_returns": returns,
+        "adj_close": prices,
+        "market_daily_returns": market,
+    })
+    features = graph.compute(FEATURE_REQUESTS, month_end_only=month_end_only)
+
+    delta = prices.diff()
+    avg_gain = delta.clip(lower=0.0).rolling(14, min_periods=14).mean()
+    avg_loss = (-delta.clip(upper=0.0)).rolling(14, min_periods=14).mean()
+    market_var = market.rolling(63, min_periods=63).var()
+    expected = {
+        "ret_21": pandas_compound_return(returns, 21),
+        "logret_63": returns.rolling(63, min_periods=63).sum(),
+        "vol_21": returns.rolling(21, min_periods=21).std(),
+        "ma_ratio": prices.rolling(5, min_periods=5).mean() / prices.rolling(63, min_periods=63).mean() - 1.0,
+        "dist_high_63": prices / prices.rolling(63, min_periods=63).max() - 1.0,
+        "rsi_14": 100.0 - 100.0 / (1.0 + avg_gain / avg_loss.replace(0.0, np.nan)),
+        "beta_63": pd.DataFrame({
+            col: returns[col].rolling(63, min_periods=63).cov(market) / market_var
+            for col in returns.columns
+        }),
+    }
+
+    for name, frame in expected.items():
+        if month_end_only:
+            frame = frame.resample("ME").last()
+        assert features[name].shape == frame.shape, name
+        assert_matches(features[name], frame)
+
+
+def test_month_end_only_is_exact_sample_of_daily(returns, prices, market):
+    inputs = {"daily_returns": returns, "adj_close": prices, "market_daily_returns": market}
+    daily = FeatureGraph(inputs).compute(FEATURE_REQUESTS)
+    monthly = FeatureGraph(inputs).compute(FEATURE_REQUESTS, month_end_only=True)
+
+    for name in FEATURE_REQUESTS:
+        pd.testing.assert_frame_equal(monthly[name], daily[name].resample("ME").last(), check_freq=False)
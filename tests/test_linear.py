@@ -0,0 +1,124 @@
+# tests/test_linear.py
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import config
+from src.long_dataset import LongDataset
+from src.models.linear import (
+    fit_ridge_incremental,
+    fit_ridge_with_scaler,
+    predict_returns,
+    update_ridge_incremental,
+)
+
+
+FEATURE_COLS = ["f0", "f1", "f2", "f3"]
+TARGET_COL = "target"
+ALPHA = 10.0
+
+
+@pytest.fixture
+def standard_scaler(monkeypatch):
+    monkeypatch.setattr(config, "SCALER_TYPE", "standard")
+
+
+@pytest.fixture
+def ml_all() -> pd.DataFrame:
+    """
+    Long (date, ticker) table of 24 months x 30 tickers with features on
+    different scales and a linear target plus noise.
+    """
+    rng = np.random.default_rng(11)
+    dates = pd.date_range("2020-01-31", periods=24, freq="ME")
+    tickers = [f"T{i:02d}" for i in range(30)]
+    index = pd.MultiIndex.from_product([dates, tickers], names=["date", "ticker"])
+
+    X = rng.normal(size=(len(index), len(FEATURE_COLS))) * [1.0, 10.0, 0.01, 100.0] + [0.0, 5.0, -1.0, 50.0]
+    y = X @ [0.02, -0.001, 1.5, 0.0001] + rng.normal(0.0, 0.05, size=len(index))
+
+    df = pd.DataFrame(X, index=index, columns=FEATURE_COLS)
+    df[TARGET_COL] = y
+    return df
+
+
+def window(ml_all: pd.DataFrame, n_months: int) -> pd.DataFrame:
+    dates = ml_all.index.get_level_values("date")
+    return ml_all[dates <= dates.unique()[n_months - 1]]
+
+
+def assert_same_fit(result, expected, df) -> None:
+    np.testing.assert_allclose(result.model.coef_, expected.model.coef_, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(result.model.intercept_, expected.model.intercept_, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(
+        predict_returns(result, df)["pred_return"],
+        predict_returns(expected, df)["pred_return"],
+        rtol=1e-9,
+        atol=1e-12,
+    )
+
+
+def test_incremental_fit_matches_sklearn(ml_all, standard_scaler):
+    train_df = window(ml_all, 12)
+    result = fit_ridge_incremental(train_df, FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    expected = fit_ridge_with_scaler(train_df, FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    assert_same_fit(result, expected, ml_all)
+
+
+@pytest.mark.parametrize("as_long_dataset", [False, True])
+def test_incremental_updates_match_refits(ml_all, standard_scaler, as_long_dataset):
+    artifacts = fit_ridge_incremental(window(ml_all, 6), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+
+    # One month at a time, then several months at once
+    for n_months in [7, 8, 9, 15, 24]:
+        train_df = window(ml_all, n_months)
+        if as_long_dataset:
+            train_df = LongDataset.from_long(train_df, FEATURE_COLS, TARGET_COL)
+        artifacts = update_ridge_incremental(artifacts, train_df, FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+
+        expected = fit_ridge_with_scaler(window(ml_all, n_months), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+        assert_same_fit(artifacts, expected, ml_all)
+
+
+def test_update_leaves_previous_artifacts_unchanged(ml_all, standard_scaler):
+    previous = fit_ridge_incremental(window(ml_all, 6), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    stats = previous.stats
+    before = (stats.n, stats.mean_x.copy(), stats.mean_y, stats.cxx.copy(), stats.cxy.copy(), stats.sketch.n, stats.last_date)
+    coef = previous.model.coef_.copy()
+
+    updated = update_ridge_incremental(previous, window(ml_all, 9), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+
+    assert updated.stats is not previous.stats
+    assert updated.stats.n > previous.stats.n
+    assert previous.stats is stats
+    after = (stats.n, stats.mean_x, stats.mean_y, stats.cxx, stats.cxy, stats.sketch.n, stats.last_date)
+    for value_before, value_after in zip(before, after):
+        np.testing.assert_array_equal(value_after, value_before)
+    np.testing.assert_array_equal(previous.model.coef_, coef)
+
+    # Updating the same previous fit again gives the same result
+    again = update_ridge_incremental(previous, window(ml_all, 9), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    np.testing.assert_array_equal(again.model.coef_, updated.model.coef_)
+
+
+def test_update_without_new_rows_keeps_fit(ml_all, standard_scaler):
+    train_df = window(ml_all, 6)
+    artifacts = fit_ridge_incremental(train_df, FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    updated = update_ridge_incremental(artifacts, train_df, FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    np.testing.assert_array_equal(updated.model.coef_, artifacts.model.coef_)
+    assert updated.stats.n == artifacts.stats.n
+
+
+def test_standard_scaler_skips_the_sketch(ml_all, standard_scaler):
+    artifacts = fit_ridge_incremental(window(ml_all, 6), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    artifacts = update_ridge_incremental(artifacts, window(ml_all, 9), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    assert artifacts.stats.sketch.n == 0
+
+
+def test_robust_scaler_fills_the_sketch(ml_all, monkeypatch):
+    monkeypatch.setattr(config, "SCALER_TYPE", "robust")
+    artifacts = fit_ridge_incremental(window(ml_all, 6), FEATURE_COLS, TARGET_COL, alpha=ALPHA)
+    assert artifacts.stats.sketch.n == artifacts.stats.n
@@ -0,0 +1,69 @@
+# tests/test_model_store.py
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import model_store
+from src.model_store import ModelStore, StoredModel
+from src.models.linear import fit_ridge_with_scaler, predict_returns
+
+
+FEATURE_COLS = ["f0", "f1"]
+TARGET_COL = "target"
+
+
+@pytest.fixture
+def train_df() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("2020-01-31", periods=6, freq="ME")
+    index = pd.MultiIndex.from_product([dates, ["A", "B", "C", "D"]], names=["date", "ticker"])
+    df = pd.DataFrame(rng.normal(size=(len(index), 2)), index=index, columns=FEATURE_COLS)
+    df[TARGET_COL] = df["f0"] - 0.5 * df["f1"] + rng.normal(0.0, 0.1, size=len(index))
+    return df
+
+
+@pytest.fixture
+def loads(monkeypatch) -> list[str]:
+    """
+    Directories the ridge family loads artifacts from.
+    """
+    calls = []
+    family = model_store.MODEL_FAMILIES["ridge"]
+
+    def load(directory):
+        calls.append(directory)
+        return family.load(directory)
+
+    monkeypatch.setitem(model_store.MODEL_FAMILIES, "ridge", model_store.dataclasses.replace(family, load=load))
+    return calls
+
+
+def test_fit_or_get_defers_loading(tmp_path, train_df, loads):
+    store = ModelStore(str(tmp_path))
+    fitted = store.fit_or_get("ridge", fit_ridge_with_scaler, train_df, FEATURE_COLS, TARGET_COL)
+    assert store.misses == 1 and loads == []
+
+    stored = store.fit_or_get("ridge", fit_ridge_with_scaler, train_df, FEATURE_COLS, TARGET_COL)
+    assert isinstance(stored, StoredModel)
+    assert store.hits == 1
+    assert stored.directory == fitted.directory
+    assert stored.meta["cutoff_date"] == "2020-06-30"
+    assert loads == []
+
+    expected = predict_returns(fitted.artifacts, train_df)["pred_return"]
+    result = predict_returns(stored.artifacts, train_df)["pred_return"]
+    np.testing.assert_array_equal(result, expected)
+    stored.artifacts
+    assert loads == [stored.directory]
+
+
+def test_fit_or_load_returns_artifacts(tmp_path, train_df, loads):
+    store = ModelStore(str(tmp_path))
+    fitted = store.fit_or_load("ridge", fit_ridge_with_scaler, train_df, FEATURE_COLS, TARGET_COL)
+    loaded = store.fit_or_load("ridge", fit_ridge_with_scaler, train_df, FEATURE_COLS, TARGET_COL)
+
+    assert len(loads) == 1
+    np.testing.assert_array_equal(loaded.model.coef_, fitted.model.coef_)
@@ -0,0 +1,93 @@
+# tests/test_walk_forward.py
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.evaluation.walk_forward import CARRIED_STATE_UNIT, WalkForwardModel, walk_forward_predict
+
+
+FEATURE_COLS = ["f0"]
+TARGET_COL = "target"
+
+
+@pytest.fixture
+def ml_all() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2020-01-31", periods=10, freq="ME")
+    index = pd.MultiIndex.from_product([dates, ["A", "B", "C"]], names=["date", "ticker"])
+    df = pd.DataFrame({"f0": rng.normal(size=len(index))}, index=index)
+    df[TARGET_COL] = rng.normal(size=len(index))
+    return df
+
+
+def fit_counter(train_df, feature_cols, target_col):
+    return {"n_rows": len(train_df), "n_updates": 0}
+
+
+def update_counter(artifacts, train_df, feature_cols, target_col):
+    return {"n_rows": len(train_df), "n_updates": artifacts["n_updates"] + 1}
+
+
+def predict_counter(artifacts, df, pred_col="pred_return"):
+    # Depends on the whole update chain, not just the training window
+    out = df.frame.copy()
+    out[pred_col] = artifacts["n_updates"] * 1000.0 + artifacts["n_rows"]
+    return out
+
+
+MODEL = WalkForwardModel(fit=fit_counter, predict=predict_counter, update=update_counter)
+
+
+class Crash(Exception):
+    pass
+
+
+def run(ml_all, checkpoint_dir, resume=False, crash_after=None):
+    test_dates = ml_all.index.get_level_values("date").unique()[4:]
+    seen = []
+
+    def on_fold(fold):
+        seen.append(fold.date)
+        if crash_after is not None and len(seen) == crash_after:
+            raise Crash()
+
+    predictions, _ = walk_forward_predict(
+        ml_all=ml_all,
+        test_dates=test_dates,
+        model=MODEL,
+        feature_cols=FEATURE_COLS,
+        target_col=TARGET_COL,
+        on_fold=on_fold,
+        checkpoint_dir=checkpoint_dir,
+        resume=resume,
+    )
+    return predictions
+
+
+def test_resumed_update_chain_matches_uninterrupted(ml_all, tmp_path):
+    expected = run(ml_all, str(tmp_path / "full"))
+    assert expected["pred_return"].max() >= 5000.0
+
+    checkpoint_dir = str(tmp_path / "resumed")
+    with pytest.raises(Crash):
+        run(ml_all, checkpoint_dir, crash_after=3)
+    result = run(ml_all, checkpoint_dir, resume=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_resume_without_carried_state_recomputes(ml_all, tmp_path):
+    expected = run(ml_all, str(tmp_path / "full"))
+
+    checkpoint_dir = str(tmp_path / "resumed")
+    with pytest.raises(Crash):
+        run(ml_all, checkpoint_dir, crash_after=3)
+    os.remove(os.path.join(checkpoint_dir, f"{CARRIED_STATE_UNIT}.pkl"))
+    result = run(ml_all, checkpoint_dir, resume=True)
+
+    pd.testing.assert_frame_equal(result, expected)